@@ -0,0 +1,257 @@
+"""
+Benchmark the pipeline on the ASHRAE Standard 140 cases, for both speed and accuracy.
+
+Every case in the cases directory is run through the full batch pipeline, timing each stage,
+and the annual heating and cooling loads are compared against the reference ranges in
+validation-annex_a3.xlsx (absolute ranges from the "data_abs" sheet, differences from a
+baseline case from the "data" sheet). Each run appends a record to a JSON history file so that
+speed and accuracy can be compared between commits.
+
+Usage:
+    python -m benchmarks.ashrae140 [--history benchmarks/results/ashrae140.json]
+
+Reading the workbook requires openpyxl.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame, read_excel
+
+from src.openbes.cases import load_case, CASE_SUFFIX
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from src.openbes.profiling import StageHistogram, profile
+from src.openbes.types import ENERGY_USE_CATEGORIES
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES_DIR = os.path.join(REPO_DIR, "cases_ashrae-std140-2023_with-results")
+VALIDATION_WORKBOOK = "validation-annex_a3.xlsx"
+HISTORY_FILE = os.path.join(REPO_DIR, "benchmarks", "results", "ashrae140.json")
+# The workbook has notes above the header row
+HEADER_ROW = 9
+ABSOLUTE_SHEET = "data_abs"
+RELATIVE_SHEET = "data"
+# Suffix of a workbook test case for each simulated load
+LOAD_SUFFIXES = {"H": ENERGY_USE_CATEGORIES.Heating.value, "C": ENERGY_USE_CATEGORIES.Cooling.value}
+
+
+@contextmanager
+def timed(timings: dict, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def read_reference_ranges(cases_dir: str = CASES_DIR) -> DataFrame:
+    """Read the reference ranges for every test in the validation workbook.
+    Args:
+        cases_dir (str): Directory containing validation-annex_a3.xlsx.
+    Returns:
+        DataFrame: One row per test with columns kind ("absolute" or "relative"), test_id, case,
+            baseline, ref_min, ref_max (MWh/yr) and should_pass.
+    """
+    path = os.path.join(cases_dir, VALIDATION_WORKBOOK)
+    sheets = []
+    for kind, sheet in (("absolute", ABSOLUTE_SHEET), ("relative", RELATIVE_SHEET)):
+        # Free-floating cases have no reference loads
+        data = read_excel(path, sheet_name=sheet, header=HEADER_ROW).dropna(subset=["case", "ref_min", "ref_max"])
+        if kind == "absolute":
+            data["baseline"] = None
+        else:
+            # Base cases are tested by their absolute ranges
+            data = data.dropna(subset=["baseline"])
+        data["kind"] = kind
+        sheets.append(data[["kind", "test_id", "case", "baseline", "ref_min", "ref_max", "should_pass"]])
+    ranges = DataFrame(np.concatenate([s.to_numpy(dtype=object) for s in sheets]), columns=sheets[0].columns)
+    # Some published ranges are given high-to-low
+    low = ranges[["ref_min", "ref_max"]].astype(float).min(axis=1)
+    high = ranges[["ref_min", "ref_max"]].astype(float).max(axis=1)
+    ranges["ref_min"], ranges["ref_max"] = low, high
+    return ranges
+
+
+def run_case(file_path: str) -> dict:
+    """Run one case through the pipeline, timing each of its profiled stages.
+    Args:
+        file_path (str): Path to the case TOML file.
+    Returns:
+        dict: Wall time per stage and in total (seconds), and annual heating and cooling (MWh/yr).
+    """
+    timings = {}
+    with timed(timings, "load"):
+        spec, parameters = load_case(file_path)
+        specs = specs_to_frame([spec])
+    # Stage times come from the pipeline's own profiling stages, so the case is simulated once
+    histogram = StageHistogram()
+    with profile(histogram), timed(timings, "pipeline"):
+        results = batch_pipeline(specs, parameters)
+    timings.update(histogram.summary()["total"].astype(float).to_dict())
+    annual = results.sum(axis=1).droplevel(0)
+    return {
+        "seconds": timings["load"] + timings["pipeline"],
+        "stages": timings,
+        "annual_mwh": {load: float(annual[category]) / 1000 for load, category in LOAD_SUFFIXES.items()},
+    }
+
+
+def compare_to_references(cases: dict, ranges: DataFrame) -> list[dict]:
+    """Check simulated annual loads against the reference ranges.
+    Args:
+        cases (dict): Results of run_case, keyed by case name (e.g. "600").
+        ranges (DataFrame): Reference ranges from read_reference_ranges.
+    Returns:
+        list[dict]: One entry per test whose cases were run, with the simulated value and whether it is in range.
+    """
+    def simulated(case: str) -> Optional[float]:
+        name, load = case[:-1], case[-1]
+        return cases[name]["annual_mwh"][load] if name in cases and load in LOAD_SUFFIXES else None
+
+    tests = []
+    for row in ranges.itertuples(index=False):
+        value = simulated(row.case)
+        if value is not None and row.kind == "relative":
+            baseline = simulated(row.baseline)
+            value = None if baseline is None else value - baseline
+        if value is None:
+            continue
+        tests.append({
+            "kind": row.kind,
+            "test_id": int(row.test_id),
+            "case": row.case,
+            "baseline": row.baseline,
+            "value": round(value, 6),
+            "ref_min": float(row.ref_min),
+            "ref_max": float(row.ref_max),
+            "in_range": bool(row.ref_min <= value <= row.ref_max),
+        })
+    return tests
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(cases_dir: str = CASES_DIR, repeat: int = 1) -> dict:
+    """Run every case in a directory and compare the results with the validation workbook.
+    Args:
+        cases_dir (str): Directory containing the case TOML files and validation workbook.
+        repeat (int): Number of times to run each case; the fastest run's timings are kept.
+    Returns:
+        dict: A history record with per-case timings and results, per-test comparisons and a summary.
+    """
+    names = sorted(f for f in os.listdir(cases_dir) if f.endswith(CASE_SUFFIX))
+    cases = {}
+    for name in names:
+        runs = [run_case(os.path.join(cases_dir, name)) for _ in range(max(repeat, 1))]
+        cases[name[:-len(CASE_SUFFIX)]] = min(runs, key=lambda r: r["seconds"])
+
+    tests = compare_to_references(cases, read_reference_ranges(cases_dir))
+    stage_totals = {}
+    for case in cases.values():
+        for stage, seconds in case["stages"].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "summary": {
+            "cases": len(cases),
+            "seconds": sum(c["seconds"] for c in cases.values()),
+            "stages": stage_totals,
+            "tests": len(tests),
+            "tests_in_range": sum(t["in_range"] for t in tests),
+        },
+        "cases": cases,
+        "tests": tests,
+    }
+
+
+def read_history(history_file: str) -> list[dict]:
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file) as f:
+        return json.load(f)
+
+
+def append_history(history_file: str, record: dict) -> None:
+    """Append a record to the JSON history file, creating it if needed."""
+    history = read_history(history_file)
+    history.append(record)
+    os.makedirs(os.path.dirname(os.path.abspath(history_file)), exist_ok=True)
+    tmp = f"{history_file}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, history_file)
+
+
+def get_regressions(previous: dict, current: dict) -> list[str]:
+    """List the tests that were in range in the previous record but are not in the current one."""
+    def key(test: dict) -> tuple:
+        return test["kind"], test["case"]
+    passed_before = {key(t) for t in previous["tests"] if t["in_range"]}
+    return [f"{t['kind']} {t['case']}" for t in current["tests"] if key(t) in passed_before and not t["in_range"]]
+
+
+def format_report(record: dict, previous: Optional[dict] = None) -> str:
+    summary = record["summary"]
+    lines = [
+        f"{summary['cases']} cases in {summary['seconds']:.3f}s; "
+        f"{summary['tests_in_range']}/{summary['tests']} tests in range",
+        "Stages: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in summary["stages"].items()),
+    ]
+    for test in record["tests"]:
+        label = test["case"] if test["kind"] == "absolute" else f"{test['case']} - {test['baseline']}"
+        status = "ok" if test["in_range"] else "OUT"
+        lines.append(
+            f"  {status:3} {test['kind']:8} {label:14} {test['value']:8.3f} "
+            f"[{test['ref_min']:.2f}, {test['ref_max']:.2f}] MWh/yr"
+        )
+    if previous is not None:
+        speedup = previous["summary"]["seconds"] / summary["seconds"] if summary["seconds"] else float("nan")
+        lines.append(f"Compared with {previous.get('commit') or 'previous run'}: {speedup:.2f}x speed")
+        lines.extend(f"  regression: {r}" for r in get_regressions(previous, record))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=CASES_DIR, help="Directory of case TOML files and the validation workbook.")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON history file to append results to.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is recorded.")
+    parser.add_argument("--no-save", action="store_true", help="Do not append to the history file.")
+    parser.add_argument(
+        "--fail-on-regression", action="store_true",
+        help="Exit with an error if a test that was in range in the previous record is now out of range.",
+    )
+    args = parser.parse_args(argv)
+
+    record = run_benchmark(args.cases, args.repeat)
+    history = read_history(args.history)
+    previous = history[-1] if history else None
+    print(format_report(record, previous))
+    if not args.no_save:
+        append_history(args.history, record)
+    if args.fail_on_regression and previous is not None and get_regressions(previous, record):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Measure what the envelope cache saves: deriving envelopes against fingerprinting them for a cache hit.
+
+For each batch size, a seeded synthetic portfolio is timed through envelope.derive_envelope_batch,
+envelope.get_envelope_fingerprints and a cached envelope.get_envelope_batch (see benchmarks.micro.time_function).
+
+Usage:
+    python -m benchmarks.envelope [--sizes 1,1000,10000] [--output envelope.json]
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.simulations import envelope
+from src.openbes.types import OpenBESParameters
+from .micro import format_seconds, time_function
+
+DEFAULT_SIZES = [1, 1_000, 10_000]
+FUNCTIONS = {
+    "derive": envelope.derive_envelope_batch,
+    "fingerprint": envelope.get_envelope_fingerprints,
+    "cached": envelope.get_envelope_batch,
+}
+
+
+def run_envelope(sizes: list[int], seed: int = 0, samples: int = 5, min_time: float = 0.05) -> list[dict]:
+    """Time each envelope function on synthetic batches of each size.
+    Args:
+        sizes (list[int]): Numbers of buildings.
+        seed (int): Seed for the synthetic portfolios.
+        samples (int): Timed samples per function (see benchmarks.micro.time_function).
+        min_time (float): Minimum duration of each sample in seconds.
+    Returns:
+        list[dict]: One entry per size with the median seconds per call of each function.
+    """
+    parameters = OpenBESParameters()
+    results = []
+    for size in sizes:
+        specs = generate_portfolio(size, seed=seed)
+        results.append({
+            "buildings": size,
+            **{
+                name: time_function(lambda f=function: f(specs, parameters), samples=samples, min_time=min_time).median
+                for name, function in FUNCTIONS.items()
+            },
+        })
+    return results
+
+
+def format_results(results: list[dict]) -> str:
+    lines = [f"{'buildings':>10} " + " ".join(f"{name:>12}" for name in FUNCTIONS)]
+    for r in results:
+        lines.append(f"{r['buildings']:>10} " + " ".join(f"{format_seconds(r[name]):>12}" for name in FUNCTIONS))
+    return "\n".join(lines)
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES, help="Comma-separated batch sizes.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = run_envelope(args.sizes, args.seed)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
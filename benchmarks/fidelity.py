@@ -0,0 +1,175 @@
+"""
+Compare the fidelity tiers of the batch pipeline against hourly on the ASHRAE Standard 140 cases.
+
+Every case is run at each fidelity (see pipeline.FIDELITIES). For each energy use category, each
+tier's annual total is compared with the hourly one, and its monthly values by their CV(RMSE)
+against the hourly months (as in ASHRAE Guideline 14). Each tier's batch_pipeline time per building
+is measured after a warmup run.
+
+Every stage is a monthly model for now, so every tier should match hourly exactly; the comparison
+shows the cost of a cheaper tier once a stage with a finer resolution is added. The ASHRAE cases only
+exercise heating and cooling, which are not simulated yet, so they have nothing to compare until then;
+--synthetic N also compares the tiers on a seeded synthetic portfolio of N buildings, which have lighting,
+hot water and ventilation.
+
+Usage:
+    python -m benchmarks.fidelity [--cases-dir DIR] [--synthetic 2000] [--output fidelity.json] [--max-error 5]
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame, concat
+
+from src.openbes.cli import read_input
+from src.openbes.pipeline import batch_pipeline, FIDELITIES, HOURLY
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.types import ENERGY_USE_CATEGORIES, OpenBESParameters
+from .ashrae140 import CASES_DIR
+
+CATEGORIES = ENERGY_USE_CATEGORIES.list()
+# Annual totals below this are not compared in percent
+MIN_ANNUAL_KWH = 1.0
+
+
+def run_tier(groups: list, fidelity: str) -> tuple[DataFrame, float]:
+    """Run every building at one fidelity.
+    Args:
+        groups (list): Buildings grouped by simulation parameters, as from cli.read_input.
+        fidelity (str): One of FIDELITIES.
+    Returns:
+        tuple[DataFrame, float]: Results as from batch_pipeline, and the seconds they took.
+    """
+    results = []
+    seconds = 0.0
+    for parameters, batches in groups:
+        for specs in batches:
+            start = time.perf_counter()
+            results.append(batch_pipeline(specs, parameters, fidelity))
+            seconds += time.perf_counter() - start
+    return concat(results), seconds
+
+
+def synthetic_groups(size: int, seed: int = 0) -> list:
+    """Return a synthetic portfolio, grouped as from cli.read_input."""
+    return [(OpenBESParameters(), [generate_portfolio(size, seed=seed)])]
+
+
+def compare_tiers(groups: list, fidelities: tuple = FIDELITIES) -> dict:
+    """Run buildings at each fidelity and measure their errors against hourly.
+    Args:
+        groups (list): Buildings grouped by simulation parameters, as from cli.read_input
+            (e.g. cli.read_input(CASES_DIR, None) for the ASHRAE 140 cases) or synthetic_groups.
+        fidelities (tuple): Fidelities to compare.
+    Returns:
+        dict: Per-building records (annual kWh, annual error and monthly CV(RMSE) in percent, by fidelity
+            and category) and a summary per fidelity (time per building, and for each category the mean and
+            max absolute annual error and the mean monthly CV(RMSE)).
+    """
+    buildings = sum(len(specs) for _, batches in groups for specs in batches)
+    results, seconds = {}, {}
+    for fidelity in {*fidelities, HOURLY}:
+        run_tier(groups, fidelity)  # warmup
+        results[fidelity], seconds[fidelity] = run_tier(groups, fidelity)
+
+    reference = results[HOURLY]
+    records = []
+    for fidelity in fidelities:
+        for category in CATEGORIES:
+            expected = reference.xs(category, level="category")
+            estimate = results[fidelity].xs(category, level="category").loc[expected.index]
+            for building, hourly_months in expected.iterrows():
+                months = estimate.loc[building].to_numpy()
+                hourly = float(hourly_months.sum())
+                compared = hourly >= MIN_ANNUAL_KWH
+                rmse = np.sqrt(np.mean((months - hourly_months.to_numpy()) ** 2))
+                records.append({
+                    "building": str(building),
+                    "fidelity": fidelity,
+                    "category": category,
+                    "annual_kwh": float(months.sum()),
+                    "hourly_kwh": hourly,
+                    "error_percent": 100 * (months.sum() - hourly) / hourly if compared else None,
+                    "cv_rmse_percent": 100 * rmse / (hourly / len(months)) if compared else None,
+                })
+
+    summary = {}
+    for fidelity in fidelities:
+        summary[fidelity] = {"microseconds_per_building": 1e6 * seconds[fidelity] / buildings}
+        for category in CATEGORIES:
+            compared = [
+                r for r in records
+                if r["fidelity"] == fidelity and r["category"] == category and r["error_percent"] is not None
+            ]
+            errors = np.abs([r["error_percent"] for r in compared])
+            summary[fidelity][category] = {
+                "mean_abs_error_percent": float(errors.mean()) if compared else None,
+                "max_abs_error_percent": float(errors.max()) if compared else None,
+                "mean_cv_rmse_percent": float(np.mean([r["cv_rmse_percent"] for r in compared])) if compared else None,
+            }
+    return {"buildings": buildings, "records": records, "summary": summary}
+
+
+def format_report(comparison: dict, title: str) -> str:
+    lines = [
+        f"{title}: {comparison['buildings']} buildings against hourly",
+        f"{'fidelity':>9} {'us/bldg':>9} {'category':>17} {'mean err':>9} {'max err':>9} {'CV(RMSE)':>9}",
+    ]
+    for fidelity, summary in comparison["summary"].items():
+        # Categories with no building above MIN_ANNUAL_KWH are left out
+        compared = [c for c in CATEGORIES if summary[c]["mean_abs_error_percent"] is not None] or ["-"]
+        for category in compared:
+            cells = ["-"] * 3 if category == "-" else [
+                f"{summary[category][key]:.2f}%"
+                for key in ("mean_abs_error_percent", "max_abs_error_percent", "mean_cv_rmse_percent")
+            ]
+            lines.append(
+                f"{fidelity:>9} {summary['microseconds_per_building']:>9.0f} {category:>17} "
+                + " ".join(f"{c:>9}" for c in cells)
+            )
+    return "\n".join(lines)
+
+
+def get_failures(comparison: dict, max_error: float) -> list[str]:
+    """Return the tiers and categories whose largest annual error exceeds max_error percent."""
+    return [
+        f"{fidelity} {category}"
+        for fidelity, summary in comparison["summary"].items()
+        for category in CATEGORIES
+        if (summary[category]["max_abs_error_percent"] or 0) > max_error
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases-dir", default=CASES_DIR)
+    parser.add_argument("--synthetic", type=int, default=0, help="Also compare on a synthetic portfolio of this size.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic portfolio.")
+    parser.add_argument("--output", default=None, help="Write the comparison to this JSON file.")
+    parser.add_argument(
+        "--max-error", type=float, default=None,
+        help="Fail if any tier's annual error in any category exceeds this many percent on any case.",
+    )
+    args = parser.parse_args(argv)
+
+    comparisons = {"ashrae140": compare_tiers(read_input(args.cases_dir, None))}
+    if args.synthetic:
+        comparisons["synthetic"] = compare_tiers(synthetic_groups(args.synthetic, args.seed))
+    print("\n\n".join(format_report(comparison, title) for title, comparison in comparisons.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(comparisons, f, indent=1)
+    if args.max_error is not None:
+        # Only the ASHRAE cases are held to the threshold: synthetic buildings include extreme inputs
+        failures = get_failures(comparisons["ashrae140"], args.max_error)
+        if failures:
+            print(f"Error above {args.max_error}%: {', '.join(failures)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Microbenchmarks for the hot single-building functions, with regression thresholds.
+
+Each benchmark is warmed up, then timed over several samples (each sample runs the function
+enough times to last at least --min-time seconds). The median and interquartile range of the
+time per call are compared against a stored baseline, and the run fails if any function's
+median is slower than its baseline by more than --threshold percent.
+
+The runner uses only the standard library.
+
+Usage:
+    python -m benchmarks.micro --save-baseline       # record a baseline
+    python -m benchmarks.micro [--threshold 20]      # compare against it
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, asdict, replace
+from typing import Callable, Optional
+
+from src.openbes import cases
+from src.openbes.pipeline import pipeline
+from src.openbes.simulations import climate, hot_water, lighting, occupancy, ventilation
+from src.openbes.types import OpenBESSpecification, OpenBESParameters
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "micro_baseline.json")
+DEFAULT_THRESHOLD = 20.0  # percent
+DEFAULT_WARMUP = 2
+DEFAULT_SAMPLES = 7
+DEFAULT_MIN_TIME = 0.05  # seconds per sample
+
+# Holywell House, with the occupancy and climate the single-building functions read
+HOLYWELL_HOUSE = replace(
+    cases.HOLYWELL_HOUSE,
+    occupancy_open_office=9,
+    occupancy_close_office=17,
+    schedule_monday=1,
+    schedule_tuesday=1,
+    schedule_wednesday=1,
+    schedule_thursday=1,
+    schedule_friday=1,
+    meteorological_file="UK_Oxford_GBR_ENG_RAF.Benson.036580_TMYx.2007-2021.epw",
+)
+
+BENCHMARKS: dict[str, Callable[[], object]] = {
+    "lighting.get_w_per_luminaire": lambda: lighting.get_w_per_luminaire(HOLYWELL_HOUSE, 1),
+    "lighting.get_kwh_per_month": lambda: lighting.get_kwh_per_month(HOLYWELL_HOUSE),
+    "occupancy.get_occupancy_by_hour": lambda: occupancy.get_occupancy_by_hour(HOLYWELL_HOUSE),
+    "hot_water.get_hot_water_per_month": lambda: hot_water.get_hot_water_per_month(HOLYWELL_HOUSE),
+    "ventilation.get_ventilation_per_month": lambda: ventilation.get_ventilation_per_month(HOLYWELL_HOUSE),
+    "climate.get_hourly_dry_bulb_temperature": lambda: climate.get_hourly_dry_bulb_temperature(HOLYWELL_HOUSE),
+    "pipeline.pipeline": lambda: pipeline(OpenBESSpecification(), OpenBESParameters()),
+}
+
+
+@dataclass
+class Timing:
+    """Seconds per call of one benchmark."""
+    median: float
+    iqr: float
+    samples: int
+    loops: int
+
+
+def time_function(
+        func: Callable[[], object],
+        warmup: int = DEFAULT_WARMUP,
+        samples: int = DEFAULT_SAMPLES,
+        min_time: float = DEFAULT_MIN_TIME,
+) -> Timing:
+    """Time a function, reporting the median and interquartile range of the time per call.
+    Args:
+        func (Callable): The function to time, called without arguments.
+        warmup (int): Untimed calls before sampling (to fill caches and import lazily loaded modules).
+        samples (int): Number of timed samples.
+        min_time (float): Minimum duration of each sample in seconds; fast functions are looped to reach it.
+    Returns:
+        Timing: Statistics of the time per call.
+    """
+    for _ in range(warmup):
+        func()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    per_call = [elapsed / loops]
+    for _ in range(samples - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        per_call.append((time.perf_counter() - start) / loops)
+    quartiles = statistics.quantiles(per_call, n=4) if len(per_call) > 1 else [per_call[0]] * 3
+    return Timing(statistics.median(per_call), quartiles[2] - quartiles[0], len(per_call), loops)
+
+
+def read_baseline(baseline_file: str) -> dict[str, Timing]:
+    if not os.path.exists(baseline_file):
+        return {}
+    with open(baseline_file) as f:
+        return {name: Timing(**timing) for name, timing in json.load(f).items()}
+
+
+def write_baseline(baseline_file: str, timings: dict[str, Timing]) -> None:
+    """Merge timings into the baseline file, creating it if needed."""
+    baseline = {name: asdict(t) for name, t in read_baseline(baseline_file).items()}
+    baseline.update({name: asdict(t) for name, t in timings.items()})
+    os.makedirs(os.path.dirname(os.path.abspath(baseline_file)), exist_ok=True)
+    with open(baseline_file, "w") as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+
+
+def get_slowdown(timing: Timing, baseline: Optional[Timing]) -> Optional[float]:
+    """Percentage by which a median is slower than its baseline (negative when faster)."""
+    if baseline is None or baseline.median <= 0:
+        return None
+    return (timing.median / baseline.median - 1) * 100
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("names", nargs="*", help="Benchmarks to run (substring match). Defaults to all.")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="JSON baseline file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these timings as the baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail if a median is more than this percentage slower than the baseline.")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME)
+    args = parser.parse_args(argv)
+    # Keep warnings from the functions under test out of the report without skipping their cost
+    logging.getLogger().addHandler(logging.NullHandler())
+
+    names = [n for n in BENCHMARKS if not args.names or any(pattern in n for pattern in args.names)]
+    baseline = read_baseline(args.baseline)
+    timings = {}
+    regressions = []
+    print(f"{'benchmark':42} {'median':>9} {'iqr':>9} {'baseline':>9} {'change':>8}")
+    for name in names:
+        timing = time_function(BENCHMARKS[name], args.warmup, args.samples, args.min_time)
+        timings[name] = timing
+        slowdown = get_slowdown(timing, baseline.get(name))
+        reference = format_seconds(baseline[name].median) if name in baseline else "-"
+        change = "-" if slowdown is None else f"{slowdown:+.1f}%"
+        flag = ""
+        if slowdown is not None and slowdown > args.threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:42} {format_seconds(timing.median):>9} {format_seconds(timing.iqr):>9} {reference:>9} {change:>8}{flag}")
+
+    if args.save_baseline:
+        write_baseline(args.baseline, timings)
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:g}%")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Measure how portfolio throughput scales with the number of buildings and worker processes.
+
+For each portfolio size, a seeded synthetic portfolio is run through run_portfolio once per
+pool size, writing results to a temporary directory. Each run reports buildings per second,
+peak resident memory (including workers) and parallel efficiency: throughput divided by the
+single-worker throughput times the number of workers.
+
+Usage:
+    python -m benchmarks.scaling [--sizes 1,100,10000,100000] [--jobs 1,2,4] [--output scaling.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Optional
+
+from src.openbes.portfolio.runner import run_portfolio
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.portfolio.writer import ResultWriter
+from src.openbes.types import OpenBESParameters
+
+DEFAULT_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+DEFAULT_CHUNK_SIZE = 1_000
+
+
+def default_jobs() -> list[int]:
+    cores = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= cores:
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != cores:
+        jobs.append(cores)
+    return jobs
+
+
+def run_scaling(
+        sizes: list[int],
+        jobs: list[int],
+        seed: int = 0,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[dict]:
+    """Run synthetic portfolios of each size with each pool size.
+    Args:
+        sizes (list[int]): Numbers of buildings.
+        jobs (list[int]): Numbers of worker processes (1 simulates in this process).
+        seed (int): Seed for the synthetic portfolios.
+        chunk_size (int): Buildings per chunk handed to a worker.
+    Returns:
+        list[dict]: One entry per (size, jobs) with buildings per second, peak RSS and parallel efficiency.
+    """
+    results = []
+    for size in sizes:
+        portfolio = generate_portfolio(size, seed=seed)
+        single_worker = None
+        for n_jobs in jobs:
+            with tempfile.TemporaryDirectory() as output_dir:
+                summary = run_portfolio(
+                    [portfolio], OpenBESParameters(), ResultWriter(output_dir), jobs=n_jobs, chunk_size=chunk_size
+                )
+            throughput = summary.buildings_per_second
+            if n_jobs == 1:
+                single_worker = throughput
+            results.append({
+                "buildings": size,
+                "jobs": n_jobs,
+                "seconds": summary.seconds,
+                "buildings_per_second": throughput,
+                "peak_rss_bytes": summary.peak_rss_bytes,
+                "parallel_efficiency": throughput / (single_worker * n_jobs) if single_worker else None,
+            })
+    return results
+
+
+def format_results(results: list[dict]) -> str:
+    lines = [f"{'buildings':>10} {'jobs':>5} {'seconds':>9} {'bldg/s':>10} {'peak RSS':>10} {'efficiency':>10}"]
+    for r in results:
+        efficiency = "-" if r["parallel_efficiency"] is None else f"{r['parallel_efficiency']:.0%}"
+        lines.append(
+            f"{r['buildings']:>10} {r['jobs']:>5} {r['seconds']:>9.3f} {r['buildings_per_second']:>10.1f} "
+            f"{r['peak_rss_bytes'] / 2 ** 20:>8.0f}MB {efficiency:>10}"
+        )
+    return "\n".join(lines)
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES, help="Comma-separated portfolio sizes.")
+    parser.add_argument("--jobs", type=_int_list, default=None, help="Comma-separated pool sizes (default 1, 2, 4 ... cores).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    jobs = args.jobs or default_jobs()
+    if 1 not in jobs:
+        jobs = [1, *jobs]  # needed for parallel efficiency
+    results = run_scaling(args.sizes, sorted(jobs), args.seed, args.chunk_size)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Measure /simulate latency through HTTP, as a client of the local simulation service sees it.
+
+A service is started on a free port with the ASHRAE 600 case's parameters and climate loaded. One
+keep-alive client then posts that case with a different appliances_load each time ("new"), so every
+request is simulated, and posts the same specs again ("repeated"), which the result cache answers.
+
+Usage:
+    python -m benchmarks.service [--requests 300] [--jobs 0] [--output service.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from src.openbes import service
+from src.openbes.cases import read_case
+from src.openbes.types.coercion import parameters_from_dict
+from .ashrae140 import CASES_DIR
+
+CASE = os.path.join(CASES_DIR, "600.toml")
+CLIMATE = "725650_Denver"
+DEFAULT_REQUESTS = 300
+DEFAULT_WARMUP = 20
+
+
+def run_service(requests: int = DEFAULT_REQUESTS, jobs: int = 0, warmup: int = DEFAULT_WARMUP) -> dict:
+    """Time /simulate requests for new and repeated specifications.
+    Args:
+        requests (int): Timed requests of each kind.
+        jobs (int): Worker processes of the service (see service.SimulationService).
+        warmup (int): Untimed requests sent first.
+    Returns:
+        dict: For "new" and "repeated" requests, the p50, p90 and p99 latency in milliseconds.
+    """
+    spec, parameters_data = read_case(CASE)
+    simulation_service = service.SimulationService(
+        parameters_from_dict(parameters_data), jobs=jobs, climates=[CLIMATE]
+    )
+    server = service.make_server(simulation_service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+
+    def post(appliances_load: float) -> float:
+        body = json.dumps({"spec": dict(spec, appliances_load=appliances_load)}).encode()
+        start = time.perf_counter()
+        connection.request("POST", "/simulate", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"/simulate returned {response.status}")
+        return (time.perf_counter() - start) * 1000
+
+    try:
+        for i in range(warmup):
+            post(-1.0 - i)
+        latencies = {
+            "new": [post(float(i)) for i in range(requests)],
+            "repeated": [post(float(i)) for i in range(requests)],
+        }
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+        simulation_service.close()
+    result = {"requests": requests, "jobs": jobs}
+    for kind, values in latencies.items():
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        result[kind] = {"p50": float(p50), "p90": float(p90), "p99": float(p99), "mean": statistics.fmean(values)}
+    return result
+
+
+def format_result(result: dict) -> str:
+    lines = [f"{'requests':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"]
+    for kind in ("new", "repeated"):
+        r = result[kind]
+        lines.append(f"{kind:>10} {r['p50']:>8.2f} {r['p90']:>8.2f} {r['p99']:>8.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Timed requests of each kind.")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes of the service.")
+    parser.add_argument("--output", default=None, help="Write the result to this JSON file.")
+    args = parser.parse_args(argv)
+
+    result = run_service(args.requests, args.jobs)
+    print(format_result(result))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
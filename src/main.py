@@ -1,6 +1,7 @@
-def main():
-    print("Hello from openBES!")
+import sys
+
+from openbes.cli import main
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
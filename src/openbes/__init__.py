@@ -0,0 +1,35 @@
+"""
+OpenBES building energy simulation.
+
+Submodules are imported when first accessed (e.g. `openbes.pipeline`), so importing the
+package itself does not pull in pandas or the simulation engines.
+"""
+import importlib
+
+SUBMODULES = {
+    "aio",
+    "calibration",
+    "cases",
+    "cli",
+    "diagnostics",
+    "pipeline",
+    "portfolio",
+    "profiling",
+    "retrofit",
+    "service",
+    "simulations",
+    "surrogate",
+    "types",
+    "validation",
+    "wip",
+}
+
+
+def __getattr__(name: str):
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | SUBMODULES)
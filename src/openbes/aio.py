@@ -0,0 +1,102 @@
+"""
+Asyncio-friendly simulation API.
+
+The engines are synchronous and CPU-bound, so these coroutines run them on an executor rather
+than on the event loop: the loop's default thread pool, or any Executor passed in (e.g. a
+ProcessPoolExecutor, to simulate on several cores).
+
+Climate files that a stage reads (see pipeline.CLIMATE_STAGES) are loaded on a thread before the
+simulation is submitted, and coroutines that need the same file while it is loading share one load. Cancelling a coroutine cancels its
+work if an executor has not started it yet; work already running finishes, and its result
+is discarded. A shared climate load is never cancelled, as other coroutines may be waiting for it.
+
+    results = await batch_pipeline_async(specs, parameters, executor=pool)
+"""
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from pandas import DataFrame
+
+from .pipeline import batch_pipeline, pipeline, CLIMATE_STAGES
+from .simulations.climate import load_climate
+from .types import OpenBESSpecification, OpenBESParameters
+
+# Climate loads started on each event loop, by meteorological_file
+_climate_loads: WeakKeyDictionary = WeakKeyDictionary()
+
+
+async def _run(executor: Optional[Executor], function: Callable, *args):
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        call = partial(function, *args)
+    else:
+        # Threads see this task's context, e.g. its diagnostics collector and profiling hooks
+        call = partial(contextvars.copy_context().run, function, *args)
+    # Cancelling the awaiting task cancels the executor's future if it has not started
+    return await loop.run_in_executor(executor, call)
+
+
+async def load_climate_async(name: str) -> np.ndarray:
+    """Load a climate file on a thread of the event loop's default executor (see climate.load_climate).
+
+    Concurrent calls for the same file share one load, and later calls return at once.
+    Args:
+        name (str): The meteorological_file value.
+    Returns:
+        np.ndarray: float64 array of shape (len(CLIMATE_VARIABLES), HOURS_PER_YEAR).
+    """
+    loop = asyncio.get_running_loop()
+    loads = _climate_loads.setdefault(loop, {})
+    load = loads.get(name)
+    if load is None or (load.done() and (load.cancelled() or load.exception() is not None)):
+        # Failed loads are retried by the next caller
+        load = loads[name] = loop.run_in_executor(None, load_climate, name)
+    return await asyncio.shield(load)
+
+
+async def batch_pipeline_async(
+        specs: DataFrame,
+        parameters: OpenBESParameters,
+        executor: Optional[Executor] = None,
+) -> DataFrame:
+    """Run batch_pipeline on an executor, loading the batch's climate files first without blocking.
+
+    As with batch_pipeline, files that cannot be loaded are skipped, and none are loaded while no stage reads them.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building
+            (see openbes.portfolio.reader).
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        executor (Optional[Executor]): Where to simulate. Defaults to the event loop's default executor.
+            Process workers load the climate files they need themselves.
+    Returns:
+        DataFrame: kWh indexed by (building, energy use category), with a column per month.
+    """
+    if CLIMATE_STAGES and not isinstance(executor, ProcessPoolExecutor):
+        climates = {c for c in specs["meteorological_file"].dropna().unique() if isinstance(c, str) and c}
+        loads = await asyncio.gather(*(load_climate_async(c) for c in climates), return_exceptions=True)
+        for load in loads:
+            # Unresolvable files are skipped, as by climate.load_climates
+            if isinstance(load, BaseException) and not isinstance(load, (FileNotFoundError, ValueError)):
+                raise load
+    return await _run(executor, batch_pipeline, specs, parameters)
+
+
+async def pipeline_async(
+        spec: OpenBESSpecification,
+        parameters: OpenBESParameters,
+        executor: Optional[Executor] = None,
+) -> float:
+    """Run the single-building pipeline on an executor (see pipeline.pipeline).
+    Args:
+        spec (OpenBESSpecification): The building specification.
+        parameters (OpenBESParameters): Dictionary of simulation parameters.
+        executor (Optional[Executor]): Where to simulate. Defaults to the event loop's default executor.
+    Returns:
+        float: As pipeline.pipeline.
+    """
+    return await _run(executor, pipeline, spec, parameters)
@@ -0,0 +1,266 @@
+"""
+Calibrate a building's uncertain inputs against its metered monthly bills.
+
+A specification carries metered kWh per month (electricity_january…electricity_december and
+gas_january…gas_december) and annual totals (electricity_annual, natural_gas_annual). calibrate
+scales uncertain inputs (see CALIBRATION_PARAMETERS) to bring the simulated bills closest to the
+metered ones. It uses a cross-entropy search in which every iteration evaluates a whole population
+of candidate specifications as one batch.
+
+Only the stages that read a calibrated field run per candidate; the others run once. Heating and
+cooling are not simulated yet, so the bill that heating is metered on is left out of the fit.
+Results are judged by the monthly criteria of ASHRAE Guideline 14.
+"""
+import calendar
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from .diagnostics import collecting
+from .pipeline import CATEGORY_STAGES, STAGE_FIELDS, evaluate
+from .portfolio.reader import specs_to_frame
+from .simulations import hot_water
+from .simulations.lighting import LIGHTING_ZONES
+from .types import ENERGY_SOURCES, ENERGY_USE_CATEGORIES, OpenBESParameters, OpenBESSpecification
+
+ELECTRICITY = "electricity"
+GAS = "gas"
+BILLS = (ELECTRICITY, GAS)
+# Field of each bill's annual total, used for bills without monthly values
+ANNUAL_BILL_FIELDS = {ELECTRICITY: "electricity_annual", GAS: "natural_gas_annual"}
+# Energy use categories metered on the electricity bill; heating goes to the bill given to calibrate.
+# Hot water from the pipeline is electric only; gas-fired hot water is added to the gas bill.
+ELECTRIC_CATEGORIES = [
+    ENERGY_USE_CATEGORIES.Others,
+    ENERGY_USE_CATEGORIES.Building_standby,
+    ENERGY_USE_CATEGORIES.Lighting,
+    ENERGY_USE_CATEGORIES.Hot_water,
+    ENERGY_USE_CATEGORIES.Ventilation,
+    ENERGY_USE_CATEGORIES.Cooling,
+]
+# ASHRAE Guideline 14 limits for calibration to monthly data, in percent
+MAX_CV_RMSE_PERCENT = 15.0
+MAX_ABS_NMBE_PERCENT = 5.0
+# Weight of the squared log of each factor in the objective, so that among factors that fit
+# the bills equally well (e.g. lighting hours and simultaneity) the smallest change wins
+REGULARIZATION = 0.01
+# Share of each population whose mean and spread the next population is drawn from
+ELITE_FRACTION = 0.2
+
+
+@dataclass(frozen=True)
+class CalibrationParameter:
+    """An uncertain input: a factor, within bounds, that scales some specification fields."""
+    fields: tuple[str, ...]
+    low: float
+    high: float
+    # Largest value the scaled fields may take, if any
+    limit: Optional[float] = None
+
+
+CALIBRATION_PARAMETERS = {
+    "lighting_simultaneity_factor": CalibrationParameter(
+        tuple(f"lighting_system_simultaneity_factor_z{zone}" for zone in LIGHTING_ZONES), 0.5, 2.0, limit=1.0
+    ),
+    "lighting_operating_hours": CalibrationParameter(
+        tuple(f"lighting_system_operating_hours_z{zone}" for zone in LIGHTING_ZONES), 0.5, 2.0, limit=24.0
+    ),
+    "building_standby_load": CalibrationParameter(("building_standby_load",), 0.25, 4.0),
+    "water_demand": CalibrationParameter(("water_demand",), 0.25, 4.0),
+}
+
+
+@dataclass
+class Calibration:
+    """The result of calibrate."""
+    # The calibrated specification, and the factor applied to each parameter's fields
+    spec: OpenBESSpecification
+    factors: dict[str, float]
+    # Metered and simulated kWh, one row per bill and a column per month; NaN where nothing was metered
+    metered: DataFrame
+    simulated: DataFrame
+    # Monthly CV(RMSE) and NMBE of the simulated bills, in percent, over the metered months of every fitted bill
+    cv_rmse_percent: float
+    nmbe_percent: float
+    iterations: int
+    evaluations: int
+
+    @property
+    def meets_guideline14(self) -> bool:
+        """Whether the calibration meets the ASHRAE Guideline 14 criteria for monthly data."""
+        return self.cv_rmse_percent <= MAX_CV_RMSE_PERCENT and abs(self.nmbe_percent) <= MAX_ABS_NMBE_PERCENT
+
+
+def get_metered_bills(spec: OpenBESSpecification) -> DataFrame:
+    """Return the metered monthly kWh of a building, one row per bill and a column per month.
+    Args:
+        spec (OpenBESSpecification): The building specification.
+    Returns:
+        DataFrame: kWh indexed by bill, with a column per month; NaN where nothing was metered.
+    """
+    months = [calendar.month_name[m].lower() for m in range(1, 13)]
+    metered = np.array([
+        [np.nan if (v := getattr(spec, f"{bill}_{month}")) is None else v for month in months] for bill in BILLS
+    ], dtype=float)
+    return DataFrame(metered, index=list(BILLS), columns=[calendar.month_abbr[m] for m in range(1, 13)])
+
+
+def _observations(spec: OpenBESSpecification) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Metered values (monthly, or annual for bills without monthly values), which of the simulated
+    # (bills, 12 + 1) values each compares against, and the scale of each bill to weigh them equally
+    metered = get_metered_bills(spec).to_numpy()
+    values = np.full((len(BILLS), 13), np.nan)
+    values[:, :12] = metered
+    scale = np.ones((len(BILLS), 13))
+    for i, bill in enumerate(BILLS):
+        annual = getattr(spec, ANNUAL_BILL_FIELDS[bill])
+        if np.isnan(metered[i]).all():
+            values[i, 12] = annual if annual is not None else np.nan
+            typical = values[i, 12]
+        else:
+            typical = np.nanmean(metered[i])
+        if typical > 0:
+            scale[i] = typical
+    observed = ~np.isnan(values)
+    return values[observed], observed, scale[observed]
+
+
+def _simulated_bills(
+        specs: DataFrame,
+        by_category: dict[ENERGY_USE_CATEGORIES, np.ndarray],
+        heating_bill: Optional[str],
+) -> np.ndarray:
+    # kWh of shape (candidates, bills, 12 + 1): each bill per month, then its annual total
+    electricity = sum(by_category[c] for c in ELECTRIC_CATEGORIES)
+    gas = np.zeros_like(electricity)
+    heating = by_category[ENERGY_USE_CATEGORIES.Heating]
+    if heating_bill == ELECTRICITY:
+        electricity = electricity + heating
+    elif heating_bill == GAS:
+        gas = gas + heating
+    gas_water = specs["water_system_energy_source"].to_numpy(dtype=object) == ENERGY_SOURCES.Natural_gas
+    if gas_water.any():
+        gas = gas + np.where(gas_water[:, None], hot_water.get_hot_water_per_month_batch(specs).to_numpy(), 0.0)
+    bills = np.stack([electricity, gas], axis=1)
+    return np.concatenate([bills, bills.sum(axis=2, keepdims=True)], axis=2)
+
+
+def calibrate(
+        spec: OpenBESSpecification,
+        parameters: OpenBESParameters,
+        calibration_parameters: Optional[dict[str, CalibrationParameter]] = None,
+        heating_bill: Optional[str] = GAS,
+        population: int = 64,
+        max_iterations: int = 50,
+        tolerance: float = 1e-3,
+        seed: int = 0,
+) -> Calibration:
+    """Scale a building's uncertain inputs to fit its simulated bills to its metered ones.
+
+    The objective is the RMS of the differences between simulated and metered kWh, each relative
+    to the mean metered kWh of its bill, plus REGULARIZATION times the mean squared log factor.
+    Factors are searched in log space by the cross-entropy method: each iteration draws a
+    population of factors, evaluates them as one batch and moves towards the best ELITE_FRACTION,
+    until their spread falls below tolerance (relative to the bounds) or max_iterations.
+    Args:
+        spec (OpenBESSpecification): The building, with metered monthly bills or annual totals.
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        calibration_parameters (Optional[dict[str, CalibrationParameter]]): Inputs to adjust.
+            Defaults to CALIBRATION_PARAMETERS; parameters whose fields are all blank are left out.
+        heating_bill (Optional[str]): The bill that heating is metered on: ELECTRICITY, GAS or None.
+            Heating is not simulated, so this bill is reported but not fitted.
+        population (int): Candidates evaluated per iteration.
+        max_iterations (int): Largest number of iterations.
+        tolerance (float): Spread of the elite, as a share of the log bounds, at which to stop.
+        seed (int): Random seed; the same seed always gives the same calibration.
+    Returns:
+        Calibration: The calibrated specification, its factors and its fit.
+    Raises:
+        ValueError: If the building has no metered bills other than heating_bill, or heating_bill is unknown.
+    """
+    if heating_bill not in (*BILLS, None):
+        raise ValueError(f"Unknown bill {heating_bill} (expected {', '.join(BILLS)} or None)")
+    metered, observed, scale = _observations(spec)
+    if not len(metered):
+        raise ValueError("The building has no metered bills")
+    fitted = observed.copy()
+    if heating_bill is not None:
+        fitted[BILLS.index(heating_bill)] = False
+    if not fitted.any():
+        raise ValueError(f"The building's only metered bill, {heating_bill}, meters heating, which is not simulated")
+    # Metered values and scales of the fitted bills
+    kept = fitted[observed]
+    base = specs_to_frame([spec])
+    calibration_parameters = CALIBRATION_PARAMETERS if calibration_parameters is None else calibration_parameters
+    calibrated = {
+        name: p for name, p in calibration_parameters.items() if base[list(p.fields)].notna().to_numpy().any()
+    }
+    fields = {f for p in calibrated.values() for f in p.fields}
+    varying = [c for c, stage in CATEGORY_STAGES.items() if not STAGE_FIELDS[stage].isdisjoint(fields)]
+    fixed = evaluate(base, parameters, [c for c in ENERGY_USE_CATEGORIES if c not in varying])
+    by_category = {c: fixed.category(c).to_numpy() for c in fixed.categories}
+
+    def apply(factors: np.ndarray) -> DataFrame:
+        # Copies of the building with each row's factors applied
+        specs = base.iloc[np.zeros(len(factors), dtype=int)].copy()
+        for k, p in enumerate(calibrated.values()):
+            for field in p.fields:
+                scaled = base[field].to_numpy(dtype=float) * factors[:, k]
+                specs[field] = scaled if p.limit is None else np.fmin(scaled, p.limit)
+        return specs
+
+    def simulate(factors: np.ndarray) -> np.ndarray:
+        specs = apply(factors)
+        # Candidates repeat the building's own diagnostics, which the fixed run already reported
+        with collecting():
+            results = evaluate(specs, parameters, varying, ["monthly"])
+            candidates = {**by_category, **{c: results.category(c).to_numpy() for c in varying}}
+            return _simulated_bills(specs, candidates, heating_bill)
+
+    def objective(factors: np.ndarray) -> np.ndarray:
+        errors = (simulate(factors)[:, fitted] - metered[kept]) / scale[kept]
+        return np.sqrt(np.mean(errors ** 2, axis=1)) + REGULARIZATION * np.mean(np.log(factors) ** 2, axis=1)
+
+    rng = np.random.default_rng(seed)
+    low = np.log([p.low for p in calibrated.values()])
+    high = np.log([p.high for p in calibrated.values()])
+    mean = np.clip(np.zeros(len(calibrated)), low, high)
+    spread = (high - low) / 4
+    best, best_score = mean, objective(np.exp(mean[None, :]))[0]
+    elite = max(2, int(population * ELITE_FRACTION))
+    iterations, evaluations = 0, 1
+    while calibrated and iterations < max_iterations and np.max(spread / (high - low)) > tolerance:
+        candidates = np.clip(mean + spread * rng.standard_normal((population, len(calibrated))), low, high)
+        candidates[0] = best
+        scores = objective(np.exp(candidates))
+        order = np.argsort(scores)
+        if scores[order[0]] < best_score:
+            best, best_score = candidates[order[0]], scores[order[0]]
+        mean, spread = candidates[order[:elite]].mean(axis=0), candidates[order[:elite]].std(axis=0)
+        iterations += 1
+        evaluations += population
+
+    factors = np.exp(best)
+    calibrated_specs = apply(factors[None, :])
+    simulated_values = simulate(factors[None, :])[0]
+    errors = simulated_values[fitted] - metered[kept]
+    mean_metered = metered[kept].mean()
+    metered_table = np.full((len(BILLS), 13), np.nan)
+    metered_table[observed] = metered
+    months = [calendar.month_abbr[m] for m in range(1, 13)]
+    return Calibration(
+        spec=replace(spec, **{f: _optional(calibrated_specs[f].iloc[0]) for f in fields}),
+        factors={name: float(f) for name, f in zip(calibrated, factors)},
+        metered=DataFrame(metered_table[:, :12], index=list(BILLS), columns=months),
+        simulated=DataFrame(simulated_values[:, :12], index=list(BILLS), columns=months),
+        cv_rmse_percent=float(100 * np.sqrt(np.mean(errors ** 2)) / mean_metered),
+        nmbe_percent=float(100 * errors.sum() / (len(errors) * mean_metered)),
+        iterations=iterations,
+        evaluations=evaluations,
+    )
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
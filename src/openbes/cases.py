@@ -0,0 +1,90 @@
+"""
+Load building cases stored as TOML files.
+
+Each file is a flat table of "i.<field>" entries (building specification inputs) and
+"d.<field>" entries (simulation parameters), as exported from the OpenBES spreadsheet.
+Empty strings mark blank cells.
+"""
+import os
+import tomllib
+from typing import Any
+
+from .types import OpenBESSpecification, OpenBESParameters, LIGHTING_TECHNOLOGIES, LIGHTING_BALLASTS, ENERGY_SOURCES
+from .types.coercion import spec_from_dict, parameters_from_dict
+
+SPECIFICATION_PREFIX = "i."
+PARAMETERS_PREFIX = "d."
+CASE_SUFFIX = ".toml"
+
+# The Holywell House example building: the inputs that pipeline.pipeline fills in, for tests and benchmarks
+HOLYWELL_HOUSE = OpenBESSpecification(
+    other_electricity_usage=1136.0,
+    building_standby_load=2321.2,
+    lighting_system_name_z1="First Floor",
+    lighting_system_tech_z1=LIGHTING_TECHNOLOGIES.FT_T8,
+    lighting_system_lamp_number_z1=4,
+    lighting_system_lamp_power_z1=18,
+    lighting_system_ballast_z1=LIGHTING_BALLASTS.BE,
+    lighting_system_luminary_number_z1=35,
+    lighting_system_similar_zone_number_z1=1,
+    lighting_system_operating_hours_z1=8,
+    lighting_system_simultaneity_factor_z1=0.7,
+    lighting_system_name_z2="Second Floor",
+    lighting_system_tech_z2=LIGHTING_TECHNOLOGIES.LED,
+    lighting_system_lamp_number_z2=1,
+    lighting_system_lamp_power_z2=40,
+    lighting_system_luminary_number_z2=55,
+    lighting_system_similar_zone_number_z2=1,
+    lighting_system_operating_hours_z2=8,
+    lighting_system_simultaneity_factor_z2=0.7,
+    water_system_energy_source=ENERGY_SOURCES.Electricity,
+    water_system_efficiency_cop=1.0,
+    water_demand=300.0,
+    water_reference_temperature=60.0,
+    water_supply_temperature=16.0,
+    ventilation_system1_energy_source=ENERGY_SOURCES.Electricity,
+    ventilation_system1_rated_input_power=0.3,
+    ventilation_system1_on_time=10,
+    ventilation_system1_off_time=14,
+)
+
+
+def read_case(file_path: str) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Read the raw specification and parameter values of a TOML case file, before coercion.
+    Args:
+        file_path (str): Path to the case file.
+    Returns:
+        tuple[dict[str, Any], dict[str, Any]]: Specification and parameter field names to their values.
+    """
+    with open(file_path, "rb") as f:
+        data = tomllib.load(f)
+
+    def with_prefix(prefix: str) -> dict:
+        return {k[len(prefix):]: v for k, v in data.items() if k.startswith(prefix)}
+
+    return with_prefix(SPECIFICATION_PREFIX), with_prefix(PARAMETERS_PREFIX)
+
+
+def load_case(file_path: str) -> tuple[OpenBESSpecification, OpenBESParameters]:
+    """Read a specification and its simulation parameters from a TOML case file.
+    Args:
+        file_path (str): Path to the case file.
+    Returns:
+        tuple[OpenBESSpecification, OpenBESParameters]: The coerced specification and parameters.
+    """
+    spec_data, parameters_data = read_case(file_path)
+    return spec_from_dict(spec_data), parameters_from_dict(parameters_data)
+
+
+def load_cases(directory: str) -> dict[str, tuple[OpenBESSpecification, OpenBESParameters]]:
+    """Read every TOML case file in a directory.
+    Args:
+        directory (str): Directory containing the case files.
+    Returns:
+        dict[str, tuple[OpenBESSpecification, OpenBESParameters]]: Cases keyed by file name without
+            the extension (e.g. "600FF"), in file name order.
+    """
+    return {
+        name[:-len(CASE_SUFFIX)]: load_case(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory)) if name.endswith(CASE_SUFFIX)
+    }
@@ -0,0 +1,223 @@
+"""
+Command-line entry point for batch simulation.
+
+The input is a TOML case file, a directory of TOML case files, or a portfolio CSV/Parquet file
+(see openbes.portfolio.reader). Results are streamed to a partitioned output directory
+(see openbes.portfolio.writer) and a throughput summary is printed when the run finishes.
+
+Usage:
+    openbes INPUT --output DIR [--jobs N] [--chunk-size N] [--cache-dir DIR] [--profile [TRACE.json]]
+            [--fidelity monthly|daily|hourly]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from pandas import DataFrame
+
+from .cases import CASE_SUFFIX, load_case, load_cases
+from .diagnostics import DiagnosticsCollector
+from .pipeline import FIDELITIES, HOURLY
+from .portfolio.reader import CSV_SUFFIXES, PARQUET_SUFFIXES, read_portfolio, specs_to_frame
+from .portfolio.runner import run_portfolio
+from .portfolio.writer import CSV, PARQUET, ResultWriter
+from .profiling import ChromeTraceRecorder, StageHistogram, profile
+from .simulations.climate import set_cache_dir
+from .types import OpenBESParameters
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunTotals:
+    """Totals over the runs made for one invocation (one per set of simulation parameters)."""
+    buildings: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    diagnostics: DiagnosticsCollector = field(default_factory=DiagnosticsCollector)
+
+    @property
+    def buildings_per_second(self) -> float:
+        return self.buildings / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+
+def read_input(
+        input_path: str,
+        chunk_size: Optional[int],
+        parameters: Optional[OpenBESParameters] = None,
+) -> list[tuple[OpenBESParameters, Iterable[DataFrame]]]:
+    """Read the buildings to simulate, grouped by simulation parameters.
+    Args:
+        input_path (str): A TOML case, a directory of TOML cases, or a portfolio CSV/Parquet file.
+        chunk_size (Optional[int]): Buildings per batch read from a portfolio file.
+        parameters (Optional[OpenBESParameters]): Parameters for a portfolio file, which has none
+            of its own. Defaults to OpenBESParameters().
+    Returns:
+        list[tuple[OpenBESParameters, Iterable[DataFrame]]]: Batches to simulate with each set of parameters.
+            Cases are identified by their file name without the extension.
+    Raises:
+        ValueError: If the input is not a supported file type.
+    """
+    if os.path.isdir(input_path):
+        cases = load_cases(input_path)
+    elif input_path.lower().endswith(CASE_SUFFIX):
+        cases = {os.path.basename(input_path)[:-len(CASE_SUFFIX)]: load_case(input_path)}
+    elif input_path.lower().endswith(CSV_SUFFIXES + PARQUET_SUFFIXES):
+        chunks = read_portfolio(input_path, chunk_size) if chunk_size else read_portfolio(input_path)
+        return [(parameters or OpenBESParameters(), chunks)]
+    else:
+        raise ValueError(f"Unsupported input: {input_path} (expected a .toml case, a directory or a CSV/Parquet file)")
+
+    # batch_pipeline takes one set of parameters, so cases are simulated in groups that share them
+    groups: list[tuple[OpenBESParameters, list[str]]] = []
+    for name, (_, case_parameters) in cases.items():
+        for group_parameters, names in groups:
+            if group_parameters == case_parameters:
+                names.append(name)
+                break
+        else:
+            groups.append((case_parameters, [name]))
+    return [
+        (group_parameters, [specs_to_frame([cases[n][0] for n in names], names)])
+        for group_parameters, names in groups
+    ]
+
+
+def run(
+        input_path: str,
+        output: str,
+        jobs: int = 1,
+        chunk_size: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        file_format: str = CSV,
+        partition_by: Optional[str] = None,
+        parameters: Optional[OpenBESParameters] = None,
+        resume: bool = False,
+        validate: bool = False,
+        fidelity: str = HOURLY,
+) -> RunTotals:
+    """Simulate every building in the input and stream the results to the output directory.
+    Args:
+        input_path (str): See read_input.
+        output (str): Output directory (see ResultWriter).
+        jobs (int): Number of worker processes.
+        chunk_size (Optional[int]): Maximum buildings per chunk.
+        cache_dir (Optional[str]): Directory for binary copies of parsed climate files.
+        file_format (str): "csv" or "parquet".
+        partition_by (Optional[str]): Specification column to partition the output by.
+        parameters (Optional[OpenBESParameters]): Parameters for a portfolio file.
+        resume (bool): Continue an interrupted run in the output directory.
+        validate (bool): Reject buildings that fail validation instead of simulating them.
+        fidelity (str): Temporal resolution of the run (see pipeline.batch_pipeline).
+    Returns:
+        RunTotals: Buildings simulated, skipped and rejected, time taken and climate cache use.
+    """
+    if cache_dir is not None:
+        set_cache_dir(cache_dir)
+    totals = RunTotals()
+    start = time.perf_counter()
+    for i, (group_parameters, batches) in enumerate(read_input(input_path, chunk_size, parameters)):
+        # Later groups add to the run started by the first
+        writer = ResultWriter(output, file_format=file_format, partition_by=partition_by, resume=resume or i > 0)
+        summary = run_portfolio(
+            batches, group_parameters, writer, jobs=jobs, chunk_size=chunk_size, validate=validate, fidelity=fidelity,
+        )
+        totals.buildings += summary.buildings
+        totals.skipped += summary.skipped
+        totals.rejected += summary.rejected
+        totals.batches += summary.batches
+        totals.peak_rss_bytes = max(totals.peak_rss_bytes, summary.peak_rss_bytes)
+        totals.cache_hits += summary.cache_hits
+        totals.cache_misses += summary.cache_misses
+        totals.diagnostics.merge(summary.diagnostics)
+    totals.seconds = time.perf_counter() - start
+    return totals
+
+
+def format_totals(totals: RunTotals, jobs: int) -> str:
+    lines = [
+        f"Simulated {totals.buildings} buildings in {totals.seconds:.2f}s "
+        f"({totals.buildings_per_second:.1f} buildings/s, {jobs} job{'s' if jobs != 1 else ''}, {totals.batches} chunks)",
+    ]
+    if totals.skipped or totals.rejected:
+        lines.append(f"Skipped {totals.skipped} already completed, rejected {totals.rejected} invalid")
+    rate = totals.cache_hit_rate
+    lines.append(
+        "Climate cache: no climate files used" if rate is None else
+        f"Climate cache: {rate:.1%} hit rate ({totals.cache_hits} hits, {totals.cache_misses} files parsed)"
+    )
+    lines.append(f"Peak memory: {totals.peak_rss_bytes / 2 ** 20:.0f} MB")
+    if len(totals.diagnostics):
+        lines.append(f"Input problems: {len(totals.diagnostics)} (see log)")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="openbes", description="Run the OpenBES batch simulation.")
+    parser.add_argument("input", help="A TOML case, a directory of TOML cases, or a portfolio CSV/Parquet file.")
+    parser.add_argument("-o", "--output", required=True, help="Directory to write results into.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (default 1: this process).")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Maximum buildings per chunk.")
+    parser.add_argument("--cache-dir", default=None, help="Keep parsed climate files here between runs.")
+    parser.add_argument(
+        "--profile", nargs="?", const="", default=None, metavar="TRACE.json",
+        help="Print per-stage timings; with a path, also write a Chrome trace. "
+             "Stages run in worker processes are not included.",
+    )
+    parser.add_argument("--format", choices=[CSV, PARQUET], default=CSV, help="Output file format.")
+    parser.add_argument("--partition-by", default=None, help="Specification column to partition the output by.")
+    parser.add_argument("--parameters", default=None, help="TOML case whose d.* parameters apply to a portfolio file.")
+    parser.add_argument("--validate", action="store_true", help="Reject invalid buildings instead of simulating them.")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run in the output directory.")
+    parser.add_argument(
+        "--fidelity", choices=FIDELITIES, default=HOURLY,
+        help="Temporal resolution of the run. Every stage is monthly for now, so all give the same results.",
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    parameters = load_case(args.parameters)[1] if args.parameters else None
+
+    hooks = []
+    histogram = recorder = None
+    if args.profile is not None:
+        histogram = StageHistogram()
+        hooks.append(histogram)
+        if args.profile:
+            recorder = ChromeTraceRecorder()
+            hooks.append(recorder)
+    try:
+        with profile(*hooks):
+            totals = run(
+                args.input, args.output, jobs=args.jobs, chunk_size=args.chunk_size, cache_dir=args.cache_dir,
+                file_format=args.format, partition_by=args.partition_by, parameters=parameters,
+                resume=args.resume, validate=args.validate, fidelity=args.fidelity,
+            )
+    except (ValueError, FileExistsError) as e:
+        parser.error(str(e))
+    print(format_totals(totals, args.jobs))
+    if histogram is not None:
+        print(histogram.format())
+    if recorder is not None:
+        recorder.export(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Structured diagnostics for missing or inconsistent inputs.
+
+Engines report problems with `report` (one building) or `report_batch` (many buildings at once)
+instead of logging each occurrence. Reports go to the collector made current with `collecting`,
+which counts them by (stage, field, code), keeps a bounded buffer of (building, stage, field, code)
+records, and can log a deduplicated summary at the end of a run.
+
+Outside `collecting`, reports go to a process-wide default collector that logs the first
+occurrence of each (stage, field, code) and counts the rest silently.
+
+    with collecting() as diagnostics:
+        batch_pipeline(specs, parameters)
+    diagnostics.log_summary()
+"""
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional
+
+from pandas import DataFrame, isna
+
+logger = logging.getLogger(__name__)
+
+# Diagnostic codes
+MISSING = "missing"  # a required field is empty
+UNMATCHED = "unmatched"  # a value has no entry in a lookup table (e.g. lamp power for a technology)
+INCONSISTENT = "inconsistent"  # values contradict each other (e.g. off time before on time)
+INVALID = "invalid"  # a value is outside its allowed set
+
+DEFAULT_MAX_RECORDS = 10_000
+DEFAULT_MAX_EXAMPLES = 5
+
+
+class DiagnosticsCollector:
+    """Collect diagnostics for a run.
+    Args:
+        verbose (bool): Also log every occurrence as it is reported.
+        log_first (bool): Log the first occurrence of each (stage, field, code).
+        max_records (int): Maximum (building, stage, field, code) records kept; later ones are only counted.
+        max_examples (int): Building IDs kept per (stage, field, code) for the summary.
+    """
+    def __init__(
+            self,
+            verbose: bool = False,
+            log_first: bool = False,
+            max_records: int = DEFAULT_MAX_RECORDS,
+            max_examples: int = DEFAULT_MAX_EXAMPLES,
+    ):
+        self.verbose = verbose
+        self.log_first = log_first
+        self.max_records = max_records
+        self.max_examples = max_examples
+        self.counts: Counter = Counter()
+        self.records: list[tuple] = []
+        self.examples: dict[tuple, list] = {}
+        self.details: dict[tuple, str] = {}
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def dropped(self) -> int:
+        """Number of occurrences counted but not kept in records."""
+        return len(self) - len(self.records)
+
+    def _add(self, key: tuple, buildings: list, count: int, detail: Optional[str]) -> None:
+        first = key not in self.counts
+        self.counts[key] += count
+        if first:
+            self.examples[key] = []
+            if detail is not None:
+                self.details[key] = detail
+        examples = self.examples[key]
+        if len(examples) < self.max_examples:
+            examples.extend(b for b in buildings[:self.max_examples - len(examples)] if b is not None)
+        room = self.max_records - len(self.records)
+        if room > 0:
+            self.records.extend((b, *key) for b in buildings[:room])
+        if self.verbose or (first and self.log_first):
+            stage, field, code = key
+            where = f" for {count} building(s)" if count > 1 else (f" for {buildings[0]}" if buildings[0] is not None else "")
+            logger.warning(
+                "%s: %s %s%s%s%s", stage, field, code, where,
+                f" ({detail})" if detail else "",
+                "" if self.verbose else "; further occurrences are counted",
+            )
+
+    def report(self, stage: str, field: str, code: str, building: Any = None, detail: Optional[str] = None) -> None:
+        """Record one occurrence."""
+        self._add((stage, field, code), [building], 1, detail)
+
+    def report_batch(self, stage: str, field: str, code: str, buildings: Iterable, detail: Optional[str] = None) -> None:
+        """Record one occurrence per building."""
+        buildings = list(buildings)
+        if buildings:
+            self._add((stage, field, code), buildings, len(buildings), detail)
+
+    def merge(self, other: "DiagnosticsCollector") -> None:
+        """Add the diagnostics from another collector (e.g. one returned by a worker process)."""
+        for key, count in other.counts.items():
+            first = key not in self.counts
+            self.counts[key] += count
+            if first:
+                self.examples[key] = []
+                if key in other.details:
+                    self.details[key] = other.details[key]
+            examples = self.examples[key]
+            examples.extend(other.examples.get(key, [])[:self.max_examples - len(examples)])
+        room = self.max_records - len(self.records)
+        if room > 0:
+            self.records.extend(other.records[:room])
+
+    def summary(self) -> DataFrame:
+        """Return one row per (stage, field, code) with its count, example buildings and first detail."""
+        rows = [{
+            "stage": stage,
+            "field": field,
+            "code": code,
+            "count": count,
+            "examples": list(self.examples.get((stage, field, code), [])),
+            "detail": self.details.get((stage, field, code)),
+        } for (stage, field, code), count in self.counts.most_common()]
+        return DataFrame(rows, columns=["stage", "field", "code", "count", "examples", "detail"])
+
+    def log_summary(self, level: int = logging.WARNING) -> None:
+        """Log one line per (stage, field, code), most frequent first."""
+        for row in self.summary().itertuples(index=False):
+            examples = f" e.g. {', '.join(map(str, row.examples))}" if row.examples else ""
+            detail = f" ({row.detail})" if row.detail else ""
+            logger.log(level, "%s: %s %s x%d%s%s", row.stage, row.field, row.code, row.count, detail, examples)
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.records.clear()
+        self.examples.clear()
+        self.details.clear()
+
+
+_default = DiagnosticsCollector(log_first=True)
+_current: ContextVar[Optional[DiagnosticsCollector]] = ContextVar("openbes_diagnostics", default=None)
+_building: ContextVar[Any] = ContextVar("openbes_diagnostics_building", default=None)
+
+
+def get_collector() -> DiagnosticsCollector:
+    """Return the current collector (the process-wide default outside `collecting`)."""
+    collector = _current.get()
+    return _default if collector is None else collector
+
+
+@contextmanager
+def collecting(collector: Optional[DiagnosticsCollector] = None, verbose: bool = False) -> Iterator[DiagnosticsCollector]:
+    """Send diagnostics reported in this block to a collector.
+    Args:
+        collector (Optional[DiagnosticsCollector]): The collector. Defaults to a new one.
+        verbose (bool): For a new collector, log every occurrence as it is reported.
+    """
+    collector = collector if collector is not None else DiagnosticsCollector(verbose=verbose)
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def building(building_id: Any) -> Iterator[None]:
+    """Attribute diagnostics reported by single-building functions in this block to a building."""
+    token = _building.set(building_id)
+    try:
+        yield
+    finally:
+        _building.reset(token)
+
+
+def report(stage: str, field: str, code: str, detail: Optional[str] = None) -> None:
+    """Report a problem with the current building's inputs to the current collector.
+    Args:
+        stage (str): Simulation stage, e.g. "lighting".
+        field (str): Specification field, e.g. "lighting_system_lamp_power_z1".
+        code (str): One of MISSING, UNMATCHED, INCONSISTENT, INVALID.
+        detail (Optional[str]): Extra context, kept for the first occurrence only.
+    """
+    get_collector().report(stage, field, code, _building.get(), detail)
+
+
+def report_batch(stage: str, field: str, code: str, buildings: Iterable, detail: Optional[str] = None) -> None:
+    """Report the same problem for many buildings at once (see report)."""
+    get_collector().report_batch(stage, field, code, buildings, detail)
+
+
+def report_missing_batch(stage: str, specs: DataFrame, fields: Iterable[str], where=None) -> None:
+    """Report MISSING for every building in a batch with an empty value in any of the fields.
+    Args:
+        stage (str): Simulation stage, e.g. "hot_water".
+        specs (DataFrame): Batch of building specifications, one row per building.
+        fields (Iterable[str]): Fields to check.
+        where: Optional boolean mask restricting the check to some buildings (e.g. those with the system).
+    """
+    collector = get_collector()
+    for field in fields:
+        missing = isna(specs[field].to_numpy())
+        if where is not None:
+            missing = missing & where
+        if missing.any():
+            collector.report_batch(stage, field, MISSING, specs.index[missing])
@@ -1,4 +1,9 @@
-from pandas import DataFrame, Float64Dtype, concat
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+from pandas import DataFrame, Float64Dtype, MultiIndex, Series, concat
 
 from .types import (
     OpenBESSpecification,
@@ -9,8 +14,11 @@ from .types import (
     LIGHTING_BALLASTS,
     ENERGY_SOURCES,
 )
+from .types.coercion import SPECIFICATION_FIELD_TYPES, coerce_value
+from .portfolio.reader import specs_to_frame
+from .profiling import stage
 from .wip import sum_energy_totals, aggregate_energy_totals
-from .simulations import lighting, hot_water, ventilation
+from .simulations import envelope, lighting, hot_water, ventilation
 
 
 
@@ -54,12 +62,14 @@ def pipeline(spec: OpenBESSpecification, parameters: OpenBESParameters) -> Float
     spec.ventilation_system1_on_time = 10
     spec.ventilation_system1_off_time = 14
 
-    lighting_per_month = lighting.get_kwh_per_month(spec)
-    lighting_per_month.index = [ENERGY_USE_CATEGORIES.Lighting]
+    with stage("lighting"):
+        lighting_per_month = lighting.get_kwh_per_month(spec)
+        lighting_per_month.index = [ENERGY_USE_CATEGORIES.Lighting]
 
     if spec.water_system_energy_source == ENERGY_SOURCES.Electricity:
-        water_per_month = hot_water.get_hot_water_per_month(spec)
-        water_per_month.index = [ENERGY_USE_CATEGORIES.Hot_water]
+        with stage("hot_water"):
+            water_per_month = hot_water.get_hot_water_per_month(spec)
+            water_per_month.index = [ENERGY_USE_CATEGORIES.Hot_water]
     else:
         water_per_month = DataFrame(
             {
@@ -69,8 +79,9 @@ def pipeline(spec: OpenBESSpecification, parameters: OpenBESParameters) -> Float
         )
 
     if spec.ventilation_system1_energy_source == ENERGY_SOURCES.Electricity:
-        ventilation_per_month = ventilation.get_ventilation_per_month(spec)
-        ventilation_per_month.index = [ENERGY_USE_CATEGORIES.Ventilation]
+        with stage("ventilation"):
+            ventilation_per_month = ventilation.get_ventilation_per_month(spec)
+            ventilation_per_month.index = [ENERGY_USE_CATEGORIES.Ventilation]
     else:
         ventilation_per_month = DataFrame(
             {
@@ -90,13 +101,375 @@ def pipeline(spec: OpenBESSpecification, parameters: OpenBESParameters) -> Float
         index=MONTHS.list()
     ).transpose()
 
-    data = concat([data, lighting_per_month, water_per_month, ventilation_per_month])
+    with stage("concat"):
+        data = concat([data, lighting_per_month, water_per_month, ventilation_per_month])
 
     monthly_kwh_by_use = data
 
-    annual_kwh_per_category = aggregate_energy_totals(monthly_kwh_by_use)
+    with stage("aggregation"):
+        annual_kwh_per_category = aggregate_energy_totals(monthly_kwh_by_use)
 
-    annual_kwh_total = annual_kwh_per_category.sum()
+        annual_kwh_total = annual_kwh_per_category.sum()
 
-    total_simulated = sum_energy_totals(annual_kwh_total)
+        total_simulated = sum_energy_totals(annual_kwh_total)
     return total_simulated
+
+
+# Outputs of evaluate
+OUTPUTS = ("monthly", "annual", "total", "envelope")
+# Temporal resolutions a run can ask for, cheapest first (see batch_pipeline)
+FIDELITIES = ("monthly", "daily", "hourly")
+HOURLY = "hourly"
+
+
+def _constant(specs: DataFrame, column: str) -> np.ndarray:
+    return np.repeat(np.nan_to_num(specs[column].to_numpy(dtype=float))[:, None], len(MONTHS), axis=1)
+
+
+def _electric_only(specs: DataFrame, column: str, monthly: DataFrame) -> np.ndarray:
+    electric = specs[column].to_numpy(dtype=object) == ENERGY_SOURCES.Electricity
+    return np.where(electric[:, None], monthly.to_numpy(), 0.0)
+
+
+# Stages of the batch engines, by profiling stage name: each takes (specs, parameters)
+# and returns the monthly kWh, of shape (buildings, 12), of the energy use categories it computes
+_STAGES: dict[str, Callable[[DataFrame, OpenBESParameters], dict]] = {
+    "others": lambda specs, *_: {ENERGY_USE_CATEGORIES.Others: _constant(specs, "other_electricity_usage")},
+    "building_standby": lambda specs, *_: {
+        ENERGY_USE_CATEGORIES.Building_standby: _constant(specs, "building_standby_load"),
+    },
+    "lighting": lambda specs, *_: {ENERGY_USE_CATEGORIES.Lighting: lighting.get_kwh_per_month_batch(specs).to_numpy()},
+    "hot_water": lambda specs, *_: {
+        ENERGY_USE_CATEGORIES.Hot_water: _electric_only(
+            specs, "water_system_energy_source", hot_water.get_hot_water_per_month_batch(specs)
+        ),
+    },
+    "ventilation": lambda specs, *_: {
+        ENERGY_USE_CATEGORIES.Ventilation: _electric_only(
+            specs, "ventilation_system1_energy_source", ventilation.get_ventilation_per_month_batch(specs)
+        ),
+    },
+    # Heating and cooling are not yet simulated
+    "heating_cooling": lambda specs, *_: {
+        ENERGY_USE_CATEGORIES.Cooling: np.zeros((len(specs), len(MONTHS))),
+        ENERGY_USE_CATEGORIES.Heating: np.zeros((len(specs), len(MONTHS))),
+    },
+}
+# The stage that computes each energy use category
+CATEGORY_STAGES = {
+    ENERGY_USE_CATEGORIES.Others: "others",
+    ENERGY_USE_CATEGORIES.Building_standby: "building_standby",
+    ENERGY_USE_CATEGORIES.Lighting: "lighting",
+    ENERGY_USE_CATEGORIES.Hot_water: "hot_water",
+    ENERGY_USE_CATEGORIES.Ventilation: "ventilation",
+    ENERGY_USE_CATEGORIES.Cooling: "heating_cooling",
+    ENERGY_USE_CATEGORIES.Heating: "heating_cooling",
+}
+# Specification fields that each stage reads: changing any other field changes no result
+STAGE_FIELDS: dict[str, frozenset[str]] = {
+    "others": frozenset({"other_electricity_usage"}),
+    "building_standby": frozenset({"building_standby_load"}),
+    "lighting": frozenset(f for zone in lighting.LIGHTING_ZONES for f in lighting.get_zone_fields(zone)),
+    "hot_water": frozenset({*hot_water.HOT_WATER_FIELDS, "water_system_energy_source"}),
+    "ventilation": frozenset(ventilation.VENTILATION_FIELDS),
+    "heating_cooling": frozenset(),
+}
+# The lighting zone of each field of the lighting stage, which only needs the changed zones recomputed
+LIGHTING_FIELD_ZONES = {f: zone for zone in lighting.LIGHTING_ZONES for f in lighting.get_zone_fields(zone)}
+# The stages that read the climate file of each building (meteorological_file). None does yet: heating and cooling,
+# the only use that depends on the climate, is not simulated. Climate files are only loaded and shared for these.
+CLIMATE_STAGES: frozenset[str] = frozenset()
+
+
+def _run_stages(
+        specs: DataFrame,
+        parameters: OpenBESParameters,
+        categories: Iterable[ENERGY_USE_CATEGORIES],
+) -> dict[ENERGY_USE_CATEGORIES, np.ndarray]:
+    # Monthly kWh of the categories, each of shape (buildings, 12), running each stage they need once
+    by_category = {}
+    for category in categories:
+        if category not in by_category:
+            name = CATEGORY_STAGES[category]
+            with stage(name, buildings=len(specs)):
+                by_category.update(_STAGES[name](specs, parameters))
+    return by_category
+
+
+def _assemble_batch(
+        specs: DataFrame,
+        by_category: dict[ENERGY_USE_CATEGORIES, np.ndarray],
+        categories: Optional[list[ENERGY_USE_CATEGORIES]] = None,
+) -> DataFrame:
+    n = len(specs)
+    months = MONTHS.list()
+    with stage("assemble", buildings=n):
+        categories = [c.value for c in categories or ENERGY_USE_CATEGORIES]
+        data = np.stack([by_category[ENERGY_USE_CATEGORIES(c)] for c in categories], axis=1)
+        names = [specs.index.name, "category"]
+        if specs.index.is_unique:
+            # Same index as from_product, without factorizing the building IDs again
+            index = MultiIndex(
+                levels=[specs.index, categories],
+                codes=[np.repeat(np.arange(n), len(categories)), np.tile(np.arange(len(categories)), n)],
+                names=names,
+                verify_integrity=False,
+            )
+        else:
+            index = MultiIndex.from_product([specs.index, categories], names=names)
+        return DataFrame(data.reshape(n * len(categories), len(months)), index=index, columns=months)
+
+
+class LazyResults(Mapping):
+    """Requested outputs of the batch engines, each computed when first read.
+
+    A mapping from output name ("monthly", "annual", "total" or "envelope") to its value. Reading an output
+    runs only the stages of the requested energy use categories that have not run yet, so stages
+    that no output needs never run: lighting alone, for example, never computes hot water.
+    """
+
+    def __init__(
+            self,
+            specs: DataFrame,
+            parameters: OpenBESParameters,
+            categories: list[ENERGY_USE_CATEGORIES],
+            outputs: tuple[str, ...],
+    ):
+        self.specs = specs
+        self.parameters = parameters
+        self.categories = categories
+        self.outputs = outputs
+        self._by_category: dict[ENERGY_USE_CATEGORIES, np.ndarray] = {}
+        self._values: dict[str, Union[DataFrame, Series]] = {}
+
+    def category(self, category: ENERGY_USE_CATEGORIES) -> DataFrame:
+        """Return the monthly kWh of one requested category, one row per building and a column per month.
+        Raises:
+            KeyError: If the category was not requested.
+        """
+        return DataFrame(self._monthly([category])[category], index=self.specs.index, columns=MONTHS.list())
+
+    def _monthly(self, categories: list[ENERGY_USE_CATEGORIES]) -> dict[ENERGY_USE_CATEGORIES, np.ndarray]:
+        missing = [c for c in categories if c not in self.categories]
+        if missing:
+            raise KeyError(f"Not requested: {', '.join(c.value for c in missing)}")
+        needed = [c for c in categories if c not in self._by_category]
+        self._by_category.update(_run_stages(self.specs, self.parameters, needed))
+        return self._by_category
+
+    def _compute(self, output: str) -> Union[DataFrame, Series]:
+        if output == "envelope":
+            with stage("envelope", buildings=len(self.specs)):
+                return envelope.get_envelope_frame(self.specs, self.parameters)
+        by_category = self._monthly(self.categories)
+        if output == "monthly":
+            return _assemble_batch(self.specs, by_category, self.categories)
+        annual = DataFrame(
+            {c.value: by_category[c].sum(axis=1) for c in self.categories}, index=self.specs.index
+        )
+        return annual if output == "annual" else annual.sum(axis=1).rename("kWh/yr")
+
+    def __getitem__(self, output: str) -> Union[DataFrame, Series]:
+        if output not in self.outputs:
+            raise KeyError(output)
+        if output not in self._values:
+            self._values[output] = self._compute(output)
+        return self._values[output]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.outputs)
+
+    def __len__(self) -> int:
+        return len(self.outputs)
+
+
+@dataclass
+class WhatIf:
+    """The effect of changing specification fields, as returned by what_if."""
+    # kWh of the changed buildings minus the baseline, indexed by (building, energy use category)
+    # with a column per month, for every category of the baseline
+    delta: DataFrame
+    # The changed buildings, with every stage result the baseline had already computed
+    results: LazyResults
+    # Stages that were recomputed
+    stages: list[str]
+
+
+def what_if(
+        baseline: LazyResults,
+        changes: dict[str, Any],
+        buildings: Optional[Iterable] = None,
+) -> WhatIf:
+    """Change some specification fields of evaluated buildings and return the change in their energy use.
+
+    Only the stages that read a changed field (see STAGE_FIELDS) are recomputed, for the changed
+    buildings only, and only the changed zones of the lighting stage: changing the technology of
+    one lighting zone computes that zone and nothing else.
+        baseline = evaluate(specs, parameters)
+        led = what_if(baseline, {"lighting_system_tech_z1": "LED"})
+        led.delta.xs("Lighting", level="category")  # kWh saved per month, as negative values
+        what_if(led.results, {"water_demand": 120})  # changes can be chained
+    Args:
+        baseline (LazyResults): The buildings before the change, as from evaluate.
+        changes (dict[str, Any]): New value of each changed specification field, as in a specification
+            file: text such as "LED" is coerced to the field type, and None or "" clears the field.
+        buildings (Optional[Iterable]): Building IDs to change. Defaults to every building of the baseline.
+    Returns:
+        WhatIf: The delta per energy use category and month, and the changed buildings for further changes.
+    Raises:
+        ValueError: If a changed field is not a specification field.
+    """
+    unknown = [f for f in changes if f not in SPECIFICATION_FIELD_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown specification fields {unknown}")
+    index = baseline.specs.index
+    changed = np.ones(len(index), dtype=bool) if buildings is None else index.isin(list(buildings))
+    positions = np.flatnonzero(changed)
+    specs = baseline.specs.copy()
+    for field, value in changes.items():
+        value = coerce_value(SPECIFICATION_FIELD_TYPES[field], value)
+        column = specs[field].to_numpy(copy=True)
+        column[changed] = np.nan if value is None and column.dtype.kind == "f" else value
+        specs[field] = column
+    before, after = baseline.specs.iloc[positions], specs.iloc[positions]
+
+    by_category = dict(baseline._by_category)
+    delta = {c: np.zeros((len(specs), len(MONTHS))) for c in baseline.categories}
+    stages = []
+    for name, fields in STAGE_FIELDS.items():
+        categories = [c for c, stage_name in CATEGORY_STAGES.items() if stage_name == name and c in delta]
+        if not categories or fields.isdisjoint(changes) or not len(positions):
+            continue
+        stages.append(name)
+        with stage(name, buildings=len(positions)):
+            if name == "lighting":
+                zones = sorted({LIGHTING_FIELD_ZONES[f] for f in changes if f in LIGHTING_FIELD_ZONES})
+                per_day = sum(
+                    lighting.get_kwh_per_day_for_zone_batch(after, zone)
+                    - lighting.get_kwh_per_day_for_zone_batch(before, zone)
+                    for zone in zones
+                )
+                # The unchanged zones cancel out of the difference
+                category = ENERGY_USE_CATEGORIES.Lighting
+                delta[category][positions] = np.outer(per_day, lighting.LIGHTING_OPERATIONAL_DAYS_DF.values[0])
+                if category in by_category:
+                    by_category[category] = by_category[category] + delta[category]
+                continue
+            new = _STAGES[name](after, baseline.parameters)
+            if all(c in by_category for c in categories):
+                old = {c: by_category[c][positions] for c in categories}
+            else:
+                old = _STAGES[name](before, baseline.parameters)
+        for c in categories:
+            delta[c][positions] = new[c] - old[c]
+            if c in by_category:
+                by_category[c] = by_category[c].copy()
+                by_category[c][positions] = new[c]
+
+    results = LazyResults(specs, baseline.parameters, baseline.categories, baseline.outputs)
+    results._by_category = by_category
+    return WhatIf(_assemble_batch(specs, delta, baseline.categories), results, stages)
+
+
+def evaluate(
+        specs: Union[OpenBESSpecification, DataFrame],
+        parameters: OpenBESParameters,
+        categories: Optional[Iterable[Union[ENERGY_USE_CATEGORIES, str]]] = None,
+        outputs: Iterable[str] = OUTPUTS,
+) -> LazyResults:
+    """Request some energy use categories and outputs of the batch engines, computed only when read.
+
+        results = evaluate(spec, parameters, [ENERGY_USE_CATEGORIES.Lighting], ["annual"])
+        results["annual"]  # runs the lighting stage only
+    Args:
+        specs (Union[OpenBESSpecification, DataFrame]): One building specification, or a batch
+            (see openbes.portfolio.reader).
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        categories (Optional[Iterable[Union[ENERGY_USE_CATEGORIES, str]]]): Energy use categories to compute.
+            Defaults to all of them.
+        outputs (Iterable[str]): Any of OUTPUTS: "monthly" (kWh indexed by building and category, with a
+            column per month, as batch_pipeline), "annual" (kWh per building and category) and "total"
+            (annual kWh per building, summed over the categories), and "envelope" (each building's heat loss
+            and solar aperture coefficients, as from simulations.envelope.get_envelope_frame).
+    Returns:
+        LazyResults: Mapping from each requested output to its value.
+    Raises:
+        ValueError: If a category or output is unknown.
+    """
+    if isinstance(specs, OpenBESSpecification):
+        specs = specs_to_frame([specs])
+    categories = list(ENERGY_USE_CATEGORIES) if categories is None else [ENERGY_USE_CATEGORIES(c) for c in categories]
+    outputs = tuple(outputs)
+    unknown = [o for o in outputs if o not in OUTPUTS]
+    if unknown:
+        raise ValueError(f"Unknown outputs {unknown} (expected any of {', '.join(OUTPUTS)})")
+    return LazyResults(specs, parameters, categories, outputs)
+
+
+def batch_pipeline(specs: DataFrame, parameters: OpenBESParameters, fidelity: str = HOURLY) -> DataFrame:
+    """Run the vectorized engines over a batch of buildings.
+
+    Unlike pipeline, this uses only the values in each specification.
+    Cooling and heating are not yet simulated and are reported as zero.
+    To compute only some categories, see evaluate.
+
+    The fidelity is the finest temporal resolution the run needs: each stage runs at the cheapest
+    resolution that satisfies it, and every tier returns the same monthly frame, so tiers can be
+    compared. Every stage is a monthly model for now (lighting, hot water and ventilation scale daily
+    use by OPERATIONAL_DAYS_PER_MONTH), so all tiers give the same results until an hourly stage,
+    such as heating and cooling, is added.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building
+            (see openbes.portfolio.reader).
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        fidelity (str): One of FIDELITIES: "monthly", "daily" or "hourly".
+    Returns:
+        DataFrame: kWh indexed by (building, energy use category), with a column per month.
+    Raises:
+        ValueError: If the fidelity is unknown.
+    """
+    if fidelity not in FIDELITIES:
+        raise ValueError(f"Unknown fidelity {fidelity!r} (expected one of {', '.join(FIDELITIES)})")
+    return _assemble_batch(specs, _run_stages(specs, parameters, ENERGY_USE_CATEGORIES))
+
+
+def scenario_pipeline(
+        specs: Union[OpenBESSpecification, DataFrame],
+        parameters: OpenBESParameters,
+        climates: Iterable[str],
+) -> DataFrame:
+    """Run the vectorized engines for buildings in each of several climates, e.g. present and future weather.
+
+    Stages that do not read the climate file (see CLIMATE_STAGES) run once and their results are reused
+    for every climate. Stages that do run once over the buildings of every climate stacked together, with
+    meteorological_file set to each climate in turn. No stage reads the climate file yet, so until heating
+    and cooling are simulated every climate has the same results. The results equal batch_pipeline run once
+    per climate with meteorological_file set to it.
+    Args:
+        specs (Union[OpenBESSpecification, DataFrame]): One building specification, or a batch
+            (see openbes.portfolio.reader). Their own meteorological_file is ignored.
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        climates (Iterable[str]): meteorological_file values to simulate.
+    Returns:
+        DataFrame: kWh indexed by (meteorological_file, building, energy use category), with a column per month.
+    Raises:
+        ValueError: If there are no climates.
+    """
+    if isinstance(specs, OpenBESSpecification):
+        specs = specs_to_frame([specs])
+    climates = list(climates)
+    if not climates:
+        raise ValueError("No climates to simulate")
+    n = len(specs)
+    by_climate = [c for c in ENERGY_USE_CATEGORIES if CATEGORY_STAGES[c] in CLIMATE_STAGES]
+    shared = _run_stages(specs, parameters, [c for c in ENERGY_USE_CATEGORIES if c not in by_climate])
+    stacked = {}
+    if by_climate:
+        # One row per building and climate, climate by climate
+        stacked_specs = concat([specs.assign(meteorological_file=climate) for climate in climates])
+        stacked = _run_stages(stacked_specs, parameters, by_climate)
+    results = [
+        _assemble_batch(specs, {**shared, **{c: values[i * n:(i + 1) * n] for c, values in stacked.items()}})
+        for i in range(len(climates))
+    ]
+    return concat(results, keys=climates, names=["meteorological_file"])
@@ -0,0 +1,80 @@
+"""
+Durable progress journal for portfolio runs, so that an interrupted run can be resumed.
+
+The journal is a JSON-lines file in the output directory with one record per batch of results,
+appended only once that batch has been flushed to disk. Each record lists the IDs of the
+buildings in the batch and, for every output file, its size once the batch was written.
+
+Records are appended with a single write followed by fsync, so a crash can at worst leave a
+truncated final line, which is ignored when the journal is read back.
+"""
+import json
+import os
+from typing import Iterable
+
+JOURNAL_FILE_NAME = "_journal.jsonl"
+
+
+class ProgressJournal:
+    """Read and append progress records for the output directory of a portfolio run.
+    Args:
+        output_dir (str): The output directory the journal describes.
+    """
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, JOURNAL_FILE_NAME)
+        self.batches = 0
+        self.completed = set()
+        self.offsets = {}
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def load(self) -> None:
+        """Read the journal, collecting completed building IDs and the latest size of each output file."""
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_bytes += len(line)
+                self.batches = max(self.batches, record["batch"] + 1)
+                self.completed.update(record["building_ids"])
+                self.offsets.update(record["offsets"])
+        # Drop any torn record so that new records start on a fresh line
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def restore_outputs(self, output_file_names: Iterable[str]) -> None:
+        """Roll output files back to their journaled sizes, discarding anything written after the last record.
+        Args:
+            output_file_names (Iterable[str]): Paths of output files, relative to the output directory.
+        """
+        for name in output_file_names:
+            file_path = os.path.join(self.output_dir, name)
+            if name not in self.offsets:
+                os.remove(file_path)
+            elif os.path.getsize(file_path) > self.offsets[name]:
+                with open(file_path, "r+b") as f:
+                    f.truncate(self.offsets[name])
+
+    def record(self, building_ids: list[str], offsets: dict[str, int]) -> None:
+        """Durably append a record for a batch whose results have been flushed to disk.
+        Args:
+            building_ids (list[str]): IDs of the buildings in the batch.
+            offsets (dict[str, int]): Size of each output file touched by the batch,
+                relative to the output directory.
+        """
+        line = json.dumps({"batch": self.batches, "building_ids": building_ids, "offsets": offsets}) + "\n"
+        with open(self.path, "ab") as f:
+            f.write(line.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self.batches += 1
+        self.completed.update(building_ids)
+        self.offsets.update(offsets)
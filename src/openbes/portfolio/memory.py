@@ -0,0 +1,79 @@
+"""
+Helpers for keeping portfolio runs within a memory budget.
+"""
+import os
+import sys
+
+from ..types.coercion import SPECIFICATION_FIELD_TYPES
+from ..types import ENERGY_USE_CATEGORIES, MONTHS
+
+MIN_CHUNK_SIZE = 1
+MAX_CHUNK_SIZE = 100_000
+
+# Rough per-building footprint of a batch: specification columns (object columns cost a
+# pointer plus the boxed value), monthly results by category, and a copy of both while
+# results are flattened for writing.
+SPEC_BYTES_PER_BUILDING = 32 * len(SPECIFICATION_FIELD_TYPES)
+RESULT_BYTES_PER_BUILDING = 8 * len(ENERGY_USE_CATEGORIES) * (len(MONTHS) + 1) * 2
+BYTES_PER_BUILDING = SPEC_BYTES_PER_BUILDING + RESULT_BYTES_PER_BUILDING
+
+
+def _page_size() -> int:
+    return os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_of(pid: str) -> int:
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * _page_size()
+
+
+def _child_pids() -> list[str]:
+    pids = []
+    try:
+        tasks = os.listdir("/proc/self/task")
+    except OSError:
+        return pids
+    for task in tasks:
+        try:
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.extend(f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def get_rss_bytes(include_children: bool = True) -> int:
+    """Return the resident memory of this process and, optionally, its worker processes.
+
+    Uses /proc where available; elsewhere falls back to the peak RSS of this process only.
+    Args:
+        include_children (bool): Include the current RSS of child processes (e.g. a process pool).
+    Returns:
+        int: Resident set size in bytes.
+    """
+    try:
+        rss = _rss_of("self")
+    except OSError:
+        import resource  # not available on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    if include_children:
+        for pid in _child_pids():
+            try:
+                rss += _rss_of(pid)
+            except OSError:
+                pass  # child exited
+    return rss
+
+
+def get_chunk_size(memory_budget: int, chunks_in_flight: int, bytes_per_building: int = BYTES_PER_BUILDING) -> int:
+    """Size chunks so that every chunk that can be in flight at once fits in the memory budget.
+    Args:
+        memory_budget (int): Bytes available for batches (i.e. over and above the baseline RSS).
+        chunks_in_flight (int): Maximum number of chunks held at once by readers, workers and the writer.
+        bytes_per_building (int): Estimated memory per building per chunk.
+    Returns:
+        int: Number of buildings per chunk.
+    """
+    size = memory_budget // (max(chunks_in_flight, 1) * bytes_per_building)
+    return int(min(max(size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE))
@@ -0,0 +1,170 @@
+"""
+Read building portfolios (one row per building, one column per OpenBESSpecification field)
+into the columnar batch representation used by the vectorized engines.
+
+A batch is a DataFrame indexed by building ID with a column for every specification field,
+in dataclass order. Numeric fields are float64 (NaN where missing), enum fields hold enum
+members (None where missing) and text fields hold str or None. Any extra columns in the
+input (e.g. a building group used to partition outputs) are kept after the specification fields.
+"""
+from enum import Enum
+from os import path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from pandas import DataFrame, Series, concat, factorize, read_csv, to_numeric
+
+from ..types import OpenBESSpecification
+from ..types.coercion import SPECIFICATION_FIELD_TYPES, TRUE_STRINGS, FALSE_STRINGS, coerce_value
+
+DEFAULT_CHUNK_SIZE = 10_000
+BUILDING_ID = "building_id"
+
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.bz2", ".csv.zip", ".csv.xz")
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+# Specification fields held as object columns (enums and text) and as float64 columns
+OBJECT_FIELDS = [name for name, t in SPECIFICATION_FIELD_TYPES.items() if issubclass(t, (Enum, str))]
+NUMERIC_FIELDS = [name for name in SPECIFICATION_FIELD_TYPES if name not in OBJECT_FIELDS]
+_OBJECT_FIELD_TYPES = [SPECIFICATION_FIELD_TYPES[name] for name in OBJECT_FIELDS]
+# Column positions, in NUMERIC_FIELDS + OBJECT_FIELDS, of the specification fields in order
+_FIELD_POSITIONS = [[*NUMERIC_FIELDS, *OBJECT_FIELDS].index(name) for name in SPECIFICATION_FIELD_TYPES]
+
+
+def _coerce_numeric_column(column: Series) -> Series:
+    if column.dtype.kind in "biuf":
+        return column.astype("float64")
+    text = column.astype(object).where(column.notna(), None).map(
+        lambda v: v.strip().lower() if isinstance(v, str) else v
+    )
+    text = text.replace({t: 1.0 for t in TRUE_STRINGS}).replace({f: 0.0 for f in FALSE_STRINGS})
+    return to_numeric(text, errors="coerce").astype("float64")
+
+
+def _coerce_object_column(column: Series, field_type: type) -> Series:
+    # Decode each distinct value once rather than once per row
+    codes, uniques = factorize(column.astype(object), use_na_sentinel=True)
+    decoded = np.empty(len(uniques) + 1, dtype=object)
+    decoded[:-1] = [coerce_value(field_type, u) for u in uniques]
+    decoded[-1] = None
+    return Series(decoded[codes], index=column.index, dtype=object)
+
+
+def coerce_specs_frame(frame: DataFrame) -> DataFrame:
+    """Coerce a raw frame of building specifications into a batch.
+    Args:
+        frame (DataFrame): One row per building, columns named like OpenBESSpecification fields.
+    Returns:
+        DataFrame: The batch, with every specification field present and coerced to its type.
+    """
+    columns = {}
+    for name, field_type in SPECIFICATION_FIELD_TYPES.items():
+        if name not in frame:
+            if issubclass(field_type, (Enum, str)):
+                columns[name] = Series(None, index=frame.index, dtype=object)
+            else:
+                columns[name] = Series(np.nan, index=frame.index, dtype="float64")
+        elif issubclass(field_type, (Enum, str)):
+            columns[name] = _coerce_object_column(frame[name], field_type)
+        else:
+            columns[name] = _coerce_numeric_column(frame[name])
+    for name in frame.columns:
+        if name not in SPECIFICATION_FIELD_TYPES:
+            columns[name] = frame[name]
+    return DataFrame(columns, index=frame.index)
+
+
+def specs_to_frame(specs: Iterable[OpenBESSpecification], index: Optional[Iterable] = None) -> DataFrame:
+    """Convert specification dataclasses into a batch.
+    Args:
+        specs (Iterable[OpenBESSpecification]): The building specifications.
+        index (Optional[Iterable]): Building IDs. Defaults to 0, 1, 2, ...
+    Returns:
+        DataFrame: The batch.
+    """
+    rows = [vars(s) for s in specs]
+    index = list(index) if index is not None else list(range(len(rows)))
+    try:
+        # Dataclass values are usually already typed, so skip the column-by-column coercion of numbers
+        numeric = np.array(
+            [[np.nan if (v := row[name]) is None else v for name in NUMERIC_FIELDS] for row in rows], dtype="float64"
+        ).reshape(len(rows), len(NUMERIC_FIELDS))
+    except (TypeError, ValueError):
+        frame = DataFrame(rows, columns=list(SPECIFICATION_FIELD_TYPES), index=index)
+        frame.index.name = BUILDING_ID
+        return coerce_specs_frame(frame)
+    objects = np.empty((len(rows), len(OBJECT_FIELDS)), dtype=object)
+    for i, row in enumerate(rows):
+        # Enum members pass through; anything else (e.g. "LED") is decoded as from a file
+        objects[i] = [
+            v if v is None or (isinstance(v, Enum) and isinstance(v, t)) else coerce_value(t, v)
+            for v, t in zip((row[name] for name in OBJECT_FIELDS), _OBJECT_FIELD_TYPES)
+        ]
+    frame = concat([
+        DataFrame(numeric, columns=NUMERIC_FIELDS, index=index),
+        DataFrame(objects, columns=OBJECT_FIELDS, index=index, dtype=object),
+    ], axis=1).take(_FIELD_POSITIONS, axis=1)
+    frame.index.name = BUILDING_ID
+    return frame
+
+
+def frame_to_specs(frame: DataFrame) -> Iterator[OpenBESSpecification]:
+    """Convert the rows of a batch back into specification dataclasses.
+    Args:
+        frame (DataFrame): The batch.
+    Returns:
+        Iterator[OpenBESSpecification]: One specification per row.
+    """
+    names = list(SPECIFICATION_FIELD_TYPES)
+    for row in frame[names].itertuples(index=False, name=None):
+        yield OpenBESSpecification(**{
+            k: coerce_value(SPECIFICATION_FIELD_TYPES[k], v) for k, v in zip(names, row)
+        })
+
+
+def _read_csv_chunks(file_path: str, chunk_size: int) -> Iterator[DataFrame]:
+    yield from read_csv(file_path, chunksize=chunk_size, skipinitialspace=True)
+
+
+def _read_parquet_chunks(file_path: str, chunk_size: int) -> Iterator[DataFrame]:
+    try:
+        from pyarrow.parquet import ParquetFile
+    except ImportError as e:
+        raise ImportError("Reading Parquet portfolios requires pyarrow (pip install openBES[parquet])") from e
+    for batch in ParquetFile(file_path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def read_portfolio(
+        file_path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        id_column: str = BUILDING_ID,
+) -> Iterator[DataFrame]:
+    """Read a CSV or Parquet portfolio in chunks, yielding one batch per chunk.
+
+    Only one chunk is held in memory at a time, so files larger than memory can be processed.
+    Args:
+        file_path (str): Path to a .csv (optionally compressed) or .parquet file.
+        chunk_size (int): Maximum number of buildings per batch.
+        id_column (str): Column holding building IDs. If the file has no such column,
+            buildings are numbered by their row in the file.
+    Returns:
+        Iterator[DataFrame]: Batches of at most chunk_size buildings, indexed by building ID.
+    """
+    name = path.basename(file_path).lower()
+    if name.endswith(CSV_SUFFIXES):
+        chunks = _read_csv_chunks(file_path, chunk_size)
+    elif name.endswith(PARQUET_SUFFIXES):
+        chunks = _read_parquet_chunks(file_path, chunk_size)
+    else:
+        raise ValueError(f"Unsupported portfolio file type: {file_path}")
+
+    offset = 0
+    for chunk in chunks:
+        if id_column in chunk:
+            chunk = chunk.set_index(id_column)
+        else:
+            chunk.index = range(offset, offset + len(chunk))
+        chunk.index.name = BUILDING_ID
+        offset += len(chunk)
+        yield coerce_specs_frame(chunk)
@@ -0,0 +1,275 @@
+"""
+Run the batch pipeline over a portfolio, streaming results to a ResultWriter.
+
+Work flows through three bounded stages: a reader thread that pulls batches from the source
+(e.g. read_portfolio) and splits them into chunks, a pool of workers that simulate each chunk,
+and the ResultWriter's background thread. Each stage holds a fixed number of chunks, so a
+slow stage blocks the one before it rather than letting work pile up in memory.
+Only monthly results leave a worker, so no hourly data outlives the chunk that produced it.
+With worker processes, each climate file a stage reads (see pipeline.CLIMATE_STAGES) is loaded
+once in this process and shared with the workers through shared memory (see
+simulations.climate.SharedClimates).
+"""
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from queue import Full, Queue
+from typing import Iterable, Iterator, Optional
+
+from pandas import DataFrame
+
+from ..diagnostics import DiagnosticsCollector, collecting
+from ..pipeline import batch_pipeline, CLIMATE_STAGES, FIDELITIES, HOURLY
+from ..profiling import stage
+from ..simulations.climate import get_climate_cache_stats, load_climates, SharedClimates, use_shared_climates
+from ..types import OpenBESParameters
+from ..validation import validate_batch
+from .memory import get_chunk_size, get_rss_bytes, MIN_CHUNK_SIZE
+from .reader import DEFAULT_CHUNK_SIZE
+from .writer import ResultWriter
+
+DEFAULT_PREFETCH = 2
+_END = object()
+
+
+@dataclass
+class PortfolioRunSummary:
+    """
+    Summary statistics for a portfolio run.
+    """
+    buildings: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    chunk_size: int = 0
+    peak_rss_bytes: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    diagnostics: DiagnosticsCollector = field(default_factory=DiagnosticsCollector)
+
+    @property
+    def buildings_per_second(self) -> float:
+        return self.buildings / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        """Share of the climate files used by each chunk that were not parsed from EPW.
+        None if no climate file was used, as while no stage reads one (see pipeline.CLIMATE_STAGES)."""
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+
+@dataclass
+class _ChunkResult:
+    specs: DataFrame
+    results: DataFrame
+    diagnostics: DiagnosticsCollector
+    rejected: int
+    cache_hits: int
+    cache_misses: int
+
+
+class _ChunkReader:
+    """Pull batches from a source on a background thread, split into chunks of at most chunk_size."""
+    def __init__(self, batches: Iterable[DataFrame], chunk_size: int, prefetch: int):
+        self.chunk_size = chunk_size
+        self._batches = batches
+        self._queue = Queue(maxsize=max(prefetch, 1))
+        self._error = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="openbes-portfolio-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        try:
+            for batch in self._batches:
+                start = 0
+                while start < len(batch):
+                    # chunk_size may shrink while a batch is being split
+                    stop = start + self.chunk_size
+                    if not self._put(batch.iloc[start:stop]):
+                        return
+                    start = stop
+        except Exception as e:
+            self._error = e
+        self._put(_END)
+
+    def __iter__(self) -> Iterator[DataFrame]:
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                break
+            yield chunk
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def _simulate(
+        specs: DataFrame,
+        parameters: OpenBESParameters,
+        validate: bool,
+        climates: Optional[dict] = None,
+        fidelity: str = HOURLY,
+) -> _ChunkResult:
+    if climates:
+        use_shared_climates(climates)
+    rejected = 0
+    with collecting() as diagnostics:
+        if validate:
+            with stage("validate", buildings=len(specs)):
+                validation = validate_batch(specs)
+                validation.report()
+            specs = validation.accepted(specs)
+            rejected = validation.rejected
+        cache = Counter()
+        if CLIMATE_STAGES:
+            # Each chunk loads and counts each of its climate files once
+            names = specs["meteorological_file"].dropna().unique()
+            cache = load_climates(n for n in names if isinstance(n, str) and n)
+        results = batch_pipeline(specs, parameters, fidelity)
+    return _ChunkResult(specs, results, diagnostics, rejected, cache["hits"], cache["misses"])
+
+
+def run_portfolio(
+        batches: Iterable[DataFrame],
+        parameters: OpenBESParameters,
+        writer: ResultWriter,
+        jobs: int = 1,
+        chunk_size: Optional[int] = None,
+        memory_budget: Optional[int] = None,
+        prefetch: int = DEFAULT_PREFETCH,
+        executor: Optional[Executor] = None,
+        diagnostics: Optional[DiagnosticsCollector] = None,
+        validate: bool = False,
+        fidelity: str = HOURLY,
+) -> PortfolioRunSummary:
+    """Simulate a portfolio chunk by chunk and hand the results to the writer as they complete.
+
+    Buildings the writer has already completed (when resuming an interrupted run) are skipped.
+
+    With a memory budget, chunks are sized so that every chunk that can be in flight at once
+    fits within it, and the resident memory of this process and its workers is checked after
+    each chunk: if it exceeds the budget, in-flight work is drained and the chunk size halved.
+    Args:
+        batches (Iterable[DataFrame]): Batches of specifications, e.g. from read_portfolio.
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        writer (ResultWriter): Destination for the results.
+        jobs (int): Number of worker processes. 1 simulates in this process.
+        chunk_size (Optional[int]): Maximum buildings per chunk. Defaults to the reader's chunk size,
+            or to the largest size the memory budget allows.
+        memory_budget (Optional[int]): Peak resident memory allowed for the run, in bytes.
+        prefetch (int): Number of chunks the reader may hold ready ahead of the workers.
+        executor (Optional[Executor]): Executor to run chunks on instead of a new process pool.
+        diagnostics (Optional[DiagnosticsCollector]): Collector for input problems reported by the
+            engines. Defaults to a new one; a summary is logged at the end of the run.
+        validate (bool): Check each chunk with validate_batch first and reject, without simulating,
+            the buildings that fail. Their reasons are sent to the diagnostics. Otherwise, inputs
+            the engines cannot use count as zero energy.
+        fidelity (str): Temporal resolution of the run (see pipeline.batch_pipeline).
+    Returns:
+        PortfolioRunSummary: Number of buildings and chunks processed, skipped and rejected, the time taken,
+            the final chunk size, the peak resident memory observed, climate cache hits and the diagnostics.
+    Raises:
+        MemoryError: If the memory budget is exceeded even with single-building chunks.
+        ValueError: If the fidelity is unknown.
+    """
+    if fidelity not in FIDELITIES:
+        raise ValueError(f"Unknown fidelity {fidelity!r} (expected one of {', '.join(FIDELITIES)})")
+    summary = PortfolioRunSummary()
+    if diagnostics is not None:
+        summary.diagnostics = diagnostics
+    start = time.perf_counter()
+    in_flight = max(jobs, 1)
+    if memory_budget is not None:
+        chunks_in_flight = in_flight + writer.max_pending + prefetch
+        budget_chunk_size = get_chunk_size(memory_budget - get_rss_bytes(), chunks_in_flight)
+        chunk_size = min(chunk_size or budget_chunk_size, budget_chunk_size)
+    reader = _ChunkReader(batches, chunk_size or DEFAULT_CHUNK_SIZE, prefetch)
+
+    own_executor = executor is None and jobs > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    # Worker processes view climate files loaded once here, rather than each parsing its own copy
+    shared_climates = SharedClimates() if CLIMATE_STAGES and isinstance(executor, ProcessPoolExecutor) else None
+    parent_cache_before = get_climate_cache_stats()
+    pending: deque[Future] = deque()
+
+    def write_oldest() -> None:
+        chunk = pending.popleft().result()
+        summary.diagnostics.merge(chunk.diagnostics)
+        summary.rejected += chunk.rejected
+        summary.cache_hits += chunk.cache_hits
+        summary.cache_misses += chunk.cache_misses
+        if len(chunk.specs):
+            with stage("write", buildings=len(chunk.specs)):
+                writer.write(chunk.specs, chunk.results)
+        summary.buildings += len(chunk.specs)
+        summary.batches += 1
+
+    def check_memory() -> None:
+        rss = get_rss_bytes()
+        summary.peak_rss_bytes = max(summary.peak_rss_bytes, rss)
+        if memory_budget is None or rss <= memory_budget:
+            return
+        while pending:
+            write_oldest()
+        if reader.chunk_size <= MIN_CHUNK_SIZE:
+            raise MemoryError(f"Resident memory {rss} bytes exceeds the budget of {memory_budget} bytes")
+        reader.chunk_size = max(reader.chunk_size // 2, MIN_CHUNK_SIZE)
+
+    try:
+        for specs in reader:
+            if writer.completed:
+                done = specs.index.astype(str).isin(writer.completed)
+                summary.skipped += int(done.sum())
+                specs = specs[~done]
+                if specs.empty:
+                    continue
+            if executor is None:
+                future = Future()
+                future.set_result(_simulate(specs, parameters, validate, fidelity=fidelity))
+            else:
+                climates = None
+                if shared_climates is not None:
+                    names = specs["meteorological_file"].dropna().unique()
+                    climates = shared_climates.share(n for n in names if isinstance(n, str) and n)
+                future = executor.submit(_simulate, specs, parameters, validate, climates, fidelity)
+            pending.append(future)
+            if len(pending) >= in_flight:
+                write_oldest()
+            check_memory()
+        while pending:
+            write_oldest()
+    finally:
+        reader.stop()
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+        if shared_climates is not None:
+            shared_climates.close()
+            parent_cache = get_climate_cache_stats() - parent_cache_before
+            summary.cache_hits += parent_cache["hits"]
+            summary.cache_misses += parent_cache["misses"]
+        writer.close()
+    summary.chunk_size = reader.chunk_size
+    summary.peak_rss_bytes = max(summary.peak_rss_bytes, get_rss_bytes())
+    summary.seconds = time.perf_counter() - start
+    if len(summary.diagnostics):
+        summary.diagnostics.log_summary()
+    return summary
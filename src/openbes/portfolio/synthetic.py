@@ -0,0 +1,155 @@
+"""
+Seeded generator of synthetic building portfolios, for scaling benchmarks and load testing.
+
+Buildings draw lighting systems from valid lamp technology, power and number combinations
+in lighting_data, plausible hot water, ventilation, envelope and schedule values, and one of
+the bundled climate files. The same seed always produces the same portfolio.
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+from pandas import DataFrame
+
+from ..simulations.climate import get_available_epw_files
+from ..simulations.lighting import get_lamp_table, DIRECT_POWER_TECHNOLOGIES
+from ..types import ENERGY_SOURCES, LIGHTING_BALLASTS, LIGHTING_TECHNOLOGIES
+from .reader import BUILDING_ID, coerce_specs_frame
+
+# Lighting zones populated in each building (the rest are left empty)
+MAX_LIGHTING_ZONES = 3
+# Lamp powers (W) and numbers offered for technologies not covered by a lamp table
+DIRECT_LAMP_POWERS = [5.0, 9.0, 12.0, 18.0, 24.0, 40.0, 60.0]
+DIRECT_LAMP_NUMBERS = [1.0, 2.0, 4.0]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+WEEKEND = ["saturday", "sunday"]
+FACADES = ["a", "b", "c", "d"]
+
+
+def _lamp_choices() -> list[tuple]:
+    """Every valid (technology, ballast, lamp_power, lamp_number) combination."""
+    tables = {t.name.lower(): t for t in LIGHTING_TECHNOLOGIES if t not in DIRECT_POWER_TECHNOLOGIES}
+    choices = []
+    for table, lamp_power, lamp_number in get_lamp_table().index:
+        if table == "ft_t8_be":
+            choices.append((LIGHTING_TECHNOLOGIES.FT_T8, LIGHTING_BALLASTS.BE, lamp_power, lamp_number))
+        elif table == "ft_t8":
+            choices.append((LIGHTING_TECHNOLOGIES.FT_T8, LIGHTING_BALLASTS.BF, lamp_power, lamp_number))
+        elif table in tables:
+            choices.append((tables[table], None, lamp_power, lamp_number))
+    for tech in DIRECT_POWER_TECHNOLOGIES:
+        for lamp_power in DIRECT_LAMP_POWERS:
+            for lamp_number in DIRECT_LAMP_NUMBERS:
+                choices.append((tech, None, lamp_power, lamp_number))
+    return choices
+
+
+def generate_portfolio(
+        n_buildings: int,
+        seed: int = 0,
+        climates: Optional[Sequence[str]] = None,
+        id_prefix: str = "synthetic-",
+) -> DataFrame:
+    """Generate a synthetic portfolio in the batch format (see openbes.portfolio.reader).
+    Args:
+        n_buildings (int): Number of buildings.
+        seed (int): Random seed; the same seed always gives the same portfolio.
+        climates (Optional[Sequence[str]]): meteorological_file values to draw from.
+            Defaults to every bundled EPW file.
+        id_prefix (str): Prefix of the generated building IDs.
+    Returns:
+        DataFrame: The batch, indexed by building ID.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_buildings
+
+    def uniform(low: float, high: float, decimals: int = 1) -> np.ndarray:
+        return rng.uniform(low, high, n).round(decimals)
+
+    def integers(low: int, high: int) -> np.ndarray:
+        return rng.integers(low, high, n, endpoint=True).astype(float)
+
+    def choice(options: Sequence, p: Optional[Sequence[float]] = None) -> np.ndarray:
+        picked = np.empty(n, dtype=object)
+        picked[:] = [options[i] for i in rng.choice(len(options), n, p=p)]
+        return picked
+
+    columns = {
+        "other_electricity_usage": uniform(100, 5000),
+        "building_standby_load": uniform(100, 5000),
+        "meteorological_file": choice(sorted(climates or get_available_epw_files())),
+    }
+
+    lamps = _lamp_choices()
+    zones_used = rng.integers(1, MAX_LIGHTING_ZONES, n, endpoint=True)
+    for zone in range(1, MAX_LIGHTING_ZONES + 1):
+        used = zones_used >= zone
+        picked = rng.integers(0, len(lamps), n)
+        for i, field in enumerate(("tech", "ballast", "lamp_power", "lamp_number")):
+            values = np.empty(n, dtype=object)
+            values[:] = [lamps[p][i] if u else None for p, u in zip(picked, used)]
+            columns[f"lighting_system_{field}_z{zone}"] = values
+        for field, values in (
+                ("luminary_number", integers(5, 200)),
+                ("similar_zone_number", integers(1, 4)),
+                ("operating_hours", integers(4, 12)),
+                ("simultaneity_factor", uniform(0.3, 1.0, 2)),
+        ):
+            columns[f"lighting_system_{field}_z{zone}"] = np.where(used, values, np.nan)
+
+    sources = ENERGY_SOURCES.list()
+    source_weights = [0.5, 0.05, 0.05, 0.3, 0.05, 0.05]
+    columns.update({
+        "water_system_energy_source": choice([ENERGY_SOURCES(s) for s in sources], p=source_weights),
+        "water_system_efficiency_cop": uniform(0.8, 1.0, 2),
+        "water_demand": uniform(20, 2000),
+        "water_reference_temperature": uniform(55, 65),
+        "water_supply_temperature": uniform(8, 18),
+        "ventilation_system1_energy_source": choice([ENERGY_SOURCES.Electricity]),
+        "ventilation_system1_rated_input_power": uniform(0.1, 5.0, 2),
+        "ventilation_system1_on_time": integers(6, 10),
+        "ventilation_system1_off_time": integers(14, 20),
+    })
+
+    length, width, storeys = uniform(8, 60), uniform(6, 30), integers(1, 5)
+    columns.update({
+        "building_length": length,
+        "building_width": width,
+        "building_height": (storeys * 3.0).round(1),
+        "ground_floor_area_z1": (length * width * storeys).round(1),
+        "uvalue_facade": uniform(0.15, 2.0, 2),
+        "uvalue_roof": uniform(0.1, 1.5, 2),
+        "uvalue_floor": uniform(0.1, 1.0, 2),
+        "uvalue_window": uniform(0.8, 5.5, 2),
+        "window_height": uniform(1.0, 2.0),
+        "window_length": uniform(0.8, 2.5),
+        "window_gvalue": uniform(0.3, 0.8, 2),
+        "window_frame_factor": uniform(0.1, 0.3, 2),
+        "leakage_air_flow_independent": uniform(0.3, 3.0, 2),
+        "appliances_load": uniform(2, 20),
+        "heating_system1_on_time": integers(6, 9),
+        "heating_system1_efficiency_cop": uniform(0.8, 4.0, 2),
+        "cooling_system1_energy_efficifiency_ratio": uniform(2.0, 4.5, 2),
+        "setpoint_winter_day": uniform(19, 22),
+        "setpoint_winter_night": uniform(14, 18),
+        "setpoint_summer_day": uniform(23, 27),
+        "setpoint_summer_night": uniform(26, 30),
+        "holiday": integers(0, 1),
+    })
+    for facade in FACADES:
+        columns[f"window_number_ground_{facade}1"] = integers(0, 20)
+    for zone, open_range, close_range in (
+            ("office", (7, 9), (17, 19)),
+            ("teaching", (8, 9), (15, 17)),
+            ("canteen", (11, 12), (14, 15)),
+    ):
+        columns[f"occupancy_open_{zone}"] = integers(*open_range)
+        columns[f"occupancy_close_{zone}"] = integers(*close_range)
+    for day in WEEKDAYS:
+        columns[f"schedule_{day}"] = np.ones(n)
+    weekend = integers(0, 1) * (rng.random(n) < 0.2)
+    for day in WEEKEND:
+        columns[f"schedule_{day}"] = weekend
+
+    frame = DataFrame(columns, index=[f"{id_prefix}{i:06d}" for i in range(n)])
+    frame.index.name = BUILDING_ID
+    return coerce_specs_frame(frame)
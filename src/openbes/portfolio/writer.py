@@ -0,0 +1,196 @@
+"""
+Stream batch pipeline results to a partitioned output directory.
+
+Results are written from a background thread so that simulation never waits on disk I/O.
+At most max_pending batches are buffered; beyond that, write() blocks until the writer
+catches up, which keeps memory flat however large the portfolio.
+
+The output directory uses Hive-style partitioning, e.g.
+
+    output/meteorological_file=UK_Oxford.epw/part-00000.csv
+
+so it can be queried directly with pandas, pyarrow.dataset, DuckDB, etc.
+Each row is one (building, category) pair with a column per month and an annual total.
+
+CSV partitions are appended to a single file per run. Parquet files cannot be appended to,
+so each batch is written to its own file in each partition.
+Progress is recorded in a ProgressJournal after every batch, so that an interrupted run
+can be resumed with resume=True.
+"""
+import os
+import threading
+from queue import Queue
+from typing import Optional
+
+from pandas import DataFrame
+
+from ..types import MONTHS
+from .journal import ProgressJournal
+
+CSV = "csv"
+PARQUET = "parquet"
+ANNUAL_TOTAL = "kWh/yr"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+DEFAULT_MAX_PENDING = 4
+
+
+def _partition_dir_name(column: str, value) -> str:
+    if value is None or value != value:
+        value = NULL_PARTITION
+    text = str(getattr(value, "value", value))
+    for c in (os.sep, "/", "\\", "="):
+        text = text.replace(c, "_")
+    return f"{column}={text}"
+
+
+def results_to_rows(results: DataFrame) -> DataFrame:
+    """Flatten batch pipeline results into output rows.
+    Args:
+        results (DataFrame): Output of batch_pipeline, indexed by (building, category).
+    Returns:
+        DataFrame: Columns building_id, category, one per month and the annual total.
+    """
+    rows = results.copy()
+    rows[ANNUAL_TOTAL] = rows[MONTHS.list()].sum(axis=1)
+    rows = rows.reset_index()
+    rows.columns = ["building_id", "category", *rows.columns[2:]]
+    rows["building_id"] = rows["building_id"].astype(str)
+    return rows
+
+
+class ResultWriter:
+    """Write per-building monthly results to CSV or Parquet files from a background thread.
+
+    Use as a context manager, or call close() when done; close() re-raises any error
+    that occurred in the background thread.
+    Args:
+        output_dir (str): Directory to write into. Created if needed.
+        file_format (str): "csv" or "parquet" (requires pyarrow).
+        partition_by (Optional[str]): Specification column to partition by
+            (e.g. "meteorological_file" or a building group column). None writes a single partition.
+        max_pending (int): Maximum number of batches buffered before write() blocks.
+        resume (bool): Continue an interrupted run in output_dir. Buildings listed in the journal
+            are available as `completed`, and any output written after the last journal record
+            is discarded.
+    Raises:
+        FileExistsError: If output_dir already holds a run and resume is False.
+    """
+    def __init__(
+            self,
+            output_dir: str,
+            file_format: str = CSV,
+            partition_by: Optional[str] = None,
+            max_pending: int = DEFAULT_MAX_PENDING,
+            resume: bool = False,
+    ):
+        if file_format not in (CSV, PARQUET):
+            raise ValueError(f"Unsupported output format: {file_format}")
+        if file_format == PARQUET:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Writing Parquet results requires pyarrow (pip install openBES[parquet])") from e
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.partition_by = partition_by
+        self.rows_written = 0
+        self.max_pending = max_pending
+        self._queue = Queue(maxsize=max_pending)
+        self._error = None
+        os.makedirs(output_dir, exist_ok=True)
+        self.journal = ProgressJournal(output_dir)
+        if self.journal.exists():
+            if not resume:
+                raise FileExistsError(
+                    f"{output_dir} already contains results; use resume=True to continue that run"
+                )
+            self.journal.load()
+            self.journal.restore_outputs(self._output_file_names())
+        self.completed = frozenset(self.journal.completed)
+        self._thread = threading.Thread(target=self._run, name="openbes-result-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, specs: DataFrame, results: DataFrame) -> None:
+        """Queue a batch of results for writing. Blocks while the buffer is full.
+        Args:
+            specs (DataFrame): The batch of specifications the results were computed from.
+            results (DataFrame): Output of batch_pipeline for that batch.
+        """
+        self._raise_if_failed()
+        if self.partition_by is None:
+            keys = None
+        else:
+            # batch_pipeline returns the same number of category rows for every building, in order
+            keys = specs[self.partition_by].to_numpy().repeat(len(results) // max(len(specs), 1))
+        self._queue.put((results, keys))
+
+    def close(self) -> None:
+        """Flush outstanding results and stop the background thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Result writer failed") from self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # drain so that producers are not blocked
+            try:
+                self._write(*item)
+            except Exception as e:
+                self._error = e
+
+    def _output_file_names(self) -> list[str]:
+        names = []
+        for directory, _, files in os.walk(self.output_dir):
+            for f in files:
+                if f.startswith("part-") and f.endswith((f".{self.file_format}", f".{self.file_format}.tmp")):
+                    names.append(os.path.relpath(os.path.join(directory, f), self.output_dir))
+        return names
+
+    def _write(self, results: DataFrame, keys) -> None:
+        rows = results_to_rows(results)
+        if keys is None:
+            partitions = [("", rows)]
+        else:
+            keys = [_partition_dir_name(self.partition_by, k) for k in keys]
+            partitions = rows.groupby(keys, sort=False)
+        offsets = {}
+        for key, partition in partitions:
+            name = self._write_partition(key, partition)
+            offsets[name] = os.path.getsize(os.path.join(self.output_dir, name))
+        self.journal.record(list(dict.fromkeys(rows["building_id"])), offsets)
+        self.rows_written += len(rows)
+
+    def _write_partition(self, directory: str, rows: DataFrame) -> str:
+        os.makedirs(os.path.join(self.output_dir, directory), exist_ok=True)
+        if self.file_format == CSV:
+            name = os.path.join(directory, "part-00000.csv")
+            file_path = os.path.join(self.output_dir, name)
+            new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+            with open(file_path, "a", newline="") as f:
+                rows.to_csv(f, header=new_file, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            return name
+        import pyarrow
+        from pyarrow.parquet import write_table
+        name = os.path.join(directory, f"part-{self.journal.batches:05d}.parquet")
+        file_path = os.path.join(self.output_dir, name)
+        # Write to a temporary name and rename, so a partial file is never left under a part-* name
+        write_table(pyarrow.Table.from_pandas(rows, preserve_index=False), file_path + ".tmp")
+        os.replace(file_path + ".tmp", file_path)
+        return name
@@ -0,0 +1,250 @@
+"""
+Per-stage profiling hooks for the pipelines.
+
+Pipelines wrap each stage in `stage(name)`. When no hooks are registered this returns a shared
+no-op context manager, so instrumentation costs a function call and a list check. Registered
+hooks receive a StageEvent when each stage starts and another when it ends, with its wall time,
+CPU time and, if tracemalloc is tracing, its peak traced memory.
+
+Hooks only see stages run in the current process; stages run by portfolio workers in a process
+pool are not reported.
+
+    recorder = ChromeTraceRecorder()
+    histogram = StageHistogram()
+    with profile(recorder, histogram):
+        batch_pipeline(specs, parameters)
+    print(histogram.format())
+    recorder.export("trace.json")  # open in chrome://tracing or Perfetto
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+from pandas import DataFrame
+
+START = "start"
+END = "end"
+
+
+@dataclass
+class StageEvent:
+    """A stage starting or ending. Timings and memory are only set on END events."""
+    name: str
+    phase: str
+    wall_start: float  # time.perf_counter() when the stage started
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    memory_peak_bytes: Optional[int] = None
+    thread_id: int = 0
+    process_id: int = 0
+    metadata: dict = field(default_factory=dict)
+
+
+StageHook = Callable[[StageEvent], None]
+
+_hooks: list[StageHook] = []
+_NO_STAGE = nullcontext()
+_local = threading.local()
+
+
+def add_hook(hook: StageHook) -> None:
+    """Register a callback to receive StageEvents."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: StageHook) -> None:
+    """Unregister a callback added with add_hook."""
+    _hooks.remove(hook)
+
+
+@contextmanager
+def profile(*hooks: StageHook, trace_memory: bool = False) -> Iterator[None]:
+    """Register hooks for the duration of a block.
+    Args:
+        *hooks (StageHook): Callbacks to receive StageEvents.
+        trace_memory (bool): Start tracemalloc (if not already tracing) so that events report
+            peak memory. Tracing slows allocation-heavy code considerably.
+    """
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    for hook in hooks:
+        add_hook(hook)
+    try:
+        yield
+    finally:
+        for hook in hooks:
+            remove_hook(hook)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+class _Stage:
+    def __init__(self, name: str, metadata: dict):
+        self.name = name
+        self.metadata = metadata
+        self.child_peak = 0
+
+    def _emit(self, event: StageEvent) -> None:
+        for hook in list(_hooks):
+            hook(event)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.tracing = tracemalloc.is_tracing()
+        if self.tracing:
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        self._emit(StageEvent(
+            self.name, START, self.wall_start,
+            thread_id=threading.get_ident(), process_id=os.getpid(), metadata=self.metadata,
+        ))
+        return self
+
+    def __exit__(self, *exc_info):
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = time.process_time() - self.cpu_start
+        stack = _local.stack
+        stack.pop()
+        memory_peak = None
+        if self.tracing and tracemalloc.is_tracing():
+            # Nested stages reset the peak, so fold in the peaks they saw
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            memory_peak = peak - self.memory_start
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        self._emit(StageEvent(
+            self.name, END, self.wall_start, wall_seconds, cpu_seconds, memory_peak,
+            threading.get_ident(), os.getpid(), self.metadata,
+        ))
+        return False
+
+
+def stage(name: str, **metadata):
+    """Context manager marking a pipeline stage for any registered hooks.
+    Args:
+        name (str): Stage name, e.g. "lighting".
+        **metadata: Extra values passed to hooks on the stage's events (e.g. buildings=len(specs)).
+    """
+    if not _hooks:
+        return _NO_STAGE
+    return _Stage(name, metadata)
+
+
+class StageHistogram:
+    """Hook that aggregates stage wall times across a run into per-stage statistics and histograms.
+    Args:
+        bins_per_decade (int): Resolution of the logarithmic histogram buckets.
+    """
+    def __init__(self, bins_per_decade: int = 4):
+        self.bins_per_decade = bins_per_decade
+        self.wall_seconds: dict[str, list[float]] = {}
+        self.cpu_seconds: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: StageEvent) -> None:
+        if event.phase != END:
+            return
+        with self._lock:
+            self.wall_seconds.setdefault(event.name, []).append(event.wall_seconds)
+            self.cpu_seconds.setdefault(event.name, []).append(event.cpu_seconds)
+
+    def summary(self) -> DataFrame:
+        """Return count, total, percentiles and CPU share of each stage's wall time, in seconds."""
+        rows = []
+        for name, values in self.wall_seconds.items():
+            wall = np.array(values)
+            rows.append({
+                "stage": name,
+                "count": len(wall),
+                "total": wall.sum(),
+                "mean": wall.mean(),
+                "p50": np.percentile(wall, 50),
+                "p90": np.percentile(wall, 90),
+                "p99": np.percentile(wall, 99),
+                "max": wall.max(),
+                "cpu_total": sum(self.cpu_seconds[name]),
+            })
+        return DataFrame(rows, columns=[
+            "stage", "count", "total", "mean", "p50", "p90", "p99", "max", "cpu_total"
+        ]).set_index("stage")
+
+    def histogram(self, name: str) -> DataFrame:
+        """Return counts of a stage's wall times in logarithmic buckets.
+        Args:
+            name (str): Stage name.
+        Returns:
+            DataFrame: Columns low and high (bucket bounds, seconds) and count.
+        """
+        wall = np.maximum(np.array(self.wall_seconds[name]), 1e-9)
+        exponents = np.floor(np.log10(wall) * self.bins_per_decade)
+        buckets, counts = np.unique(exponents, return_counts=True)
+        return DataFrame({
+            "low": 10 ** (buckets / self.bins_per_decade),
+            "high": 10 ** ((buckets + 1) / self.bins_per_decade),
+            "count": counts,
+        })
+
+    def format(self, width: int = 40) -> str:
+        """Render the summary and a text histogram of each stage."""
+        summary = self.summary()
+        lines = []
+        for name, row in summary.sort_values("total", ascending=False).iterrows():
+            lines.append(
+                f"{name}: {row['count']:.0f} calls, {row['total']:.4f}s total, "
+                f"p50 {row['p50'] * 1000:.3f}ms, p90 {row['p90'] * 1000:.3f}ms, max {row['max'] * 1000:.3f}ms"
+            )
+            histogram = self.histogram(name)
+            most = histogram["count"].max()
+            for bucket in histogram.itertuples():
+                bar = "#" * max(1, round(bucket.count / most * width))
+                lines.append(f"  {bucket.low * 1000:>10.3f}ms - {bucket.high * 1000:>10.3f}ms {bucket.count:>7} {bar}")
+        return "\n".join(lines)
+
+
+class ChromeTraceRecorder:
+    """Hook that records stages as Chrome trace "complete" events, viewable in chrome://tracing or Perfetto."""
+    def __init__(self):
+        self.events: list[dict] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event: StageEvent) -> None:
+        if event.phase != END:
+            return
+        args = {"cpu_ms": event.cpu_seconds * 1000, **{k: _jsonable(v) for k, v in event.metadata.items()}}
+        if event.memory_peak_bytes is not None:
+            args["memory_peak_bytes"] = event.memory_peak_bytes
+        with self._lock:
+            self.events.append({
+                "name": event.name,
+                "ph": "X",
+                "ts": (event.wall_start - self._origin) * 1e6,
+                "dur": event.wall_seconds * 1e6,
+                "pid": event.process_id,
+                "tid": event.thread_id,
+                "args": args,
+            })
+
+    def to_dict(self) -> dict:
+        return {"traceEvents": sorted(self.events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}
+
+    def export(self, file_path: str) -> None:
+        """Write the trace as Chrome trace JSON."""
+        with open(file_path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+
+def _jsonable(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
@@ -0,0 +1,233 @@
+"""
+Search combinations of retrofit measures for the lowest energy use under a budget.
+
+Each measure (a lamp technology for one lighting zone, a ventilation schedule, a hot water
+system…) offers options that change some specification fields at a cost. Measures
+are grouped by what their fields feed (see pipeline.STAGE_FIELDS): measures that feed the same
+stage interact and are evaluated jointly, every combination of their options in one batch, while
+separate groups add up. Lighting zones add up too, so each zone's options are evaluated alone
+through lighting.get_kwh_per_day_for_zone_batch. Measures on fields that no stage reads, such as
+U-values while heating and cooling are not simulated, save nothing and are never chosen.
+
+Each group's results are computed once and reused for every combination that includes them.
+Dominated options (costing more for no saving) are pruned within each group, and again as groups
+are merged, together with anything over budget, leaving the Pareto front of cost against kWh.
+"""
+import itertools
+from dataclasses import dataclass, field, replace
+from typing import Any, Iterable
+
+import numpy as np
+from pandas import DataFrame, Series
+
+from .pipeline import CATEGORY_STAGES, LIGHTING_FIELD_ZONES, STAGE_FIELDS, evaluate
+from .portfolio.reader import specs_to_frame
+from .simulations import lighting
+from .types import LIGHTING_BALLASTS, LIGHTING_TECHNOLOGIES, OpenBESParameters, OpenBESSpecification
+from .types.coercion import SPECIFICATION_FIELD_TYPES, coerce_value
+
+# Name of the option that leaves a measure's fields as they are
+KEEP = "keep"
+
+
+@dataclass(frozen=True)
+class RetrofitOption:
+    """One way to carry out a measure: new values of some specification fields, at a cost."""
+    name: str
+    changes: dict[str, Any]
+    cost: float
+
+
+@dataclass(frozen=True)
+class Measure:
+    """A retrofit measure and its options; keeping the building as it is (KEEP) is always an option too."""
+    name: str
+    options: list[RetrofitOption] = field(default_factory=list)
+
+
+def lamp_measure(
+        spec: OpenBESSpecification,
+        zone: int,
+        lamps: dict[LIGHTING_TECHNOLOGIES, tuple[float, float]],
+) -> Measure:
+    """Return the measure of replacing the lamps of a lighting zone, keeping its luminaires.
+    Args:
+        spec (OpenBESSpecification): The building specification.
+        zone (int): The lighting zone.
+        lamps (dict[LIGHTING_TECHNOLOGIES, tuple[float, float]]): For each technology offered, the
+            power (W) of its lamps and the cost of fitting one luminaire. Luminaires keep their number
+            of lamps, and fluorescent tubes get electronic ballasts.
+    Returns:
+        Measure: One option per technology, costed for every luminaire of the zone and its similar zones.
+    Raises:
+        ValueError: If the zone has no luminaires, or a lamp has no entry in the lamp tables (lighting_data).
+    """
+    lamp_number = getattr(spec, f"lighting_system_lamp_number_z{zone}")
+    luminaires = (getattr(spec, f"lighting_system_luminary_number_z{zone}") or 0) * (
+        getattr(spec, f"lighting_system_similar_zone_number_z{zone}") or 0
+    )
+    if not lamp_number or not luminaires:
+        raise ValueError(f"Lighting zone {zone} has no luminaires")
+    lookup = lighting.get_lamp_lookup()
+    options = []
+    for tech, (lamp_power, cost) in lamps.items():
+        tech = LIGHTING_TECHNOLOGIES(coerce_value(LIGHTING_TECHNOLOGIES, tech))
+        table = lighting.get_lamp_table_name(tech, LIGHTING_BALLASTS.BE)
+        if table is not None and (table, float(lamp_power), float(lamp_number)) not in lookup:
+            raise ValueError(f"No {lamp_number:g} x {lamp_power:g} W {tech.name} luminaire in the lamp tables")
+        options.append(RetrofitOption(
+            tech.name,
+            {
+                f"lighting_system_tech_z{zone}": tech,
+                f"lighting_system_ballast_z{zone}": LIGHTING_BALLASTS.BE,
+                f"lighting_system_lamp_power_z{zone}": float(lamp_power),
+            },
+            cost * luminaires,
+        ))
+    return Measure(f"lighting zone {zone}", options)
+
+
+@dataclass
+class RetrofitPlans:
+    """The result of optimize_retrofit."""
+    # Plans on the Pareto front, cheapest first: their cost, annual kWh and saving, and the option
+    # chosen for each measure
+    front: DataFrame
+    baseline_kwh: float
+    # Combinations of options a brute-force search would run, and buildings actually evaluated
+    combinations: int
+    evaluations: int
+
+    @property
+    def best(self) -> Series:
+        """The plan with the lowest annual kWh within the budget (keeping everything if nothing affordable saves)."""
+        return self.front.iloc[-1]
+
+
+def _resources(measure: Measure) -> set:
+    # What a measure's fields feed: lighting zones, or other stages
+    resources = set()
+    for option in measure.options:
+        for name in option.changes:
+            if name in LIGHTING_FIELD_ZONES:
+                resources.add(("lighting", LIGHTING_FIELD_ZONES[name]))
+            else:
+                resources.update(stage for stage, fields in STAGE_FIELDS.items() if name in fields)
+    return resources
+
+
+def _groups(measures: list[Measure]) -> list[tuple[list[int], set]]:
+    """Group measures that feed a common resource, which interact; other groups add up."""
+    groups: list[tuple[list[int], set]] = []
+    for i, measure in enumerate(measures):
+        members, resources = [i], _resources(measure)
+        for other in [g for g in groups if g[1] & resources]:
+            groups.remove(other)
+            members, resources = sorted(other[0] + members), other[1] | resources
+        groups.append((members, resources))
+    return groups
+
+
+def apply_plan(spec: OpenBESSpecification, measures: list[Measure], choices: dict[str, str]) -> OpenBESSpecification:
+    """Return a specification with the chosen option of each measure applied.
+    Args:
+        spec (OpenBESSpecification): The building specification.
+        measures (list[Measure]): The measures.
+        choices (dict[str, str]): The option name chosen for each measure, e.g. a row of RetrofitPlans.front.
+            Measures left out, or given KEEP, are not applied.
+    Returns:
+        OpenBESSpecification: The retrofitted specification.
+    """
+    changes = {}
+    for measure in measures:
+        name = choices.get(measure.name, KEEP)
+        if name != KEEP:
+            changes.update(next(o for o in measure.options if o.name == name).changes)
+    return replace(spec, **{f: coerce_value(SPECIFICATION_FIELD_TYPES[f], v) for f, v in changes.items()})
+
+
+def _pareto(points: list[tuple[float, float, tuple]], budget: float) -> list[tuple[float, float, tuple]]:
+    # (cost, kWh, choices) points within budget that no cheaper or equally cheap point beats on kWh
+    front, lowest = [], np.inf
+    for point in sorted(points, key=lambda p: (p[0], p[1])):
+        if point[0] <= budget and point[1] < lowest:
+            front.append(point)
+            lowest = point[1]
+    return front
+
+
+def optimize_retrofit(
+        spec: OpenBESSpecification,
+        parameters: OpenBESParameters,
+        measures: Iterable[Measure],
+        budget: float = np.inf,
+) -> RetrofitPlans:
+    """Find the retrofit plans that use the least energy for their cost, within a budget.
+    Args:
+        spec (OpenBESSpecification): The building specification.
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        measures (Iterable[Measure]): Measures to combine, with distinct names; at most one option of each is chosen.
+        budget (float): Largest total cost of a plan.
+    Returns:
+        RetrofitPlans: The Pareto front of cost against annual kWh.
+    Raises:
+        ValueError: If an option changes an unknown specification field.
+    """
+    measures = list(measures)
+    unknown = sorted({f for m in measures for o in m.options for f in o.changes if f not in SPECIFICATION_FIELD_TYPES})
+    if unknown:
+        raise ValueError(f"Unknown specification fields {unknown}")
+    base = specs_to_frame([spec])
+    baseline = evaluate(base, parameters, outputs=["total"])
+    baseline_kwh = float(baseline["total"].iloc[0])
+
+    points = [(0.0, baseline_kwh, ())]
+    evaluations = 1
+    for members, resources in _groups(measures):
+        options = [[RetrofitOption(KEEP, {}, 0.0), *measures[i].options] for i in members]
+        combinations = list(itertools.product(*options))
+        specs = base.iloc[np.zeros(len(combinations), dtype=int)].copy()
+        for position in range(len(members)):
+            for option in options[position][1:]:
+                rows = np.array([c[position] is option for c in combinations])
+                for name, value in option.changes.items():
+                    column = specs[name].to_numpy(copy=True)
+                    column[rows] = coerce_value(SPECIFICATION_FIELD_TYPES[name], value)
+                    specs[name] = column
+        if not resources:
+            # Fields that no stage reads
+            kwh = np.zeros(len(combinations))
+        elif len(resources) == 1 and isinstance(zone := next(iter(resources)), tuple):
+            # One lighting zone: the other zones and stages do not change
+            days = lighting.LIGHTING_OPERATIONAL_DAYS_DF.values.sum()
+            kwh = lighting.get_kwh_per_day_for_zone_batch(specs, zone[1]) * days
+        else:
+            stages = {"lighting" if isinstance(r, tuple) else r for r in resources}
+            categories = [c for c, stage in CATEGORY_STAGES.items() if stage in stages]
+            kwh = evaluate(specs, parameters, categories, ["total"])["total"].to_numpy()
+        evaluations += len(combinations) if resources else 0
+        # Savings relative to keeping everything, which is the first combination
+        group = _pareto(
+            [(sum(o.cost for o in c), kwh[i] - kwh[0], c) for i, c in enumerate(combinations)], budget
+        )
+        points = _pareto([
+            (cost + group_cost, total + delta, (*chosen, *zip(members, group_choices)))
+            for cost, total, chosen in points
+            for group_cost, delta, group_choices in group
+        ], budget)
+
+    records = []
+    for cost, kwh, chosen in points:
+        choices = {measures[i].name: option.name for i, option in chosen}
+        records.append({
+            "cost": cost,
+            "kWh/yr": kwh,
+            "saving kWh/yr": baseline_kwh - kwh,
+            **{m.name: choices.get(m.name, KEEP) for m in measures},
+        })
+    return RetrofitPlans(
+        front=DataFrame(records),
+        baseline_kwh=baseline_kwh,
+        combinations=int(np.prod([len(m.options) + 1 for m in measures])),
+        evaluations=evaluations,
+    )
@@ -0,0 +1,348 @@
+"""
+A local HTTP/JSON simulation service.
+
+The service keeps warm workers: climate files, lamp tables, validation rules and calendars are
+loaded before the first request, so a request only pays for simulating its own building.
+Identical requests that arrive while one is being simulated share its result instead of
+simulating again, and recent results are kept in a small cache.
+
+Endpoints:
+    POST /simulate  {"spec": {<field>: <value>, ...}, "parameters": {<field>: <value>, ...}}
+                    Fields are coerced as in TOML cases (see openbes.types.coercion); parameters
+                    are optional and default to the service's. Returns monthly kWh by category,
+                    or 400 if the request or its meteorological_file cannot be read.
+    GET /metrics    Request counts and latency percentiles.
+    GET /health     {"status": "ok"} once the workers are warm.
+
+Usage:
+    openbes-service [--port 8765] [--jobs N] [--cache-dir DIR] [--parameters CASE.toml]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from .cases import load_case
+from .diagnostics import collecting
+from .pipeline import batch_pipeline, CLIMATE_STAGES
+from .portfolio.reader import specs_to_frame
+from .simulations.climate import (
+    get_available_epw_files, load_climate, set_cache_dir, SharedClimates, use_shared_climates,
+)
+from .simulations.lighting import get_lamp_lookup
+from .types import OpenBESParameters
+from .types.coercion import coerce_value, spec_from_dict, parameters_from_dict
+from .validation import get_compiled_rules
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_RESULT_CACHE_SIZE = 1024
+# Latencies kept for the percentiles reported at /metrics
+DEFAULT_LATENCY_WINDOW = 10_000
+
+
+def warm_up(climates: Optional[Iterable[str]] = None) -> None:
+    """Load everything a simulation reads from disk or builds once per process.
+    Args:
+        climates (Optional[Iterable[str]]): meteorological_file values to load. Defaults to every
+            bundled climate file.
+    """
+    for climate in get_available_epw_files() if climates is None else climates:
+        load_climate(climate)
+    get_lamp_lookup()
+    get_compiled_rules()
+    # The first run through the engines builds their remaining lookups (e.g. the occupancy calendars)
+    batch_pipeline(specs_to_frame([spec_from_dict({})]), OpenBESParameters())
+
+
+def _warm_up_worker(segments: dict, climates: Optional[list[str]]) -> None:
+    use_shared_climates(segments)
+    warm_up(climates)
+
+
+def simulate(spec_data: dict[str, Any], parameters: OpenBESParameters) -> dict[str, Any]:
+    """Simulate one building from raw JSON values.
+    Args:
+        spec_data (dict[str, Any]): Specification field to raw value; unknown fields are ignored.
+        parameters (OpenBESParameters): Simulation parameters.
+    Returns:
+        dict[str, Any]: "results" (category to month to kWh) and "diagnostics" (input problems found).
+    """
+    with collecting() as diagnostics:
+        results = batch_pipeline(specs_to_frame([spec_from_dict(spec_data)]), parameters)
+    # Built from plain lists: DataFrame.to_dict alone takes about 1 ms for one building
+    months = list(results.columns)
+    categories = results.index.get_level_values("category")
+    return {
+        "results": {c: dict(zip(months, row)) for c, row in zip(categories, results.to_numpy().tolist())},
+        "diagnostics": [
+            {"category": category, "field": field, "code": code, "count": count}
+            for (category, field, code), count in diagnostics.counts.items()
+        ],
+    }
+
+
+class SimulationService:
+    """Simulates single buildings on warm workers, sharing the work of identical requests.
+    Args:
+        parameters (Optional[OpenBESParameters]): Parameters for requests that give none.
+        jobs (int): Number of worker processes. 0 simulates on the request threads of this process.
+        climates (Optional[Iterable[str]]): Climate files to load before serving. Defaults to all bundled files.
+            Worker processes share them only if a stage reads them (see pipeline.CLIMATE_STAGES).
+        result_cache_size (int): Number of recent results kept. 0 disables the cache.
+        latency_window (int): Number of recent request latencies kept for the percentiles.
+    """
+    def __init__(
+            self,
+            parameters: Optional[OpenBESParameters] = None,
+            jobs: int = 0,
+            climates: Optional[Iterable[str]] = None,
+            result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+            latency_window: int = DEFAULT_LATENCY_WINDOW,
+    ):
+        self.parameters = parameters or OpenBESParameters()
+        self.jobs = jobs
+        self.result_cache_size = result_cache_size
+        climates = None if climates is None else list(climates)
+        warm_up(climates)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._shared_climates: Optional[SharedClimates] = None
+        if jobs > 0:
+            # Workers only load climate files if a stage reads them, and then view this process's arrays
+            segments, worker_climates = {}, []
+            if CLIMATE_STAGES:
+                self._shared_climates = SharedClimates()
+                segments = self._shared_climates.share(get_available_epw_files() if climates is None else climates)
+                worker_climates = climates
+            self.executor = ProcessPoolExecutor(
+                max_workers=jobs, initializer=_warm_up_worker, initargs=(segments, worker_climates),
+            )
+            # Start every worker now rather than on the first requests
+            for future in [self.executor.submit(time.sleep, 0.01) for _ in range(jobs)]:
+                future.result()
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._results: OrderedDict[str, dict] = OrderedDict()
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.simulated = 0
+
+    def _key(self, spec_data: dict, parameters: OpenBESParameters) -> str:
+        return json.dumps([spec_data, asdict(parameters)], sort_keys=True, default=str)
+
+    def _simulate(self, spec_data: dict, parameters: OpenBESParameters) -> dict:
+        if self.executor is None:
+            return simulate(spec_data, parameters)
+        return self.executor.submit(simulate, spec_data, parameters).result()
+
+    def resolve(self, spec_data: dict[str, Any], parameters_data: Optional[dict[str, Any]] = None) -> OpenBESParameters:
+        """Check that a request's inputs can be read, and return its parameters.
+        Args:
+            spec_data (dict[str, Any]): Specification field to raw value.
+            parameters_data (Optional[dict[str, Any]]): Parameter field to raw value. Defaults to the
+                service's parameters.
+        Returns:
+            OpenBESParameters: The coerced parameters.
+        Raises:
+            FileNotFoundError: If the meteorological_file matches no climate file.
+            ValueError: If the climate file cannot be read.
+        """
+        climate = coerce_value(str, spec_data.get("meteorological_file"))
+        if climate is not None:
+            # Already loaded for the climates warmed up, so this only costs a lookup
+            load_climate(climate)
+        return self.parameters if parameters_data is None else parameters_from_dict(parameters_data)
+
+    def simulate(self, spec_data: dict[str, Any], parameters_data: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        """Simulate one building, or wait for an identical request already being simulated.
+        Args:
+            spec_data (dict[str, Any]): Specification field to raw value.
+            parameters_data (Optional[dict[str, Any]]): Parameter field to raw value. Defaults to the
+                service's parameters.
+        Returns:
+            dict[str, Any]: See simulate.
+        Raises:
+            FileNotFoundError: If the meteorological_file matches no climate file (see resolve).
+            ValueError: If the climate file cannot be read.
+        """
+        start = time.perf_counter()
+        parameters = self.resolve(spec_data, parameters_data)
+        key = self._key(spec_data, parameters)
+        owner = False
+        with self._lock:
+            self.requests += 1
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.cache_hits += 1
+                result = self._results[key]
+                self._latencies.append(time.perf_counter() - start)
+                return result
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = Future()
+                owner = True
+            else:
+                self.coalesced += 1
+        if owner:
+            # Simulated outside the lock; identical requests arriving meanwhile wait on the future
+            try:
+                result = self._simulate(spec_data, parameters)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._lock:
+                del self._in_flight[key]
+                if future.exception() is None:
+                    self.simulated += 1
+                    if self.result_cache_size > 0:
+                        self._results[key] = result
+                        while len(self._results) > self.result_cache_size:
+                            self._results.popitem(last=False)
+        try:
+            return future.result()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+
+    def metrics(self) -> dict[str, Any]:
+        """Return request counts and latency percentiles in milliseconds over recent requests."""
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            metrics = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "simulated": self.simulated,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "in_flight": len(self._in_flight),
+                "jobs": self.jobs,
+                "uptime_seconds": time.time() - self.started,
+            }
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+            metrics["latency_ms"] = {
+                "count": len(latencies), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+                "max": float(latencies.max()),
+            }
+        return metrics
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        if self._shared_climates is not None:
+            self._shared_climates.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep connections open between requests from the same client
+    protocol_version = "HTTP/1.1"
+    # Send the body as soon as it is written, not after the client acknowledges the headers
+    # (its delayed acknowledgement otherwise adds about 40 ms to every response)
+    disable_nagle_algorithm = True
+    service: SimulationService
+
+    def _send(self, status: HTTPStatus, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            self._send(HTTPStatus.OK, self.service.metrics())
+        elif self.path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok"})
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/simulate":
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            spec_data, parameters_data = request["spec"], request.get("parameters")
+            if not isinstance(spec_data, dict) or not isinstance(parameters_data, (dict, type(None))):
+                raise TypeError("spec and parameters must be JSON objects")
+            self.service.resolve(spec_data, parameters_data)
+        except (ValueError, KeyError, TypeError, FileNotFoundError) as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e!r}"})
+            return
+        try:
+            self._send(HTTPStatus.OK, self.service.simulate(spec_data, parameters_data))
+        except Exception as e:
+            logger.exception("Simulation failed")
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(e)})
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format, *args)
+
+
+def make_server(service: SimulationService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Create an HTTP server for a service. Port 0 picks a free port (see server.server_address).
+    Args:
+        service (SimulationService): The service to expose.
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+    Returns:
+        ThreadingHTTPServer: The server, which handles each request on its own thread once serve_forever is called.
+    """
+    handler = type("Handler", (_Handler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="openbes-service", description="Serve OpenBES simulations over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default {DEFAULT_PORT}).")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes (default 0: request threads).")
+    parser.add_argument("--cache-dir", default=None, help="Keep parsed climate files here between runs.")
+    parser.add_argument("--climate", action="append", default=None, help="Climate file to preload (default: all).")
+    parser.add_argument("--parameters", default=None, help="TOML case whose d.* parameters are the default.")
+    parser.add_argument("--result-cache-size", type=int, default=DEFAULT_RESULT_CACHE_SIZE,
+                        help="Recent results to keep (0 disables the cache).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.cache_dir is not None:
+        set_cache_dir(args.cache_dir)
+    parameters = load_case(args.parameters)[1] if args.parameters else None
+    service = SimulationService(
+        parameters, jobs=args.jobs, climates=args.climate, result_cache_size=args.result_cache_size,
+    )
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
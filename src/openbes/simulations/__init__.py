@@ -0,0 +1,28 @@
+"""
+Simulation engines, one module per energy use.
+
+Modules are imported when first accessed (e.g. `simulations.hot_water`), so using one engine
+does not import the others or their dependencies.
+"""
+import importlib
+
+SUBMODULES = {
+    "climate",
+    "cooling",
+    "envelope",
+    "hot_water",
+    "lighting",
+    "occupancy",
+    "utils",
+    "ventilation",
+}
+
+
+def __getattr__(name: str):
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | SUBMODULES)
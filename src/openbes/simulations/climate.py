@@ -1,11 +1,45 @@
-from pvlib.iotools import read_epw
-from pandas import DataFrame
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Optional
+from pandas import DataFrame, read_csv
+import numpy as np
 import os
+from .utils import DAYS_PER_MONTH, HOURS_PER_DAY, HOURS_PER_YEAR
 from ..types import OpenBESSpecification
 
 
 RELATIVE_HUMIDITY = 55.0  # Percentage
 
+CLIMATE_DATA_DIR = os.path.join(os.path.dirname(__file__), "climate_data")
+
+# Hourly variables used by the simulations, and their column positions in an EPW data row
+EPW_COLUMNS = {
+    "temp_air": 6,
+    "relative_humidity": 8,
+    "ghi": 13,
+    "dni": 14,
+    "dhi": 15,
+    "wind_speed": 21,
+}
+CLIMATE_VARIABLES = list(EPW_COLUMNS)
+EPW_HEADER_LINES = 8
+# Base temperatures (°C) of the degree-days in ClimateStatistics
+DEGREE_DAY_BASES = np.arange(-10.0, 41.0)
+# Lower edges (°C) of the temperature bins in ClimateStatistics; the first and last bins are open-ended
+TEMPERATURE_BINS = np.arange(-30.0, 46.0, 2.0)
+# Directory for binary copies of parsed climate files, shared by worker processes through the environment
+CACHE_DIR_ENV = "OPENBES_CACHE_DIR"
+
+# Climate loads served from the on-disk cache or shared memory, and EPW files parsed
+_disk_cache_stats = Counter()
+# Shared memory segment name and array shape of climates published by another process (see SharedClimates)
+_shared_segments: dict[str, tuple[str, tuple[int, ...]]] = {}
+# Segments attached in this process, kept open for the arrays that view them
+_attached_segments: list[SharedMemory] = []
+
+
 def get_available_epw_files() -> list[str]:
     """
     Returns a list of available EPW climate data files.
@@ -24,6 +58,9 @@ def get_hourly_dry_bulb_temperature(spec: OpenBESSpecification) -> DataFrame:
     Placeholder function to get hourly dry bulb temperature.
     In a real implementation, this would retrieve data from a climate dataset.
     """
+    # pvlib takes longer to import than the rest of openbes, so only load it when it is needed
+    from pvlib.iotools import read_epw
+
     file_name = spec.meteorological_file
     path = os.path.join(
         os.path.dirname(__file__),
@@ -32,3 +69,266 @@ def get_hourly_dry_bulb_temperature(spec: OpenBESSpecification) -> DataFrame:
     )
     epw, epw_metadata = read_epw(path)
     return epw
+
+def resolve_climate_file(name: str) -> str:
+    """Find the bundled EPW file for a meteorological_file value.
+
+    Accepts a file name (with or without the .epw extension), a path to an EPW file,
+    or a short name whose underscore-separated parts all appear in exactly one bundled
+    file name (e.g. "725650_Denver" for "USA_Denver_725650TYCST.epw").
+    Args:
+        name (str): The meteorological_file value.
+    Returns:
+        str: Path to the EPW file.
+    Raises:
+        FileNotFoundError: If no single EPW file matches.
+    """
+    if os.path.isfile(name):
+        return name
+    available = get_available_epw_files()
+    for candidate in (name, f"{name}.epw"):
+        if candidate in available:
+            return os.path.join(CLIMATE_DATA_DIR, candidate)
+    parts = [p.lower() for p in name.split("_") if p]
+    matches = [f for f in available if parts and all(p in f.lower() for p in parts)]
+    if len(matches) == 1:
+        return os.path.join(CLIMATE_DATA_DIR, matches[0])
+    raise FileNotFoundError(f"No unique climate file matches {name!r} (candidates: {matches or available})")
+
+def set_cache_dir(cache_dir: Optional[str]) -> None:
+    """Keep binary copies of parsed climate files in a directory, so later runs skip EPW parsing.
+
+    The setting is stored in the OPENBES_CACHE_DIR environment variable, so worker processes
+    started afterwards use the same cache.
+    Args:
+        cache_dir (Optional[str]): The cache directory, created if needed. None disables the cache.
+    """
+    if cache_dir is None:
+        os.environ.pop(CACHE_DIR_ENV, None)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ[CACHE_DIR_ENV] = cache_dir
+
+def get_cache_file(file_path: str) -> Optional[str]:
+    """Return where the binary copy of an EPW file is cached, or None if no cache directory is set.
+
+    The name includes the file's size and modification time, so edited files are parsed again.
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    stat = os.stat(file_path)
+    return os.path.join(cache_dir, f"{os.path.basename(file_path)}-{stat.st_size}-{stat.st_mtime_ns}.npy")
+
+def read_epw_array(file_path: str) -> np.ndarray:
+    """Parse the hourly climate variables used by the simulations from an EPW file.
+
+    Files covering a leap year have 29 February removed so that every year has HOURS_PER_YEAR hours.
+    Args:
+        file_path (str): Path to the EPW file.
+    Returns:
+        np.ndarray: float64 array of shape (len(CLIMATE_VARIABLES), HOURS_PER_YEAR).
+    """
+    data = read_csv(
+        file_path,
+        skiprows=EPW_HEADER_LINES,
+        header=None,
+        usecols=[1, 2, *EPW_COLUMNS.values()],
+        encoding="latin-1",
+    )
+    data = data[~((data[1] == 2) & (data[2] == 29))]
+    if len(data) != HOURS_PER_YEAR:
+        raise ValueError(f"Climate file {file_path!r} has {len(data)} hours; expected {HOURS_PER_YEAR}")
+    return data[list(EPW_COLUMNS.values())].to_numpy(dtype=np.float64).T.copy()
+
+@lru_cache(maxsize=None)
+def load_climate(name: str) -> np.ndarray:
+    """Load the hourly climate variables used by the simulations for a meteorological file.
+
+    Parsed files are kept in memory, and on disk if a cache directory is set (see set_cache_dir).
+    Files published by another process with SharedClimates (see use_shared_climates) are used
+    from shared memory instead. The result is read-only.
+    Args:
+        name (str): The meteorological_file value (see resolve_climate_file).
+    Returns:
+        np.ndarray: float64 array of shape (len(CLIMATE_VARIABLES), HOURS_PER_YEAR).
+    """
+    if name in _shared_segments:
+        segment, shape = _shared_segments[name]
+        memory = SharedMemory(name=segment)
+        _attached_segments.append(memory)
+        _disk_cache_stats["hits"] += 1
+        array = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+        array.setflags(write=False)
+        return array
+    file_path = resolve_climate_file(name)
+    cache_file = get_cache_file(file_path)
+    if cache_file is not None and os.path.exists(cache_file):
+        _disk_cache_stats["hits"] += 1
+        return np.load(cache_file, mmap_mode="r")
+    _disk_cache_stats["misses"] += 1
+    array = read_epw_array(file_path)
+    if cache_file is not None:
+        # Write under a temporary name so other processes never see a partial file
+        temporary = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, array)
+        os.replace(temporary, cache_file)
+    array.setflags(write=False)
+    return array
+
+class SharedClimates:
+    """Climate arrays copied into shared memory, for worker processes to use without loading them.
+
+    The segments are removed by close(). If this process dies first, they are removed by the
+    multiprocessing resource tracker that SharedMemory registers them with.
+    """
+    def __init__(self):
+        self._segments: dict[str, SharedMemory] = {}
+        self._shapes: dict[str, tuple[int, ...]] = {}
+
+    def share(self, names: Iterable[str]) -> dict[str, tuple[str, tuple[int, ...]]]:
+        """Load climate files in this process and copy them into shared memory, once per file.
+        Args:
+            names (Iterable[str]): meteorological_file values. Files that cannot be loaded are not shared
+                (validation.validate_batch reports them).
+        Returns:
+            dict[str, tuple[str, tuple[int, ...]]]: Segment name and array shape of each shared file,
+                for use_shared_climates.
+        """
+        shared = {}
+        for name in names:
+            if name not in self._segments:
+                try:
+                    array = load_climate(name)
+                except (FileNotFoundError, ValueError):
+                    continue
+                memory = SharedMemory(create=True, size=array.nbytes)
+                np.ndarray(array.shape, dtype=np.float64, buffer=memory.buf)[:] = array
+                self._segments[name] = memory
+                self._shapes[name] = array.shape
+            shared[name] = (self._segments[name].name, self._shapes[name])
+        return shared
+
+    def close(self) -> None:
+        for memory in self._segments.values():
+            memory.close()
+            memory.unlink()
+        self._segments.clear()
+
+    def __enter__(self) -> "SharedClimates":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def use_shared_climates(segments: dict[str, tuple[str, tuple[int, ...]]]) -> None:
+    """Have load_climate use climate files shared by another process (see SharedClimates.share).
+    Files this process has already loaded keep their loaded copy.
+    Args:
+        segments (dict[str, tuple[str, tuple[int, ...]]]): Segment name and array shape by meteorological_file.
+    """
+    _shared_segments.update(segments)
+
+def get_climate_cache_stats() -> Counter:
+    """Return climate files loaded from the disk cache or shared memory ("hits") and EPW files parsed ("misses").
+
+    Lookups of files already in this process's memory are not counted (see load_climates).
+    Returns:
+        Counter: Counts since the process started.
+    """
+    return Counter({"hits": _disk_cache_stats["hits"], "misses": _disk_cache_stats["misses"]})
+
+def load_climates(names: Iterable[str]) -> Counter:
+    """Load each of a set of climate files once, counting where they came from.
+    Args:
+        names (Iterable[str]): meteorological_file values. Files that cannot be loaded are skipped
+            (validation.validate_batch reports them).
+    Returns:
+        Counter: Files already in memory or loaded from the disk cache or shared memory ("hits"),
+            and EPW files parsed ("misses").
+    """
+    loads = Counter()
+    for name in set(names):
+        parsed = _disk_cache_stats["misses"]
+        try:
+            load_climate(name)
+        except (FileNotFoundError, ValueError):
+            continue
+        loads["misses" if _disk_cache_stats["misses"] > parsed else "hits"] += 1
+    return loads
+
+@dataclass(frozen=True)
+class ClimateStatistics:
+    """Monthly statistics of a climate file, for estimates that do not need hourly simulation.
+    Args:
+        heating_degree_days (np.ndarray): Degree-days (K·day) of dry bulb temperature below each of
+            DEGREE_DAY_BASES, shape (len(DEGREE_DAY_BASES), 12).
+        cooling_degree_days (np.ndarray): Degree-days above each of DEGREE_DAY_BASES, shaped likewise.
+        bin_hours (np.ndarray): Hours with a dry bulb temperature in each of TEMPERATURE_BINS, shape (12, bins).
+        mean_temperature (np.ndarray): Mean dry bulb temperature (°C) of each month.
+        mean_ghi (np.ndarray): Mean global horizontal irradiance (W/m²) of each month.
+    """
+    heating_degree_days: np.ndarray
+    cooling_degree_days: np.ndarray
+    bin_hours: np.ndarray
+    mean_temperature: np.ndarray
+    mean_ghi: np.ndarray
+
+def compute_climate_statistics(climate: np.ndarray) -> ClimateStatistics:
+    """Derive monthly statistics from hourly climate variables.
+    Args:
+        climate (np.ndarray): Array of shape (len(CLIMATE_VARIABLES), HOURS_PER_YEAR), as from load_climate.
+    Returns:
+        ClimateStatistics: The statistics.
+    """
+    temperature = climate[CLIMATE_VARIABLES.index("temp_air")]
+    ghi = climate[CLIMATE_VARIABLES.index("ghi")]
+    hours_per_month = np.array(DAYS_PER_MONTH) * HOURS_PER_DAY
+    month_start_hours = np.concatenate([[0], np.cumsum(hours_per_month)[:-1]])
+
+    def monthly_sum(hourly: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(hourly, month_start_hours, axis=-1)
+
+    difference = DEGREE_DAY_BASES[:, None] - temperature[None, :]
+    months = np.repeat(np.arange(len(DAYS_PER_MONTH)), hours_per_month)
+    bins = np.clip(np.digitize(temperature, TEMPERATURE_BINS) - 1, 0, len(TEMPERATURE_BINS) - 1)
+    bin_hours = np.zeros((len(DAYS_PER_MONTH), len(TEMPERATURE_BINS)))
+    np.add.at(bin_hours, (months, bins), 1)
+    return ClimateStatistics(
+        heating_degree_days=monthly_sum(np.maximum(difference, 0)) / HOURS_PER_DAY,
+        cooling_degree_days=monthly_sum(np.maximum(-difference, 0)) / HOURS_PER_DAY,
+        bin_hours=bin_hours,
+        mean_temperature=monthly_sum(temperature) / hours_per_month,
+        mean_ghi=monthly_sum(ghi) / hours_per_month,
+    )
+
+@lru_cache(maxsize=None)
+def get_climate_statistics(name: str) -> ClimateStatistics:
+    """Return the monthly statistics of a climate file, computed on first use.
+
+    With a cache directory (see set_cache_dir), they are stored as <cache file>.stats.npz next to
+    the binary copy of the climate file, so later runs read neither the EPW nor the hourly data.
+    Args:
+        name (str): The meteorological_file value (see resolve_climate_file).
+    Returns:
+        ClimateStatistics: The statistics.
+    Raises:
+        FileNotFoundError: If no single climate file matches the name.
+    """
+    cache_file = None if name in _shared_segments else get_cache_file(resolve_climate_file(name))
+    stats_file = None if cache_file is None else f"{cache_file[:-len('.npy')]}.stats.npz"
+    if stats_file is not None and os.path.exists(stats_file):
+        with np.load(stats_file) as data:
+            statistics = ClimateStatistics(**{k: data[k] for k in data.files})
+        # Files written for other DEGREE_DAY_BASES or TEMPERATURE_BINS are computed again
+        shapes = (statistics.heating_degree_days.shape[0], statistics.bin_hours.shape[1])
+        if shapes == (len(DEGREE_DAY_BASES), len(TEMPERATURE_BINS)):
+            return statistics
+    statistics = compute_climate_statistics(load_climate(name))
+    if stats_file is not None:
+        # Write under a temporary name so other processes never see a partial file
+        temporary = f"{stats_file}.{os.getpid()}.tmp.npz"
+        np.savez(temporary, **vars(statistics))
+        os.replace(temporary, stats_file)
+    return statistics
@@ -0,0 +1,331 @@
+"""
+Static envelope physics of a batch of buildings.
+
+Each envelope reduces to a few coefficients: its heat loss coefficient (transmission, thermal
+bridges and infiltration) and the effective solar collecting area of its windows. get_envelope_batch
+derives them once per building from the geometry, U-value, window and thermal bridge fields, the
+courtyards and the correction factors, and caches each building's on a fingerprint of those inputs.
+Simulations that change anything else (setpoints, schedules or the climate) reuse them.
+
+The specification only gives a building's overall dimensions, so the geometry assumes:
+    - Facades a and c run along building_length and b and d along building_width (LENGTH_FACADES).
+      Every facade wall is building_height tall, and its windows only take area from that wall.
+    - Courtyard walls are opaque and building_height tall. Courtyards also take their area off the
+      roof and ground floor, which are both the footprint (roof_angle is not used).
+    - Intermediate floors, for the facade_intermediate thermal bridge only, are one per STOREY_HEIGHT
+      of building_height above the first.
+    - orientation_angle is not used: solar apertures are per facade, and the engine that multiplies
+      them by irradiance decides which way each facade faces.
+"""
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from ..types import OpenBESParameters, FLOORS
+
+DEFAULT_DENSITY_OF_AIR = 1.2  # kg/m³
+DEFAULT_SPECIFIC_HEAT_OF_AIR = 1.005  # kJ/kgK
+FACADES = ["a", "b", "c", "d"]
+# Facades along the building length; the others are along its width
+LENGTH_FACADES = ["a", "c"]
+FLOOR_ZONES = range(1, 6)
+# Junctions flagged by thermal_bridge_<junction>
+THERMAL_BRIDGES = ["facade_roof", "facade_ground", "facade_intermediate", "window", "shading"]
+# Linear thermal transmittance (W/mK) of each flagged junction. The specification only says which
+# junctions have thermal bridges, so they add no heat loss unless get_envelope_batch is given values.
+DEFAULT_THERMAL_BRIDGE_PSI = dict.fromkeys(THERMAL_BRIDGES, 0.0)
+STOREY_HEIGHT = 3.0  # m, to count the intermediate floors of a building from its height (see the module docstring)
+# Specification fields and simulation parameters that the envelope depends on
+ENVELOPE_FIELDS = [
+    *(f"{floor.value}_floor_area_z{z}" for floor in FLOORS for z in FLOOR_ZONES),
+    "building_length", "building_width", "building_height",
+    *(f"window_number_{floor.value}_{facade}1" for floor in FLOORS for facade in FACADES),
+    "window_height", "window_length", "window_gvalue", "window_frame_factor",
+    "uvalue_facade", "uvalue_window", "uvalue_roof", "uvalue_floor", "leakage_air_flow_independent",
+    *(f"thermal_bridge_{junction}" for junction in THERMAL_BRIDGES),
+]
+ENVELOPE_PARAMETERS = [
+    "facade_correction_factor", "window_correction_factor", "roof_correction_factor", "floor_correction_factor",
+    "infiltration_correction_factor", "shading_correction_factor", "density_of_air", "specific_heat_of_air",
+    "courtyard_number", "courtyard_length", "courtyard_width",
+]
+# Buildings whose envelope get_envelope_batch keeps, about 1 kB each with their fingerprint
+ENVELOPE_CACHE_SIZE = 20_000
+
+# The coefficients of each building, as the bytes of a row of Envelope fields (see _envelope_rows), by fingerprint
+_envelope_cache: OrderedDict[bytes, bytes] = OrderedDict()
+_envelope_cache_stats = Counter()
+
+
+def _column(specs: DataFrame, field: str, default: float = np.nan) -> np.ndarray:
+    return specs[field].to_numpy(dtype=float, na_value=np.nan) if field in specs else np.full(len(specs), default)
+
+
+def _parameter(parameters: Optional[OpenBESParameters], field: str, default: float) -> float:
+    value = getattr(parameters, field, None)
+    return default if value is None else value
+
+
+def get_floor_area_batch(specs: DataFrame) -> np.ndarray:
+    """Return the conditioned floor area: the sum of the zone areas on every floor, or length × width.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        np.ndarray: Floor area in m², one per building.
+    """
+    areas = np.stack([
+        _column(specs, f"{floor.value}_floor_area_z{z}") for floor in FLOORS for z in FLOOR_ZONES
+    ], axis=1)
+    total = np.nansum(areas, axis=1)
+    footprint = np.nan_to_num(_column(specs, "building_length") * _column(specs, "building_width"))
+    return np.where(total > 0, total, footprint)
+
+
+def _window_numbers(specs: DataFrame) -> np.ndarray:
+    # Windows on each facade, summed over the floors: shape (buildings, facades)
+    return np.stack([
+        np.nansum(np.stack([
+            _column(specs, f"window_number_{floor.value}_{facade}1") for floor in FLOORS
+        ], axis=1), axis=1)
+        for facade in FACADES
+    ], axis=1)
+
+
+def get_window_area_batch(specs: DataFrame) -> np.ndarray:
+    """Return the total window area over every floor and facade.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        np.ndarray: Window area in m², one per building.
+    """
+    windows = _window_numbers(specs).sum(axis=1)
+    return np.nan_to_num(windows * _column(specs, "window_height") * _column(specs, "window_length"))
+
+
+@dataclass(frozen=True)
+class Envelope:
+    """The static heat loss and solar gain coefficients of a batch of buildings.
+
+    Per-facade arrays (FACADE_FIELDS) have shape (buildings, len(FACADES)); the others have one value per building.
+    """
+    floor_area: np.ndarray  # m², conditioned
+    window_area: np.ndarray  # m² per facade
+    opaque_area: np.ndarray  # m² of wall per facade, without its windows
+    courtyard_wall_area: np.ndarray  # m² of courtyard walls, which are opaque
+    transmission: np.ndarray  # W/K through the opaque walls, windows, roof and ground floor (UA)
+    thermal_bridges: np.ndarray  # W/K through flagged junctions
+    infiltration: np.ndarray  # W/K
+    heat_loss: np.ndarray  # W/K, the sum of the above
+    solar_aperture: np.ndarray  # m² of effective collecting area per facade, to multiply by its irradiance
+    total_solar_aperture: np.ndarray  # m², over every facade
+
+
+# Fields of Envelope with a value per facade
+FACADE_FIELDS = ("window_area", "opaque_area", "solar_aperture")
+
+
+def derive_envelope_batch(
+        specs: DataFrame,
+        parameters: Optional[OpenBESParameters],
+        psi: Optional[dict[str, float]] = None,
+) -> Envelope:
+    """Derive the envelope coefficients of a batch of buildings (see get_envelope_batch, which caches them).
+
+    The geometry follows the assumptions in the module docstring.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        parameters (OpenBESParameters): Simulation parameters (correction factors, air properties and courtyards).
+        psi (Optional[dict[str, float]]): Linear thermal transmittance (W/mK) of each of THERMAL_BRIDGES.
+            Defaults to DEFAULT_THERMAL_BRIDGE_PSI.
+    Returns:
+        Envelope: The coefficients.
+    """
+    psi = {**DEFAULT_THERMAL_BRIDGE_PSI, **(psi or {})}
+    length = _column(specs, "building_length")
+    width = _column(specs, "building_width")
+    height = _column(specs, "building_height")
+    window_height = _column(specs, "window_height")
+    window_length = _column(specs, "window_length")
+    floor_area = get_floor_area_batch(specs)
+    window_numbers = _window_numbers(specs)
+    window_area = np.nan_to_num(window_numbers * (window_height * window_length)[:, None])
+    total_window_area = window_area.sum(axis=1)
+
+    courtyards = _parameter(parameters, "courtyard_number", 0)
+    courtyard_length = _parameter(parameters, "courtyard_length", 0)
+    courtyard_width = _parameter(parameters, "courtyard_width", 0)
+    courtyard_wall_area = np.nan_to_num(courtyards * 2 * (courtyard_length + courtyard_width) * height)
+    footprint = length * width - courtyards * courtyard_length * courtyard_width
+    perimeter = 2 * (length + width) + courtyards * 2 * (courtyard_length + courtyard_width)
+    facade_length = np.stack([length if f in LENGTH_FACADES else width for f in FACADES], axis=1)
+    opaque_area = np.nan_to_num(np.fmax(facade_length * height[:, None] - window_area, 0))
+
+    transmission = (
+        np.nan_to_num(_column(specs, "uvalue_facade") * (opaque_area.sum(axis=1) + courtyard_wall_area))
+        * _parameter(parameters, "facade_correction_factor", 1)
+        + np.nan_to_num(_column(specs, "uvalue_window") * total_window_area)
+        * _parameter(parameters, "window_correction_factor", 1)
+        + np.nan_to_num(_column(specs, "uvalue_roof") * footprint)
+        * _parameter(parameters, "roof_correction_factor", 1)
+        + np.nan_to_num(_column(specs, "uvalue_floor") * footprint)
+        * _parameter(parameters, "floor_correction_factor", 1)
+    )
+    windows = window_numbers.sum(axis=1)
+    junction_lengths = {
+        "facade_roof": perimeter,
+        "facade_ground": perimeter,
+        "facade_intermediate": perimeter * np.fmax(np.round(height / STOREY_HEIGHT) - 1, 0),
+        "window": windows * 2 * (window_height + window_length),
+        # Shading devices (e.g. roller shutter boxes) run along the window heads
+        "shading": windows * window_length,
+    }
+    thermal_bridges = sum(
+        np.nan_to_num(junction_lengths[j] * psi[j] * (_column(specs, f"thermal_bridge_{j}", 0) > 0))
+        for j in THERMAL_BRIDGES
+    )
+    air_flow = np.nan_to_num(_column(specs, "leakage_air_flow_independent") * floor_area) / 3600
+    heat_capacity = (
+        _parameter(parameters, "density_of_air", DEFAULT_DENSITY_OF_AIR)
+        * _parameter(parameters, "specific_heat_of_air", DEFAULT_SPECIFIC_HEAT_OF_AIR) * 1000
+    )
+    infiltration = air_flow * heat_capacity * _parameter(parameters, "infiltration_correction_factor", 1)
+
+    def solar_aperture(area: np.ndarray) -> np.ndarray:
+        # Effective collecting area of a window area: g-value × glazed share × shading (as in ISO 13790)
+        return (
+            area * np.nan_to_num(_column(specs, "window_gvalue"))
+            * (1 - np.nan_to_num(_column(specs, "window_frame_factor")))
+            * _parameter(parameters, "shading_correction_factor", 1)
+        )
+
+    return Envelope(
+        floor_area=floor_area,
+        window_area=window_area,
+        opaque_area=opaque_area,
+        courtyard_wall_area=courtyard_wall_area,
+        transmission=transmission,
+        thermal_bridges=thermal_bridges,
+        infiltration=infiltration,
+        heat_loss=transmission + thermal_bridges + infiltration,
+        solar_aperture=solar_aperture(window_area.T).T,
+        total_solar_aperture=solar_aperture(total_window_area),
+    )
+
+
+def get_envelope_fingerprints(
+        specs: DataFrame,
+        parameters: Optional[OpenBESParameters],
+        psi: Optional[dict[str, float]] = None,
+) -> list[bytes]:
+    """Return everything each building's envelope depends on as bytes, one per building in order.
+
+    Each fingerprint is the building's ENVELOPE_FIELDS values followed by the batch's ENVELOPE_PARAMETERS
+    and psi values, so equal fingerprints always have equal envelopes.
+    """
+    psi = {**DEFAULT_THERMAL_BRIDGE_PSI, **(psi or {})}
+    shared = [_parameter(parameters, p, np.nan) for p in ENVELOPE_PARAMETERS] + [psi[j] for j in THERMAL_BRIDGES]
+    values = np.empty((len(specs), len(ENVELOPE_FIELDS) + len(shared)))
+    values[:, :len(ENVELOPE_FIELDS)] = specs.reindex(columns=ENVELOPE_FIELDS).to_numpy(dtype=float, na_value=np.nan)
+    values[:, len(ENVELOPE_FIELDS):] = shared
+    return values.view(f"V{values.shape[1] * values.itemsize}").ravel().tolist()
+
+
+def _envelope_rows(envelope: Envelope) -> np.ndarray:
+    # One row per building: every field of the envelope, per-facade fields taking one column per facade
+    return np.column_stack([np.reshape(value, (len(envelope.floor_area), -1)) for value in vars(envelope).values()])
+
+
+def _envelope_from_rows(rows: np.ndarray) -> Envelope:
+    values, column = {}, 0
+    for field in fields(Envelope):
+        if field.name in FACADE_FIELDS:
+            values[field.name] = rows[:, column:column + len(FACADES)]
+            column += len(FACADES)
+        else:
+            values[field.name] = rows[:, column]
+            column += 1
+    return Envelope(**values)
+
+
+def get_envelope_batch(
+        specs: DataFrame,
+        parameters: Optional[OpenBESParameters],
+        psi: Optional[dict[str, float]] = None,
+) -> Envelope:
+    """Return the envelope coefficients of a batch of buildings, derived once per distinct building.
+
+    The coefficients of the last ENVELOPE_CACHE_SIZE buildings are kept, keyed by their fingerprint
+    (see get_envelope_fingerprints), so only new or changed buildings are derived: simulating the same
+    buildings again, or a batch where a few buildings changed, fingerprints every building and derives
+    the changed ones. Buildings with the same fingerprint in one batch are derived once.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        parameters (OpenBESParameters): Simulation parameters (see derive_envelope_batch).
+        psi (Optional[dict[str, float]]): Linear thermal transmittance of each junction (see derive_envelope_batch).
+    Returns:
+        Envelope: The coefficients.
+    """
+    keys = get_envelope_fingerprints(specs, parameters, psi)
+    if not keys:
+        return derive_envelope_batch(specs, parameters, psi)
+    rows = [_envelope_cache.get(key) for key in keys]
+    missing = {}  # The first building with each fingerprint that is not cached
+    for i, (key, row) in enumerate(zip(keys, rows)):
+        if row is None:
+            missing.setdefault(key, i)
+        else:
+            _envelope_cache.move_to_end(key)
+    _envelope_cache_stats["hits"] += len(keys) - len(missing)
+    _envelope_cache_stats["misses"] += len(missing)
+    if missing:
+        derived = _envelope_rows(derive_envelope_batch(specs.iloc[list(missing.values())], parameters, psi))
+        for key, row in zip(missing, derived):
+            _envelope_cache[key] = row.tobytes()
+        rows = [_envelope_cache[key] if row is None else row for key, row in zip(keys, rows)]
+        while len(_envelope_cache) > ENVELOPE_CACHE_SIZE:
+            _envelope_cache.popitem(last=False)
+    return _envelope_from_rows(np.frombuffer(bytearray().join(rows)).reshape(len(rows), -1))
+
+
+def get_envelope_frame(
+        specs: DataFrame,
+        parameters: Optional[OpenBESParameters],
+        psi: Optional[dict[str, float]] = None,
+) -> DataFrame:
+    """Return the envelope coefficients of a batch of buildings (see get_envelope_batch) as a table.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        parameters (OpenBESParameters): Simulation parameters (see derive_envelope_batch).
+        psi (Optional[dict[str, float]]): Linear thermal transmittance of each junction (see derive_envelope_batch).
+    Returns:
+        DataFrame: One row per building, indexed as specs, with a column per Envelope field. Per-facade fields
+            take a column per facade, suffixed with it (e.g. window_area_a).
+    """
+    envelope = get_envelope_batch(specs, parameters, psi)
+    columns = {}
+    for field in fields(Envelope):
+        value = getattr(envelope, field.name)
+        if field.name in FACADE_FIELDS:
+            columns.update({f"{field.name}_{facade}": value[:, i] for i, facade in enumerate(FACADES)})
+        else:
+            columns[field.name] = value
+    return DataFrame(columns, index=specs.index)
+
+
+def get_envelope_cache_stats() -> Counter:
+    """Return how many buildings' envelopes came from the cache ("hits") or were derived ("misses") in this process."""
+    return Counter(_envelope_cache_stats)
+
+
+def get_heat_loss_coefficient_batch(specs: DataFrame, parameters: Optional[OpenBESParameters]) -> np.ndarray:
+    """Return the heat loss coefficient (transmission, thermal bridges and infiltration) of each building.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        parameters (OpenBESParameters): Simulation parameters (see derive_envelope_batch).
+    Returns:
+        np.ndarray: Heat loss coefficient in W/K, one per building.
+    """
+    return get_envelope_batch(specs, parameters).heat_loss
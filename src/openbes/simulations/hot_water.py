@@ -1,10 +1,15 @@
-import logging
+import numpy as np
 from pandas import DataFrame
 
 from .utils import OPERATIONAL_DAYS_DF
+from ..diagnostics import report, report_missing_batch, MISSING
 from ..types import OpenBESSpecification
 
-logger = logging.getLogger(__name__)
+SPECIFIC_HEAT_CAPACITY_WATER = 4.18  # J/g°C
+PER_HOUR = 1 / 3_600  # Convert seconds to hours
+HOT_WATER_FIELDS = [
+    "water_demand", "water_reference_temperature", "water_supply_temperature", "water_system_efficiency_cop"
+]
 
 def get_daily_hot_water_nominal(spec: OpenBESSpecification) -> float:
     """Calculate nominal (pre-efficiency scaling) daily hot water energy consumption.
@@ -14,18 +19,18 @@ def get_daily_hot_water_nominal(spec: OpenBESSpecification) -> float:
         float: Nominal daily hot water energy consumption in kWh.
     """
     demand = spec.water_demand  # l/day
-    specific_heat_capacity_water = 4.18  # J/g°C
     output_temp = spec.water_reference_temperature  # °C
     input_temp = spec.water_supply_temperature  # °C
-    per_hour = 1 / 3_600  # Convert seconds to hours
 
     if demand is None or output_temp is None or input_temp is None:
-        logger.warning("Insufficient data to calculate hot water energy consumption.")
+        for name in ("water_demand", "water_reference_temperature", "water_supply_temperature"):
+            if getattr(spec, name) is None:
+                report("hot_water", name, MISSING)
         return 0.0
 
     temperature_rise = output_temp - input_temp  # °C (from cold to hot water)
 
-    return specific_heat_capacity_water * temperature_rise * demand * per_hour
+    return SPECIFIC_HEAT_CAPACITY_WATER * temperature_rise * demand * PER_HOUR
 
 def get_daily_hot_water(spec: OpenBESSpecification) -> float:
     """
@@ -36,7 +41,7 @@ def get_daily_hot_water(spec: OpenBESSpecification) -> float:
         float: Daily hot water energy consumption in kWh.
     """
     if spec.water_system_efficiency_cop is None:
-        logger.warning("Insufficient data to calculate hot water energy consumption.")
+        report("hot_water", "water_system_efficiency_cop", MISSING)
         return 0.0
 
     return get_daily_hot_water_nominal(spec) * spec.water_system_efficiency_cop
@@ -51,4 +56,21 @@ def get_hot_water_per_month(spec: OpenBESSpecification) -> DataFrame:
     kWh_per_day = get_daily_hot_water(spec)
     result = OPERATIONAL_DAYS_DF * kWh_per_day
     result.index = ["kWh"]
-    return result
\ No newline at end of file
+    return result
+
+def get_hot_water_per_month_batch(specs: DataFrame) -> DataFrame:
+    """Vectorized get_hot_water_per_month over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        DataFrame: Hot water kWh with one row per building and one column per month.
+    """
+    report_missing_batch("hot_water", specs, HOT_WATER_FIELDS, where=specs["water_system_energy_source"].notna().to_numpy())
+    demand, reference, supply, cop = (specs[f].to_numpy(dtype=float, na_value=np.nan) for f in HOT_WATER_FIELDS)
+    nominal = SPECIFIC_HEAT_CAPACITY_WATER * (reference - supply) * demand * PER_HOUR
+    kwh_per_day = np.nan_to_num(nominal * cop, nan=0.0)
+    return DataFrame(
+        np.outer(kwh_per_day, OPERATIONAL_DAYS_DF.values[0]),
+        index=specs.index,
+        columns=OPERATIONAL_DAYS_DF.columns
+    )
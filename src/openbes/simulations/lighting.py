@@ -1,12 +1,34 @@
-from pandas import DataFrame, read_csv
-from os import path
+from functools import lru_cache
+from typing import Optional
+from pandas import DataFrame, Series, concat, isna, read_csv
+from os import path, listdir
 import logging
+import numpy as np
 
 from .utils import OPERATIONAL_DAYS_DF
+from ..diagnostics import report, report_batch, INVALID, MISSING, UNMATCHED
 from ..types import OpenBESSpecification, LIGHTING_TECHNOLOGIES, LIGHTING_BALLASTS
 
 logger = logging.getLogger(__name__)
 
+LIGHTING_DATA_DIR = path.join(path.dirname(__file__), "lighting_data")
+LIGHTING_ZONES = range(1, 7)
+# Fields of each zone, named lighting_system_{field}_z{zone}, that its consumption depends on
+LIGHTING_ZONE_FIELDS = [
+    "tech", "ballast", "lamp_power", "lamp_number",
+    "luminary_number", "similar_zone_number", "operating_hours", "simultaneity_factor",
+]
+# Technologies whose luminaire power is simply lamp power * lamp number
+DIRECT_POWER_TECHNOLOGIES = [
+    LIGHTING_TECHNOLOGIES.IC,
+    LIGHTING_TECHNOLOGIES.HAL,
+    LIGHTING_TECHNOLOGIES.LED
+]
+
+LIGHTING_OPERATIONAL_DAYS_DF = OPERATIONAL_DAYS_DF.copy()
+LIGHTING_OPERATIONAL_DAYS_DF["Jul"] = 21  # hardcoded in the Excel spreadsheet
+LIGHTING_OPERATIONAL_DAYS_DF["Aug"] = 22  # hardcoded in the Excel spreadsheet
+
 
 def get_w_per_luminaire(spec: OpenBESSpecification, zone: int) -> float:
     """Calculate the kWh per day for a specific zone based on lighting system specifications.
@@ -21,32 +43,23 @@ def get_w_per_luminaire(spec: OpenBESSpecification, zone: int) -> float:
     ballast = getattr(spec, f"lighting_system_ballast_z{zone}")
     lamp_power = getattr(spec, f"lighting_system_lamp_power_z{zone}")
 
-    try:
-        if tech in [
-            LIGHTING_TECHNOLOGIES.IC,
-            LIGHTING_TECHNOLOGIES.HAL,
-            LIGHTING_TECHNOLOGIES.LED
-        ]:
-            return float(lamp_power * lamp_number)
-        if ballast == LIGHTING_BALLASTS.BE and tech == LIGHTING_TECHNOLOGIES.FT_T8:
-            d = read_csv(path.join(
-                path.dirname(__file__),
-                "lighting_data",
-                "lamp_ft_t8_be.csv"
-            ))
-            return float(d.loc[(d["lamp_power"] == lamp_power)][f"lamp_number_{lamp_number}"].values[0])
-        d = read_csv(path.join(
-            path.dirname(__file__),
-            "lighting_data",
-            f"lamp_{tech.name.lower()}.csv"
-        ))
-        return float(d.loc[(d["lamp_power"] == lamp_power)][f"lamp_number_{lamp_number}"].values[0])
-    except (AttributeError, FileNotFoundError, KeyError, IndexError) as e:
-        logger.warning(f"Badly matched spec for zone {zone} [{e.__class__.__name__}: {e}]")
-    except Exception as e:
-        logger.error(e, exc_info=True)
-
-    return 0.0
+    if tech is None:
+        report("lighting", f"lighting_system_tech_z{zone}", MISSING)
+        return 0.0
+    if lamp_power is None or lamp_number is None:
+        report("lighting", f"lighting_system_lamp_{'power' if lamp_power is None else 'number'}_z{zone}", MISSING)
+        return 0.0
+    if not isinstance(tech, LIGHTING_TECHNOLOGIES):
+        # Technologies that failed to decode are kept as text (see coerce_value)
+        report("lighting", f"lighting_system_tech_z{zone}", INVALID)
+        return 0.0
+    if tech in DIRECT_POWER_TECHNOLOGIES:
+        return float(lamp_power * lamp_number)
+    w = get_lamp_table().get((get_lamp_table_name(tech, ballast), lamp_power, lamp_number))
+    if w is None:
+        report("lighting", f"lighting_system_lamp_power_z{zone}", UNMATCHED)
+        return 0.0
+    return float(w)
 
 def get_kwh_per_day_for_zone(spec: OpenBESSpecification, zone: int) -> float:
     """Calculate the kWh per day for a specific zone based on lighting system specifications.
@@ -59,7 +72,7 @@ def get_kwh_per_day_for_zone(spec: OpenBESSpecification, zone: int) -> float:
     power_per_luminaire = get_w_per_luminaire(spec, zone)
     luminary_number = getattr(spec, f"lighting_system_luminary_number_z{zone}")
     if luminary_number is None:
-        logger.warning("Inadequate data to calculate lighting power for zone %d", zone)
+        report("lighting", f"lighting_system_luminary_number_z{zone}", MISSING)
         return 0.0
 
     power_per_zone = power_per_luminaire * luminary_number
@@ -70,8 +83,11 @@ def get_kwh_per_day_for_zone(spec: OpenBESSpecification, zone: int) -> float:
         simultaneity_factor = getattr(spec, f"lighting_system_simultaneity_factor_z{zone}")
 
         return power_per_zone * zone_number * simultaneity_factor * operating_hours / 1000.0
-    except AttributeError:
-        logger.warning("Inadequate data to calculate lighting power for zone %d", zone)
+    except (AttributeError, TypeError):
+        for name in ("similar_zone_number", "operating_hours", "simultaneity_factor"):
+            if getattr(spec, f"lighting_system_{name}_z{zone}", None) is None:
+                report("lighting", f"lighting_system_{name}_z{zone}", MISSING)
+                break
     except Exception as e:
         logger.error(e, exc_info=True)
     return 0.0
@@ -83,9 +99,9 @@ def get_kwh_per_day_per_zone(spec: OpenBESSpecification) -> DataFrame:
     Returns:
         DataFrame: A DataFrame containing kWh per day per zone.
     """
-    zones = [f"Zone type {i}" for i in range(1, 7)]
+    zones = [f"Zone type {i}" for i in LIGHTING_ZONES]
     return DataFrame(
-        [get_kwh_per_day_for_zone(spec, i) for i in range(1, 7)],
+        [get_kwh_per_day_for_zone(spec, i) for i in LIGHTING_ZONES],
         index=zones,
         columns=["kWh/day"]
     )
@@ -99,11 +115,8 @@ def get_kwh_per_month_per_zone(spec: OpenBESSpecification) -> DataFrame:
         DataFrame: kWh used by each zone in each requested month
     """
     df = get_kwh_per_day_per_zone(spec)
-    operational_days_df = OPERATIONAL_DAYS_DF.copy()
-    operational_days_df["Jul"] = 21  # hardcoded in the Excel spreadsheet
-    operational_days_df["Aug"] = 22  # hardcoded in the Excel spreadsheet
-    cross = df["kWh/day"].values[:, None] * operational_days_df.values
-    return DataFrame(cross, columns=operational_days_df.columns, index=df.index)
+    cross = df["kWh/day"].values[:, None] * LIGHTING_OPERATIONAL_DAYS_DF.values
+    return DataFrame(cross, columns=LIGHTING_OPERATIONAL_DAYS_DF.columns, index=df.index)
 
 def get_kwh_per_month(spec: OpenBESSpecification) -> DataFrame:
     """
@@ -117,4 +130,134 @@ def get_kwh_per_month(spec: OpenBESSpecification) -> DataFrame:
     per_month.index = ["kWh/month"]
     return per_month
 
+@lru_cache(maxsize=1)
+def get_lamp_table() -> Series:
+    """Load every lamp table in lighting_data into a single lookup.
+    Returns:
+        Series: Watts per luminaire, indexed by (table, lamp_power, lamp_number),
+            where table is the lamp file name without its "lamp_" prefix (e.g. "ft_t8_be").
+    """
+    tables = []
+    for file_name in sorted(listdir(LIGHTING_DATA_DIR)):
+        if not file_name.endswith(".csv"):
+            continue
+        d = read_csv(path.join(LIGHTING_DATA_DIR, file_name)).melt(
+            id_vars="lamp_power",
+            var_name="lamp_number",
+            value_name="w_per_luminaire"
+        )
+        d["lamp_number"] = d["lamp_number"].str.removeprefix("lamp_number_").astype(float)
+        d["table"] = file_name.removeprefix("lamp_").removesuffix(".csv")
+        tables.append(d)
+    table = concat(tables).dropna(subset=["lamp_power", "w_per_luminaire"])
+    return table.set_index(["table", "lamp_power", "lamp_number"])["w_per_luminaire"]
+
+def get_lamp_table_name(tech: Optional[LIGHTING_TECHNOLOGIES], ballast: Optional[LIGHTING_BALLASTS]) -> Optional[str]:
+    """Return the lamp table (see get_lamp_table) holding W per luminaire for a technology and ballast.
+    Args:
+        tech (Optional[LIGHTING_TECHNOLOGIES]): The lamp technology.
+        ballast (Optional[LIGHTING_BALLASTS]): The ballast; only distinguishes T8 tubes with electronic ballasts.
+    Returns:
+        Optional[str]: The table name, or None for technologies whose power is lamp power * lamp number.
+    """
+    if tech is None or tech in DIRECT_POWER_TECHNOLOGIES:
+        return None
+    if tech == LIGHTING_TECHNOLOGIES.FT_T8 and ballast == LIGHTING_BALLASTS.BE:
+        return "ft_t8_be"
+    return tech.name.lower()
 
+def get_lamp_table_name_batch(specs: DataFrame, zone: int) -> Series:
+    """Vectorized get_lamp_table_name over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        zone (int): The lighting zone.
+    Returns:
+        Series: The lamp table name for each building; None where none applies.
+    """
+    tech = specs[f"lighting_system_tech_z{zone}"].to_numpy(dtype=object)
+    ballast = specs[f"lighting_system_ballast_z{zone}"].to_numpy(dtype=object)
+    names = np.empty(len(specs), dtype=object)
+    # Technologies that failed to decode are kept as text and have no table
+    names[:] = [get_lamp_table_name(t, b) if isinstance(t, LIGHTING_TECHNOLOGIES) else None for t, b in zip(tech, ballast)]
+    return Series(names, index=specs.index, dtype=object)
+
+@lru_cache(maxsize=1)
+def get_lamp_lookup() -> dict[tuple, float]:
+    """Return get_lamp_table as a dictionary, for fast lookups of a few keys at a time."""
+    return get_lamp_table().to_dict()
+
+def get_w_per_luminaire_batch(specs: DataFrame, zone: int) -> Series:
+    """Vectorized get_w_per_luminaire over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        zone (int): The zone number to calculate W/luminaire for.
+    Returns:
+        Series: W per luminaire for each building; 0.0 where the spec does not match a lamp table.
+    """
+    tech = specs[f"lighting_system_tech_z{zone}"].to_numpy(dtype=object)
+    used = ~isna(tech)
+    if not used.any():
+        return Series(np.zeros(len(specs)), index=specs.index)
+    lamp_power = specs[f"lighting_system_lamp_power_z{zone}"].to_numpy(dtype=float)
+    lamp_number = specs[f"lighting_system_lamp_number_z{zone}"].to_numpy(dtype=float)
+
+    lookup = get_lamp_lookup()
+    tables = get_lamp_table_name_batch(specs, zone).to_numpy()
+    w = np.fromiter(
+        (lookup.get(key, np.nan) for key in zip(tables, lamp_power, lamp_number)), dtype=float, count=len(specs)
+    )
+    direct = np.array([t in DIRECT_POWER_TECHNOLOGIES for t in tech], dtype=bool)
+    w = np.where(direct, lamp_power * lamp_number, w)
+    invalid = used & ~np.array([isinstance(t, LIGHTING_TECHNOLOGIES) for t in tech], dtype=bool)
+    if invalid.any():
+        report_batch("lighting", f"lighting_system_tech_z{zone}", INVALID, specs.index[invalid])
+    unmatched = np.isnan(w) & used & ~invalid
+    if unmatched.any():
+        report_batch("lighting", f"lighting_system_lamp_power_z{zone}", UNMATCHED, specs.index[unmatched])
+    return Series(np.nan_to_num(w, nan=0.0), index=specs.index)
+
+def get_zone_fields(zone: int) -> list[str]:
+    """Return the specification fields that get_kwh_per_day_for_zone_batch reads for a zone."""
+    return [f"lighting_system_{name}_z{zone}" for name in LIGHTING_ZONE_FIELDS]
+
+def get_kwh_per_day_for_zone_batch(specs: DataFrame, zone: int) -> np.ndarray:
+    """Vectorized get_kwh_per_day_for_zone over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+        zone (int): The zone number to calculate kWh/day for.
+    Returns:
+        np.ndarray: kWh per day, one per building.
+    """
+    w = get_w_per_luminaire_batch(specs, zone).to_numpy()
+    if not w.any():
+        return np.zeros(len(specs))
+    kwh = w / 1000.0
+    for name in ("luminary_number", "similar_zone_number", "simultaneity_factor", "operating_hours"):
+        kwh = kwh * specs[f"lighting_system_{name}_z{zone}"].to_numpy(dtype=float)
+    return np.nan_to_num(kwh, nan=0.0)
+
+def get_kwh_per_day_per_zone_batch(specs: DataFrame) -> DataFrame:
+    """Vectorized get_kwh_per_day_per_zone over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        DataFrame: kWh per day with one row per building and one column per zone.
+    """
+    return DataFrame(
+        {f"Zone type {zone}": get_kwh_per_day_for_zone_batch(specs, zone) for zone in LIGHTING_ZONES},
+        index=specs.index,
+    )
+
+def get_kwh_per_month_batch(specs: DataFrame) -> DataFrame:
+    """Vectorized get_kwh_per_month over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        DataFrame: Lighting kWh with one row per building and one column per month.
+    """
+    per_day = get_kwh_per_day_per_zone_batch(specs).sum(axis=1).to_numpy()
+    return DataFrame(
+        np.outer(per_day, LIGHTING_OPERATIONAL_DAYS_DF.values[0]),
+        index=specs.index,
+        columns=LIGHTING_OPERATIONAL_DAYS_DF.columns
+    )
@@ -117,7 +117,7 @@ def get_occupation_percentage_by_zone(spec: OpenBESSpecification) -> DataFrame:
     Returns:
         DataFrame: The occupation percentage (0.0 to 100.0) by zone.
     """
-    capacity = spec.building_max_occupation or 1
+    capacity = spec.max_building_occupation or 1
     current_occupation = spec.typical_occupation or 1
     data = []
     try:
@@ -131,63 +131,52 @@ def get_occupation_percentage_by_zone(spec: OpenBESSpecification) -> DataFrame:
                 M2_PER_PERSON.loc[zone, "m2_per_person"] * get_zone_total_area(spec=spec, zone=zone)
         } for zone in OCCUPATION_ZONES]
 
-    df = (DataFrame(data)
-    df.set_index("zone"))
+    df = DataFrame(data).set_index("zone")
     return df
-    
+
 
 def get_occupancy_by_hour(spec: OpenBESSpecification) -> DataFrame:
     """Generate an occupancy schedule by hour for the entire year.
     Args:
         spec (OpenBESSpecification): The building specifications spec data class.
     Returns:
-        DataFrame: A DataFrame with occupancy status (1 for occupied, 0 for unoccupied) for each hour of the year for each occupancy zone.
+        DataFrame: A DataFrame with the month, day and hour, and the occupation percentage (0 when unoccupied)
+            of each occupancy zone, for each hour of the year.
     """
     hours_in_year = 365 * 24
     _data = []
     for zone in OCCUPATION_ZONES:
-        if zone == 'office':
+        # Zones without opening hours in the specification are never occupied
+        open_time = getattr(spec, f"occupancy_open_{zone.value}", None)
+        close_time = getattr(spec, f"occupancy_close_{zone.value}", None)
+        if zone == OCCUPATION_ZONES.Office:
             # Special case - in the Excel spreadsheet office uses minimum of heating on time and office open time
-            open_time = getattr(spec, f"occupancy_open_{zone}")
             heating_on_time = spec.heating_system1_on_time
             if open_time is not None and heating_on_time is not None:
                 open_time = min(open_time, heating_on_time)
-            else:
-                if open_time is None:
-                    open_time = heating_on_time
-                else:
-                    open_time = heating_on_time
-            close_time = getattr(spec, f"occupancy_close_{zone}")
-            _data.append({
-                "zone": zone,
-                "open": open_time - 1,  # systems have to get ready 1 hour before occupancy
-                "close": close_time,
-            })
-        else:
-            _data.append({
-                "zone": zone,
-                "open": getattr(spec, f"occupancy_open_{zone}") - 1,
-                "close": getattr(spec, f"occupancy_close_{zone}"),
-            })
+            elif open_time is None:
+                open_time = heating_on_time
+        if open_time is None or close_time is None:
+            open_time = close_time = 0
+        _data.append({
+            "zone": zone,
+            "open": open_time - 1,  # systems have to get ready 1 hour before occupancy
+            "close": close_time,
+        })
     occupancy_zone_hours = DataFrame(_data).set_index("zone")
+    zone_occupancy = get_occupation_percentage_by_zone(spec=spec)["occupation_percentage"]
 
     occupancy_schedule = []
     for day in range(365):
         occupied = is_occupied_day(day, spec=spec)
         for hour in range(24):
-            zone_occupancy = get_occupation_percentage_by_zone(spec=spec)
+            row = {"month": month_for_day(day), "day": day, "hour": hour}
             for zone in OCCUPATION_ZONES:
                 zone_occupied = (
                         occupied and
                         (occupancy_zone_hours.loc[zone, "open"] <= hour < occupancy_zone_hours.loc[zone, "close"])
                 )
-                if not zone_occupied:
-                    zone_occupancy.loc[zone, "occupation_percentage"] = 0.0
-            occupancy_schedule.append({
-                "month": month_for_day(day),
-                "day": day,
-                "hour": hour,
-                **zone_occupancy
-            })
+                row[zone.value] = zone_occupancy[zone] if zone_occupied else 0.0
+            occupancy_schedule.append(row)
 
-    return DataFrame(occupancy_schedule, index=range(hours_in_year), columns=["Occupancy"])
\ No newline at end of file
+    return DataFrame(occupancy_schedule, index=range(hours_in_year))
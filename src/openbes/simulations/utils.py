@@ -2,3 +2,8 @@ from pandas import DataFrame
 from ..types import OPERATIONAL_DAYS_PER_MONTH
 
 OPERATIONAL_DAYS_DF = DataFrame({m.value: d for m, d in OPERATIONAL_DAYS_PER_MONTH.items()}, index=["days"])
+
+DAYS_PER_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+DAYS_PER_YEAR = sum(DAYS_PER_MONTH)
+HOURS_PER_DAY = 24
+HOURS_PER_YEAR = DAYS_PER_YEAR * HOURS_PER_DAY
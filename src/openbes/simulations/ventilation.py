@@ -1,10 +1,15 @@
-import logging
+import numpy as np
 from pandas import DataFrame
 
 from .utils import OPERATIONAL_DAYS_DF
+from ..diagnostics import report, report_batch, report_missing_batch, MISSING, INCONSISTENT
 from ..types import OpenBESSpecification
 
-logger = logging.getLogger(__name__)
+VENTILATION_TIME_FIELDS = ["ventilation_system1_on_time", "ventilation_system1_off_time"]
+# Fields that get_ventilation_per_month_batch reads
+VENTILATION_FIELDS = [
+    *VENTILATION_TIME_FIELDS, "ventilation_system1_rated_input_power", "ventilation_system1_energy_source"
+]
 
 def get_ventilation_hours_per_day(spec: OpenBESSpecification) -> int:
     """Return the daily mechanical ventilation hours based on the specification.
@@ -14,11 +19,13 @@ def get_ventilation_hours_per_day(spec: OpenBESSpecification) -> int:
         int: Mechanical ventilation hours per day.
     """
     if spec.ventilation_system1_on_time is None or spec.ventilation_system1_off_time is None:
-        logger.warning("Insufficient information to calculate ventilation hours.")
+        for name in ("ventilation_system1_on_time", "ventilation_system1_off_time"):
+            if getattr(spec, name) is None:
+                report("ventilation", name, MISSING)
         return 0
 
     if spec.ventilation_system1_off_time < spec.ventilation_system1_on_time:
-        logger.warning("Ventilation off time is earlier than on time; assuming zero hours.")
+        report("ventilation", "ventilation_system1_off_time", INCONSISTENT, detail="off time is earlier than on time")
         return 0
 
     # Inclusive of both on and off hours, so add 1
@@ -46,7 +53,7 @@ def get_ventilation_per_month(spec: OpenBESSpecification) -> DataFrame:
         DataFrame: Ventilation energy consumption in kWh for each month.
     """
     if spec.ventilation_system1_rated_input_power is None:
-        logger.warning("No ventilation system power specified; assuming zero ventilation energy use.")
+        report("ventilation", "ventilation_system1_rated_input_power", MISSING)
         power = 0.0
     else:
         power = spec.ventilation_system1_rated_input_power
@@ -54,4 +61,33 @@ def get_ventilation_per_month(spec: OpenBESSpecification) -> DataFrame:
     hours = get_mv_hours_per_month(spec)
     result = hours * power
     result.index = ["kWh"]
-    return result
\ No newline at end of file
+    return result
+
+def get_ventilation_per_month_batch(specs: DataFrame) -> DataFrame:
+    """Vectorized get_ventilation_per_month over a batch of buildings.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building.
+    Returns:
+        DataFrame: Ventilation kWh with one row per building and one column per month.
+    """
+    on_time = specs["ventilation_system1_on_time"].to_numpy(dtype=float, na_value=np.nan)
+    off_time = specs["ventilation_system1_off_time"].to_numpy(dtype=float, na_value=np.nan)
+    power = np.nan_to_num(specs["ventilation_system1_rated_input_power"].to_numpy(dtype=float, na_value=np.nan))
+    has_system = specs["ventilation_system1_energy_source"].notna().to_numpy()
+    report_missing_batch("ventilation", specs, ["ventilation_system1_rated_input_power"], where=has_system)
+    # Times only matter for systems that draw power
+    report_missing_batch("ventilation", specs, VENTILATION_TIME_FIELDS, where=power != 0)
+    reversed_times = off_time < on_time
+    if reversed_times.any():
+        report_batch(
+            "ventilation", "ventilation_system1_off_time", INCONSISTENT, specs.index[reversed_times],
+            detail="off time is earlier than on time",
+        )
+    # Inclusive of both on and off hours; zero where off time is earlier than on time
+    hours_per_day = np.where(off_time >= on_time, off_time - on_time + 1, 0.0)
+    kwh_per_day = hours_per_day * power
+    return DataFrame(
+        np.outer(kwh_per_day, OPERATIONAL_DAYS_DF.values[0]),
+        index=specs.index,
+        columns=OPERATIONAL_DAYS_DF.columns
+    )
@@ -0,0 +1,369 @@
+"""
+Polynomial surrogates of the batch engines, for answers in microseconds per building.
+
+A surrogate covers a design space: a template building with some fields varied over ranges
+(e.g. operating hours, hot water demand or a lighting technology). build_surrogate samples that
+space, runs the samples through the vectorized engines in every requested climate, and fits a polynomial
+in the varied fields per climate and energy use category, with one coefficient per month. Categories
+whose results do not depend on the climate are fitted once and shared by every climate.
+Part of the samples are held out, and the surrogate reports its error on them so that callers
+know when to fall back to the full model. Fitting and prediction only need NumPy.
+
+Usage:
+    python -m src.openbes.surrogate CASE.toml --vary water_demand=100:500 --vary lighting_system_tech_z1=LED,FT_T8
+        [--climate 725650_Denver] [--samples 2000] [--degree 2] [--output surrogate.npz]
+"""
+import argparse
+import itertools
+import json
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from enum import Enum
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+from pandas import DataFrame, MultiIndex
+
+from .cases import load_case
+from .pipeline import CATEGORY_STAGES, CLIMATE_STAGES, scenario_pipeline
+from .portfolio.reader import specs_to_frame
+from .types import ENERGY_USE_CATEGORIES, MONTHS, OpenBESParameters, OpenBESSpecification
+from .types.coercion import SPECIFICATION_FIELD_TYPES, coerce_value
+
+# Share of the samples held out to measure the error of the fit
+HOLDOUT_FRACTION = 0.2
+
+
+def _parse_ranges(ranges: dict[str, Union[tuple, list]]) -> tuple[dict, dict]:
+    """Split a design space into numeric (low, high) ranges and lists of coerced choices."""
+    unknown = [f for f in ranges if f not in SPECIFICATION_FIELD_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown specification fields {unknown}")
+    bounds, choices = {}, {}
+    for field, values in ranges.items():
+        field_type = SPECIFICATION_FIELD_TYPES[field]
+        if isinstance(values, tuple) and not issubclass(field_type, (Enum, str)):
+            low, high = (float(v) for v in values)
+            bounds[field] = (low, high)
+        elif isinstance(values, list) and values:
+            choices[field] = [coerce_value(field_type, v) for v in values]
+        else:
+            raise ValueError(f"{field} needs a (low, high) tuple for numbers or a list of choices")
+    return bounds, choices
+
+
+def _choice_key(value) -> str:
+    return value.name if isinstance(value, Enum) else str(value)
+
+
+@dataclass
+class Surrogate:
+    """A fitted surrogate, as returned by build_surrogate or Surrogate.load."""
+    # Varied numeric fields, and the choices of each varied categorical field (by enum member name)
+    bounds: dict[str, tuple[float, float]]
+    choices: dict[str, list[str]]
+    degree: int
+    # Mean and standard deviation of each feature, from the training samples
+    mean: np.ndarray
+    scale: np.ndarray
+    climates: list[str]
+    categories: list[str]
+    # Shape (climates, categories, terms, 12): kWh per month is the polynomial terms times these
+    coefficients: np.ndarray
+    # Error on the held-out samples, indexed by (climate, category)
+    errors: DataFrame
+
+    @property
+    def features(self) -> list[str]:
+        """Feature names: the numeric fields, then one "field=choice" indicator per categorical choice."""
+        return [*self.bounds, *(f"{field}={c}" for field, cs in self.choices.items() for c in cs)]
+
+    def _features(self, columns) -> np.ndarray:
+        # columns maps each varied field to its values, e.g. a batch of specifications
+        features = [np.asarray(columns[field], dtype=float) for field in self.bounds]
+        for field, names in self.choices.items():
+            values = np.array([_choice_key(v) for v in np.asarray(columns[field], dtype=object)], dtype=object)
+            features.extend((values == name).astype(float) for name in names)
+        return np.nan_to_num(np.stack(features, axis=1))
+
+    def _terms(self, features: np.ndarray) -> np.ndarray:
+        return polynomial_terms((features - self.mean) / self.scale, self.degree)
+
+    def estimate(self, values: dict[str, Any], climate: Optional[str] = None) -> np.ndarray:
+        """Estimate the monthly kWh of buildings in one climate, without building DataFrames.
+
+        The fastest path, for single answers: e.g. estimate({"water_demand": 120, "lighting_system_tech_z1": "LED"}).
+        Args:
+            values (dict[str, Any]): The value, or an array of values, of every varied field, as in a
+                specification file.
+            climate (Optional[str]): One of climates. Defaults to the first.
+        Returns:
+            np.ndarray: kWh of shape (buildings, categories, 12).
+        Raises:
+            ValueError: If a varied field is missing or the climate was not sampled.
+        """
+        missing = [f for f in [*self.bounds, *self.choices] if f not in values]
+        if missing:
+            raise ValueError(f"Missing values for {missing}")
+        climate = self.climates[0] if climate is None else climate
+        if climate not in self.climates:
+            raise ValueError(f"No surrogate for climate {climate} (fitted for {', '.join(self.climates)})")
+        columns = {field: np.atleast_1d(values[field]) for field in self.bounds}
+        for field in self.choices:
+            field_type = SPECIFICATION_FIELD_TYPES[field]
+            columns[field] = [coerce_value(field_type, v) for v in np.atleast_1d(np.asarray(values[field], dtype=object))]
+        return self._estimate(self._features(columns), self.climates.index(climate))
+
+    def _estimate(self, features: np.ndarray, climate: int) -> np.ndarray:
+        return np.einsum("bt,ctm->bcm", self._terms(features), self.coefficients[climate])
+
+    def predict(self, specs: Union[OpenBESSpecification, DataFrame]) -> DataFrame:
+        """Estimate the monthly kWh of buildings in the surrogate's design space.
+
+        Only the varied fields and meteorological_file are read; every other field is taken to be
+        the template's. Values outside the sampled ranges are extrapolated.
+        Args:
+            specs (Union[OpenBESSpecification, DataFrame]): One building specification, or a batch
+                (see openbes.portfolio.reader).
+        Returns:
+            DataFrame: kWh indexed by (building, energy use category), with a column per month, as batch_pipeline.
+        Raises:
+            ValueError: If a building's climate was not sampled.
+        """
+        if isinstance(specs, OpenBESSpecification):
+            specs = specs_to_frame([specs])
+        climates = specs["meteorological_file"].to_numpy(dtype=object)
+        unknown = sorted({str(c) for c in climates if c not in self.climates})
+        if unknown:
+            raise ValueError(f"No surrogate for climates {unknown} (fitted for {', '.join(self.climates)})")
+        features = self._features(specs)
+        n = len(specs)
+        data = np.empty((n, len(self.categories), len(MONTHS)))
+        for i, climate in enumerate(self.climates):
+            rows = climates == climate
+            if rows.any():
+                data[rows] = self._estimate(features[rows], i)
+        index = MultiIndex.from_product([specs.index, self.categories], names=[specs.index.name, "category"])
+        return DataFrame(data.reshape(n * len(self.categories), len(MONTHS)), index=index, columns=MONTHS.list())
+
+    def save(self, file_path: str) -> None:
+        """Write the surrogate to a compressed .npz file."""
+        metadata = {
+            "bounds": self.bounds,
+            "choices": self.choices,
+            "degree": self.degree,
+            "climates": self.climates,
+            "categories": self.categories,
+            "errors": self.errors.reset_index().to_dict(orient="records"),
+        }
+        np.savez_compressed(
+            file_path,
+            metadata=np.array(json.dumps(metadata)),
+            mean=self.mean,
+            scale=self.scale,
+            coefficients=self.coefficients,
+        )
+
+    @classmethod
+    def load(cls, file_path: str) -> "Surrogate":
+        """Read a surrogate written by save."""
+        with np.load(file_path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return cls(
+                bounds={field: tuple(bounds) for field, bounds in metadata["bounds"].items()},
+                choices=metadata["choices"],
+                degree=metadata["degree"],
+                mean=data["mean"],
+                scale=data["scale"],
+                climates=metadata["climates"],
+                categories=metadata["categories"],
+                coefficients=data["coefficients"],
+                errors=DataFrame(metadata["errors"]).set_index(["climate", "category"]),
+            )
+
+
+@lru_cache(maxsize=16)
+def _term_indices(features: int, degree: int) -> list[np.ndarray]:
+    # For each degree d, the (terms, d) feature indices of every product of d features
+    return [
+        np.array(list(itertools.combinations_with_replacement(range(features), d)), dtype=np.intp).reshape(-1, d)
+        for d in range(1, degree + 1)
+    ]
+
+
+def polynomial_terms(features: np.ndarray, degree: int) -> np.ndarray:
+    """Return every product of at most degree features, starting with the constant term.
+    Args:
+        features (np.ndarray): Array of shape (samples, features).
+        degree (int): Highest degree of the products.
+    Returns:
+        np.ndarray: Array of shape (samples, terms).
+    """
+    terms = [np.ones((len(features), 1))]
+    for indices in _term_indices(features.shape[1], degree):
+        terms.append(features[:, indices].prod(axis=2))
+    return np.concatenate(terms, axis=1)
+
+
+def sample_design_space(
+        template: OpenBESSpecification,
+        ranges: dict[str, Union[tuple, list]],
+        samples: int,
+        seed: int = 0,
+) -> DataFrame:
+    """Return copies of a template building with the varied fields drawn uniformly from their ranges.
+    Args:
+        template (OpenBESSpecification): The building whose other fields every sample keeps.
+        ranges (dict[str, Union[tuple, list]]): For each varied field, a (low, high) tuple for numbers
+            or a list of choices, as in a specification file (e.g. ["LED", "FT_T8"]).
+        samples (int): Number of samples.
+        seed (int): Random seed; the same seed always gives the same samples.
+    Returns:
+        DataFrame: The samples, in the batch format (see openbes.portfolio.reader).
+    Raises:
+        ValueError: If a field is unknown or its range is malformed.
+    """
+    bounds, choices = _parse_ranges(ranges)
+    rng = np.random.default_rng(seed)
+    specs = specs_to_frame([template]).iloc[np.zeros(samples, dtype=int)]
+    specs.index = [f"sample-{i:06d}" for i in range(samples)]
+    for field, (low, high) in bounds.items():
+        values = rng.uniform(low, high, samples)
+        specs[field] = values.round() if SPECIFICATION_FIELD_TYPES[field] is int else values
+    for field, options in choices.items():
+        picked = np.empty(samples, dtype=object)
+        picked[:] = [options[i] for i in rng.integers(0, len(options), samples)]
+        specs[field] = picked
+    return specs
+
+
+def _errors(predicted: np.ndarray, expected: np.ndarray) -> dict:
+    # Annual and monthly CV(RMSE) in percent of the mean, and R² of the annual kWh
+    annual, expected_annual = predicted.sum(axis=1), expected.sum(axis=1)
+    mean = expected_annual.mean()
+    variance = np.sum((expected_annual - mean) ** 2)
+    # Outputs that do not depend on the varied fields have no variance to explain
+    explained = variance > 1e-12 * len(expected_annual) * (mean ** 2 + 1)
+
+    def cv_rmse(error: np.ndarray, reference: float) -> Optional[float]:
+        return float(100 * np.sqrt(np.mean(error ** 2)) / reference) if reference > 0 else None
+
+    return {
+        "annual_cv_rmse_percent": cv_rmse(annual - expected_annual, mean),
+        "monthly_cv_rmse_percent": cv_rmse(predicted - expected, expected.mean()),
+        "r2": float(1 - np.sum((annual - expected_annual) ** 2) / variance) if explained else None,
+    }
+
+
+def build_surrogate(
+        template: OpenBESSpecification,
+        parameters: OpenBESParameters,
+        ranges: dict[str, Union[tuple, list]],
+        climates: Optional[Sequence[str]] = None,
+        samples: int = 2000,
+        degree: int = 2,
+        seed: int = 0,
+) -> Surrogate:
+    """Sample a design space with the batch engines and fit a polynomial surrogate to it.
+
+    Every sample is simulated in every climate with pipeline.scenario_pipeline, and a least-squares
+    polynomial in the standardized varied fields is fitted per climate and energy use category on all
+    but HOLDOUT_FRACTION of them. The returned errors are those of this fit on the held-out samples.
+    Categories that no climate stage computes (see pipeline.CLIMATE_STAGES) have the same results in
+    every climate, so they are fitted once and their coefficients and errors copied to each climate.
+    Args:
+        template (OpenBESSpecification): The building whose other fields every sample keeps.
+        parameters (OpenBESParameters): Dictionary of simulation parameters. Usually fixed.
+        ranges (dict[str, Union[tuple, list]]): The varied fields (see sample_design_space).
+        climates (Optional[Sequence[str]]): meteorological_file values to fit. Defaults to the template's.
+        samples (int): Number of samples, including the held-out ones. More than the number of
+            polynomial terms are needed for a determined fit.
+        degree (int): Degree of the polynomial.
+        seed (int): Random seed of the samples.
+    Returns:
+        Surrogate: The fitted surrogate.
+    Raises:
+        ValueError: If a field is unknown or its range is malformed, or no climate is given.
+    """
+    if climates is None:
+        climates = [template.meteorological_file] if template.meteorological_file else []
+    climates = list(climates)
+    if not climates:
+        raise ValueError("No climate to fit: give climates or a template with a meteorological_file")
+    bounds, choices = _parse_ranges(ranges)
+    specs = sample_design_space(template, ranges, samples, seed)
+    surrogate = Surrogate(
+        bounds=bounds,
+        choices={field: [_choice_key(v) for v in options] for field, options in choices.items()},
+        degree=degree,
+        mean=np.zeros(0),
+        scale=np.ones(0),
+        climates=climates,
+        categories=[c.value for c in ENERGY_USE_CATEGORIES],
+        coefficients=np.zeros(0),
+        errors=DataFrame(),
+    )
+    train = np.arange(samples) >= round(samples * HOLDOUT_FRACTION)
+    raw = surrogate._features(specs)
+    surrogate.mean = raw[train].mean(axis=0)
+    std = raw[train].std(axis=0)
+    surrogate.scale = np.where(std > 0, std, 1.0)
+    terms = surrogate._terms(raw)
+
+    coefficients = np.empty((len(climates), len(surrogate.categories), terms.shape[1], len(MONTHS)))
+    errors = {}
+    results = scenario_pipeline(specs, parameters, climates)
+    for j, category in enumerate(surrogate.categories):
+        by_climate = CATEGORY_STAGES[ENERGY_USE_CATEGORIES(category)] in CLIMATE_STAGES
+        for i, climate in enumerate(climates if by_climate else climates[:1]):
+            expected = results.loc[climate].xs(category, level="category").to_numpy()
+            coefficients[i, j] = np.linalg.lstsq(terms[train], expected[train], rcond=None)[0]
+            predicted = terms[~train] @ coefficients[i, j]
+            errors[climate, category] = _errors(predicted, expected[~train])
+        if not by_climate:
+            coefficients[1:, j] = coefficients[0, j]
+            errors.update({(climate, category): errors[climates[0], category] for climate in climates[1:]})
+    surrogate.coefficients = coefficients
+    surrogate.errors = DataFrame(
+        [{"climate": climate, "category": category, **errors[climate, category]}
+         for climate in climates for category in surrogate.categories]
+    ).set_index(["climate", "category"])
+    return surrogate
+
+
+def _parse_vary(text: str) -> tuple[str, Union[tuple, list]]:
+    # field=low:high for numbers, field=a,b,c for choices
+    field, _, values = text.partition("=")
+    if ":" in values:
+        low, high = values.split(":")
+        return field, (float(low), float(high))
+    return field, values.split(",")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("case", help="TOML case file of the template building and the simulation parameters.")
+    parser.add_argument(
+        "--vary", action="append", default=[], required=True,
+        help="A varied field, as field=low:high or field=choice1,choice2. Repeat for each field.",
+    )
+    parser.add_argument("--climate", action="append", default=None, help="Climate to fit. Defaults to the case's.")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--degree", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the surrogate to this .npz file.")
+    args = parser.parse_args(argv)
+
+    template, parameters = load_case(args.case)
+    ranges = dict(_parse_vary(v) for v in args.vary)
+    surrogate = build_surrogate(template, parameters, ranges, args.climate, args.samples, args.degree, args.seed)
+    print(f"Held-out error of {len(surrogate.features)} features at degree {surrogate.degree}:")
+    print(surrogate.errors.round(3).to_string())
+    if args.output:
+        surrogate.save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Helpers to coerce raw user-supplied values (spreadsheet cells, TOML entries, JSON) into the
+types declared on the specification and parameter dataclasses.
+"""
+from dataclasses import fields
+from enum import Enum
+from math import isnan
+from typing import Any, get_args, get_type_hints
+
+from .dataclasses import OpenBESSpecification, OpenBESParameters
+
+TRUE_STRINGS = ("yes", "true")
+FALSE_STRINGS = ("no", "false")
+
+
+def get_field_types(cls: type) -> dict[str, type]:
+    """Map each field of a dataclass to its underlying (non-Optional) type.
+    Args:
+        cls (type): The dataclass, e.g. OpenBESSpecification.
+    Returns:
+        dict[str, type]: Field name to type (float, int, str or an Enum subclass).
+    """
+    hints = get_type_hints(cls)
+    field_types = {}
+    for f in fields(cls):
+        args = [a for a in get_args(hints[f.name]) if a is not type(None)]
+        field_types[f.name] = args[0] if args else hints[f.name]
+    return field_types
+
+
+SPECIFICATION_FIELD_TYPES = get_field_types(OpenBESSpecification)
+PARAMETERS_FIELD_TYPES = get_field_types(OpenBESParameters)
+
+
+def is_missing(value: Any) -> bool:
+    """Check whether a raw value should be treated as not supplied (None, blank or NaN).
+    Args:
+        value (Any): The raw value.
+    Returns:
+        bool: True if the value is missing.
+    """
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ""
+    try:
+        return isnan(value)
+    except TypeError:
+        return False
+
+
+def decode_enum(enum_cls: type[Enum], value: Any) -> Enum:
+    """Decode an enum member from its value (e.g. "Tubular fluorescent T8") or its name (e.g. "FT_T8").
+    Args:
+        enum_cls (type[Enum]): The enum to decode into.
+        value (Any): The raw value.
+    Returns:
+        Enum: The matching enum member.
+    Raises:
+        ValueError: If the value matches neither a value nor a name of the enum.
+    """
+    if isinstance(value, enum_cls):
+        return value
+    text = str(value).strip()
+    try:
+        return enum_cls(text)
+    except ValueError:
+        pass
+    try:
+        return enum_cls[text]
+    except KeyError:
+        pass
+    raise ValueError(f"{value!r} is not a valid {enum_cls.__name__}")
+
+
+def coerce_value(field_type: type, value: Any) -> Any:
+    """Coerce a raw value to a dataclass field type.
+
+    Blank values become None and "Yes"/"No" become 1/0 for numeric fields.
+    Text that cannot be read as a number becomes None, while text that cannot be decoded
+    into an enum is kept as-is so that validation can report it.
+    Args:
+        field_type (type): The field type, as given by get_field_types.
+        value (Any): The raw value.
+    Returns:
+        Any: The coerced value.
+    """
+    if is_missing(value):
+        return None
+    if issubclass(field_type, Enum):
+        try:
+            return decode_enum(field_type, value)
+        except ValueError:
+            return value
+    if field_type is str:
+        return str(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_STRINGS:
+            return field_type(1)
+        if text in FALSE_STRINGS:
+            return field_type(0)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if field_type is int else number
+
+
+def spec_from_dict(data: dict[str, Any]) -> OpenBESSpecification:
+    """Build a specification from a dictionary of raw values, ignoring unknown keys.
+    Args:
+        data (dict[str, Any]): Field name to raw value.
+    Returns:
+        OpenBESSpecification: The coerced specification.
+    """
+    return OpenBESSpecification(**{
+        k: coerce_value(SPECIFICATION_FIELD_TYPES[k], v) for k, v in data.items() if k in SPECIFICATION_FIELD_TYPES
+    })
+
+
+def parameters_from_dict(data: dict[str, Any]) -> OpenBESParameters:
+    """Build simulation parameters from a dictionary of raw values, ignoring unknown keys.
+    Args:
+        data (dict[str, Any]): Field name to raw value.
+    Returns:
+        OpenBESParameters: The coerced parameters.
+    """
+    return OpenBESParameters(**{
+        k: coerce_value(PARAMETERS_FIELD_TYPES[k], v) for k, v in data.items() if k in PARAMETERS_FIELD_TYPES
+    })
@@ -0,0 +1,246 @@
+"""
+Up-front validation of a batch of building specifications.
+
+Validation rules are declared in a table (RULES) and compiled once into vectorized checks.
+Each check runs over a whole batch column at a time and flags failing buildings with a
+diagnostic code. Invalid buildings can then be rejected in bulk, with their reasons,
+before the engines run.
+
+Rules only check fields that a pipeline stage reads (pipeline.STAGE_FIELDS), so no building is
+rejected over an input that changes no result. A rule only applies to buildings that use the
+system it describes: the `when` field must be present (and non-zero, for numeric fields). For
+example, hot water fields are only required for buildings with a water_system_energy_source.
+
+    result = validate_batch(specs)
+    result.report()  # to the current diagnostics collector
+    results = batch_pipeline(result.accepted(specs), parameters)
+"""
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from pandas import DataFrame, MultiIndex, Series, concat
+
+from .diagnostics import get_collector, MISSING, UNMATCHED, INCONSISTENT, INVALID
+from .pipeline import STAGE_FIELDS
+from .simulations.climate import resolve_climate_file
+from .simulations.lighting import get_lamp_table, get_lamp_table_name_batch, LIGHTING_ZONES
+from .types.coercion import SPECIFICATION_FIELD_TYPES
+
+# Rule kinds
+REQUIRED = "required"  # every field is present
+ORDERED = "ordered"  # fields[0] <= fields[1] where both are present
+MEMBER = "member"  # an enum field holds a member of its enum
+AVAILABLE = "available"  # a lookup value exists (lamp table entry, climate file)
+
+RULE_CODES = {REQUIRED: MISSING, ORDERED: INCONSISTENT, MEMBER: INVALID, AVAILABLE: UNMATCHED}
+ERROR_COLUMNS = ["building", "category", "field", "code", "detail"]
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A declarative validation rule.
+    Args:
+        category (str): Simulation stage the rule protects, e.g. "hot_water".
+        kind (str): One of REQUIRED, ORDERED, MEMBER, AVAILABLE.
+        fields (tuple[str, ...]): The fields checked. For ORDERED rules, the second field is the one
+            reported; for AVAILABLE rules, the first.
+        when (Optional[str]): Only check buildings where this field is present and non-zero.
+        detail (Optional[str]): Reason given with failures.
+    """
+    category: str
+    kind: str
+    fields: tuple[str, ...]
+    when: Optional[str] = None
+    detail: Optional[str] = None
+
+
+# The stage that reads each specification field
+FIELD_STAGES = {field: name for name, fields in STAGE_FIELDS.items() for field in fields}
+
+
+RULES: list[Rule] = [
+    *(rule for zone in LIGHTING_ZONES for rule in (
+        Rule("lighting", REQUIRED, tuple(f"lighting_system_{name}_z{zone}" for name in (
+            "lamp_power", "lamp_number", "luminary_number", "similar_zone_number",
+            "operating_hours", "simultaneity_factor",
+        )), when=f"lighting_system_tech_z{zone}"),
+        Rule("lighting", AVAILABLE, (f"lighting_system_lamp_power_z{zone}", f"lighting_system_lamp_number_z{zone}"),
+             when=f"lighting_system_tech_z{zone}", detail="no lamp table entry for this power and number"),
+    )),
+    Rule("hot_water", REQUIRED, (
+        "water_demand", "water_reference_temperature", "water_supply_temperature", "water_system_efficiency_cop"
+    ), when="water_system_energy_source"),
+    Rule("ventilation", REQUIRED, ("ventilation_system1_rated_input_power",), when="ventilation_system1_energy_source"),
+    Rule("ventilation", REQUIRED, ("ventilation_system1_on_time", "ventilation_system1_off_time"),
+         when="ventilation_system1_rated_input_power"),
+    Rule("ventilation", ORDERED, ("ventilation_system1_on_time", "ventilation_system1_off_time"),
+         detail="off time is earlier than on time"),
+    *(Rule(FIELD_STAGES[name], MEMBER, (name,), detail=f"not a {field_type.__name__} value")
+      for name, field_type in SPECIFICATION_FIELD_TYPES.items()
+      if issubclass(field_type, Enum) and name in FIELD_STAGES),
+]
+
+# A compiled check returns a boolean mask of failing buildings
+Check = Callable[[DataFrame], np.ndarray]
+
+
+@dataclass
+class CompiledRule:
+    rule: Rule
+    field: str
+    code: str
+    check: Check
+
+
+def _in_use(specs: DataFrame, field: str) -> np.ndarray:
+    column = specs[field]
+    if column.dtype.kind == "f":
+        values = column.to_numpy()
+        return ~np.isnan(values) & (values != 0)
+    return column.notna().to_numpy()
+
+
+def _compile_available(rule: Rule) -> Check:
+    field = rule.fields[0]
+    if field == "meteorological_file":
+        @lru_cache(maxsize=None)
+        def resolves(name: str) -> bool:
+            try:
+                resolve_climate_file(name)
+                return True
+            except FileNotFoundError:
+                return False
+
+        def check(specs: DataFrame) -> np.ndarray:
+            names = specs[field]
+            present = names.notna().to_numpy()
+            failing = np.zeros(len(specs), dtype=bool)
+            for name in names[present].unique():
+                if not isinstance(name, str) or not resolves(name):
+                    failing |= (names == name).to_numpy()
+            return failing
+        return check
+
+    zone = int(field.rsplit("_z", 1)[1])
+    lamp_keys = get_lamp_table().index
+
+    def check(specs: DataFrame) -> np.ndarray:
+        table = get_lamp_table_name_batch(specs, zone)
+        keys = MultiIndex.from_arrays([
+            table, specs[rule.fields[0]].to_numpy(dtype=float), specs[rule.fields[1]].to_numpy(dtype=float)
+        ])
+        # Technologies without a lamp table are covered by the REQUIRED rule
+        return table.notna().to_numpy() & ~keys.isin(lamp_keys)
+    return check
+
+
+def _compile(rule: Rule) -> list[CompiledRule]:
+    code = RULE_CODES[rule.kind]
+    if rule.kind == REQUIRED:
+        return [
+            CompiledRule(rule, field, code, lambda specs, field=field: specs[field].isna().to_numpy())
+            for field in rule.fields
+        ]
+    if rule.kind == ORDERED:
+        first, second = rule.fields
+        # NaN comparisons are False, so missing values never fail here
+        return [CompiledRule(rule, second, code, lambda specs: (specs[second] < specs[first]).to_numpy())]
+    if rule.kind == MEMBER:
+        field, = rule.fields
+        enum_cls = SPECIFICATION_FIELD_TYPES[field]
+
+        def check(specs: DataFrame) -> np.ndarray:
+            column = specs[field]
+            present = column.notna()
+            # Values that failed to decode are kept as their raw text
+            invalid = [v for v in column[present].unique() if not isinstance(v, enum_cls)]
+            return column.isin(invalid).to_numpy() if invalid else np.zeros(len(specs), dtype=bool)
+        return [CompiledRule(rule, field, code, check)]
+    if rule.kind == AVAILABLE:
+        return [CompiledRule(rule, rule.fields[0], code, _compile_available(rule))]
+    raise ValueError(f"Unknown rule kind: {rule.kind}")
+
+
+def compile_rules(rules: Iterable[Rule]) -> list[CompiledRule]:
+    """Compile declarative rules into vectorized checks.
+    Args:
+        rules (Iterable[Rule]): The rules.
+    Returns:
+        list[CompiledRule]: One check per field checked.
+    """
+    return [compiled for rule in rules for compiled in _compile(rule)]
+
+
+@lru_cache(maxsize=1)
+def get_compiled_rules() -> list[CompiledRule]:
+    """Return the default RULES, compiled once per process."""
+    return compile_rules(RULES)
+
+
+@dataclass
+class ValidationResult:
+    """The outcome of validate_batch.
+    Args:
+        valid (Series): True for each building that passed every rule, indexed like the batch.
+        errors (DataFrame): One row per failure: building, category, field, code and detail.
+    """
+    valid: Series
+    errors: DataFrame
+
+    @property
+    def rejected(self) -> int:
+        return int((~self.valid).sum())
+
+    def accepted(self, specs: DataFrame) -> DataFrame:
+        """Return the buildings of the batch that passed validation."""
+        return specs[self.valid.to_numpy()]
+
+    def reasons(self) -> Series:
+        """Return the failures of each rejected building as "field code" strings, indexed by building."""
+        text = self.errors["field"] + " " + self.errors["code"]
+        return text.groupby(self.errors["building"], sort=False).agg("; ".join)
+
+    def report(self) -> None:
+        """Send every failure to the current diagnostics collector, attributed to the rule's category."""
+        collector = get_collector()
+        for (category, field, code), group in self.errors.groupby(["category", "field", "code"], sort=False):
+            collector.report_batch(category, field, code, group["building"], detail=group["detail"].iloc[0])
+
+
+def validate_batch(specs: DataFrame, rules: Optional[list[CompiledRule]] = None) -> ValidationResult:
+    """Check a batch of building specifications against compiled validation rules.
+    Args:
+        specs (DataFrame): Batch of building specifications, one row per building
+            (see openbes.portfolio.reader).
+        rules (Optional[list[CompiledRule]]): Rules from compile_rules. Defaults to the compiled RULES.
+    Returns:
+        ValidationResult: Which buildings passed, and why the others failed.
+    """
+    rules = get_compiled_rules() if rules is None else rules
+    failing_any = np.zeros(len(specs), dtype=bool)
+    errors = []
+    in_use = {}
+    for compiled in rules:
+        failing = compiled.check(specs)
+        when = compiled.rule.when
+        if when is not None:
+            if when not in in_use:
+                in_use[when] = _in_use(specs, when)
+            failing = failing & in_use[when]
+        if not failing.any():
+            continue
+        failing_any |= failing
+        errors.append(DataFrame({
+            "building": specs.index[failing],
+            "category": compiled.rule.category,
+            "field": compiled.field,
+            "code": compiled.code,
+            "detail": compiled.rule.detail,
+        }))
+    return ValidationResult(
+        valid=Series(~failing_any, index=specs.index),
+        errors=concat(errors, ignore_index=True) if errors else DataFrame(columns=ERROR_COLUMNS),
+    )
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from unittest import mock
+
+from pandas.testing import assert_frame_equal
+
+from src.openbes import aio
+from src.openbes.cases import load_case
+from src.openbes.diagnostics import collecting, MISSING
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from src.openbes.simulations.climate import load_climate
+from .test_service import CASE
+
+
+class AsyncPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        spec, cls.parameters = load_case(CASE)
+        cls.specs = specs_to_frame([spec, replace(spec, water_demand=None)], ["a", "b"])
+
+    def test_matches_batch_pipeline(self):
+        async def main():
+            with collecting() as collector:
+                results = await aio.batch_pipeline_async(self.specs, self.parameters)
+            return results, collector
+
+        results, collector = asyncio.run(main())
+        assert_frame_equal(results, batch_pipeline(self.specs, self.parameters))
+        # The executor thread reports to the caller's collector
+        self.assertEqual(collector.counts[("hot_water", "water_demand", MISSING)], 1)
+
+    def test_unknown_climate(self):
+        specs = self.specs.assign(meteorological_file=["nowhere", "725650_Denver"])
+        for climate_stages in (frozenset(), frozenset({"heating_cooling"})):
+            with self.subTest(climate_stages=climate_stages):
+                with mock.patch.object(aio, "CLIMATE_STAGES", climate_stages):
+                    results = asyncio.run(aio.batch_pipeline_async(specs, self.parameters))
+                assert_frame_equal(results, batch_pipeline(specs, self.parameters))
+
+    def test_process_executor(self):
+        async def main(executor):
+            return await asyncio.gather(*(
+                aio.batch_pipeline_async(self.specs.iloc[[i]], self.parameters, executor=executor) for i in range(2)
+            ))
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            first, second = asyncio.run(main(executor))
+        assert_frame_equal(first, batch_pipeline(self.specs.iloc[[0]], self.parameters))
+        assert_frame_equal(second, batch_pipeline(self.specs.iloc[[1]], self.parameters))
+
+    def test_shared_climate_load(self):
+        calls = []
+
+        def slow_load(name):
+            calls.append(name)
+            time.sleep(0.1)
+            return load_climate(name)
+
+        async def main():
+            return await asyncio.gather(*(aio.load_climate_async("725650_Denver") for _ in range(5)))
+
+        with mock.patch.object(aio, "load_climate", slow_load):
+            arrays = asyncio.run(main())
+        self.assertEqual(calls, ["725650_Denver"])
+        self.assertTrue(all(a is arrays[0] for a in arrays))
+
+    def test_cancellation(self):
+        release = threading.Event()
+        simulated = []
+
+        async def main(executor):
+            # Occupy the only worker so the simulation stays queued
+            executor.submit(release.wait)
+            task = asyncio.create_task(aio.batch_pipeline_async(self.specs, self.parameters, executor=executor))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(aio, "batch_pipeline", lambda *args: simulated.append(args)):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                asyncio.run(main(executor))
+                release.set()
+        self.assertEqual(simulated, [])
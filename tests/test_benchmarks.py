@@ -0,0 +1,115 @@
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import ashrae140, envelope, fidelity, micro, scaling
+
+HAS_OPENPYXL = importlib.util.find_spec("openpyxl") is not None
+
+
+@unittest.skipUnless(HAS_OPENPYXL, "openpyxl is required to read the validation workbook")
+class Ashrae140Benchmark(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ("600.toml", "610.toml", ashrae140.VALIDATION_WORKBOOK):
+            shutil.copy(os.path.join(ashrae140.CASES_DIR, name), self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reference_ranges(self):
+        ranges = ashrae140.read_reference_ranges(self.tmp.name).set_index(["kind", "case"])
+        self.assertEqual(ranges.loc[("absolute", "600H"), "ref_min"], 3.75)
+        self.assertEqual(ranges.loc[("relative", "610H"), "baseline"], "600H")
+        # Ranges are ordered even where the workbook lists them high-to-low
+        self.assertTrue((ranges["ref_min"] <= ranges["ref_max"]).all())
+        self.assertNotIn(("absolute", "600FFH"), ranges.index)
+
+    def test_run_and_history(self):
+        record = ashrae140.run_benchmark(self.tmp.name)
+        self.assertEqual(set(record["cases"]), {"600", "610"})
+        self.assertIn("heating_cooling", record["cases"]["600"]["stages"])
+        tests = {(t["kind"], t["case"]): t for t in record["tests"]}
+        self.assertEqual(
+            set(tests),
+            {(k, c) for k in ("absolute", "relative") for c in ("610H", "610C")} | {("absolute", "600H"), ("absolute", "600C")},
+        )
+        heating = record["cases"]["600"]["annual_mwh"]["H"]
+        self.assertAlmostEqual(tests[("absolute", "600H")]["value"], heating, places=5)
+        self.assertEqual(record["summary"]["tests"], len(tests))
+
+        history = os.path.join(self.tmp.name, "results", "history.json")
+        ashrae140.append_history(history, record)
+        ashrae140.append_history(history, record)
+        with open(history) as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    def test_regressions(self):
+        previous = {"tests": [{"kind": "absolute", "case": "600H", "in_range": True}]}
+        current = {"tests": [{"kind": "absolute", "case": "600H", "in_range": False}]}
+        self.assertEqual(ashrae140.get_regressions(previous, current), ["absolute 600H"])
+        self.assertEqual(ashrae140.get_regressions(current, previous), [])
+
+
+class MicroBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.tmp.name, "baseline.json")
+        self.args = ["hot_water", "--baseline", self.baseline, "--samples", "3", "--min-time", "0.001"]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_time_function(self):
+        calls = []
+        timing = micro.time_function(lambda: calls.append(1), warmup=2, samples=5, min_time=0.001)
+        self.assertEqual(timing.samples, 5)
+        self.assertGreater(timing.loops, 1)
+        # Warmup calls and calibration runs come on top of the timed samples
+        self.assertGreater(len(calls), 2 + timing.loops * 5)
+        self.assertGreater(timing.median, 0)
+        self.assertGreaterEqual(timing.iqr, 0)
+
+    def test_slowdown(self):
+        self.assertAlmostEqual(micro.get_slowdown(micro.Timing(1.5, 0, 1, 1), micro.Timing(1.0, 0, 1, 1)), 50.0)
+        self.assertIsNone(micro.get_slowdown(micro.Timing(1.5, 0, 1, 1), None))
+
+    def test_regression_threshold(self):
+        self.assertEqual(micro.main([*self.args, "--save-baseline"]), 0)
+        with open(self.baseline) as f:
+            self.assertEqual(list(json.load(f)), ["hot_water.get_hot_water_per_month"])
+        # A baseline far faster than any real run is always exceeded
+        micro.write_baseline(self.baseline, {"hot_water.get_hot_water_per_month": micro.Timing(1e-12, 0, 1, 1)})
+        self.assertEqual(micro.main(self.args), 1)
+        self.assertEqual(micro.main([*self.args, "--threshold", "1e15"]), 0)
+
+
+class ScalingBenchmark(unittest.TestCase):
+    def test_run_scaling(self):
+        results = scaling.run_scaling(sizes=[3, 10], jobs=[1], chunk_size=4)
+        self.assertEqual([(r["buildings"], r["jobs"]) for r in results], [(3, 1), (10, 1)])
+        for r in results:
+            self.assertGreater(r["buildings_per_second"], 0)
+            self.assertGreater(r["peak_rss_bytes"], 0)
+            self.assertEqual(r["parallel_efficiency"], 1.0)
+
+
+class EnvelopeBenchmark(unittest.TestCase):
+    def test_run_envelope(self):
+        results = envelope.run_envelope(sizes=[2], samples=2, min_time=0.001)
+        self.assertEqual(results[0]["buildings"], 2)
+        self.assertTrue(all(results[0][name] > 0 for name in envelope.FUNCTIONS))
+
+
+class FidelityBenchmark(unittest.TestCase):
+    def test_compare_tiers(self):
+        comparison = fidelity.compare_tiers(fidelity.synthetic_groups(30, seed=2))
+        self.assertEqual(list(comparison["summary"]), ["monthly", "daily", "hourly"])
+        records = [r for r in comparison["records"] if r["fidelity"] == "daily" and r["category"] == "Lighting"]
+        self.assertEqual(len(records), comparison["buildings"])
+        self.assertEqual(comparison["summary"]["monthly"]["Lighting"]["max_abs_error_percent"], 0)
+        self.assertEqual(fidelity.get_failures(comparison, 0), [])
+        self.assertIn("Lighting", fidelity.format_report(comparison, "synthetic"))
@@ -0,0 +1,91 @@
+import calendar
+import time
+import unittest
+from dataclasses import replace
+
+import numpy as np
+
+from src.openbes.calibration import ELECTRICITY, GAS, calibrate, get_metered_bills
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import frame_to_specs, specs_to_frame
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.types import ENERGY_SOURCES, OpenBESParameters
+from .test_shared_climates import CLIMATE
+
+MONTH_NAMES = [calendar.month_name[m].lower() for m in range(1, 13)]
+
+
+class Calibrate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = OpenBESParameters()
+        spec = next(frame_to_specs(generate_portfolio(1, seed=3, climates=[CLIMATE])))
+        cls.spec = replace(spec, water_system_energy_source=ENERGY_SOURCES.Electricity)
+        # Bills of the same building with a higher standby load and water demand than specified
+        actual = replace(
+            cls.spec, building_standby_load=spec.building_standby_load * 1.5, water_demand=spec.water_demand * 2
+        )
+        cls.results = batch_pipeline(specs_to_frame([actual]), cls.parameters).droplevel(0)
+
+    def metered(self, heating_bill: str = "gas"):
+        heating = self.results.loc["Heating"].to_numpy()
+        electricity = self.results.drop("Heating").sum().to_numpy()
+        gas = np.zeros(12)
+        if heating_bill == ELECTRICITY:
+            electricity = electricity + heating
+        else:
+            gas = heating
+        return replace(
+            self.spec,
+            **{f"electricity_{m}": float(v) for m, v in zip(MONTH_NAMES, electricity)},
+            **{f"gas_{m}": float(v) for m, v in zip(MONTH_NAMES, gas)},
+        )
+
+    def test_recovers_bills(self):
+        start = time.perf_counter()
+        calibration = calibrate(self.metered(), self.parameters)
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertTrue(calibration.meets_guideline14)
+        self.assertLess(calibration.cv_rmse_percent, 1)
+        self.assertAlmostEqual(calibration.factors["building_standby_load"], 1.5, delta=0.05)
+        self.assertAlmostEqual(
+            calibration.spec.building_standby_load,
+            self.spec.building_standby_load * calibration.factors["building_standby_load"],
+        )
+        np.testing.assert_allclose(
+            calibration.simulated.to_numpy(), calibration.metered.to_numpy(), rtol=0.02
+        )
+        # The calibrated specification reproduces the simulated bills
+        rerun = batch_pipeline(specs_to_frame([calibration.spec]), self.parameters).droplevel(0)
+        np.testing.assert_allclose(
+            rerun.drop("Heating").sum().to_numpy(), calibration.simulated.loc[ELECTRICITY].to_numpy()
+        )
+
+    def test_annual_totals(self):
+        annual = float(self.results.sum().sum())
+        spec = replace(
+            self.metered(),
+            electricity_annual=annual,
+            **{f"electricity_{m}": None for m in MONTH_NAMES},
+            **{f"gas_{m}": None for m in MONTH_NAMES},
+        )
+        self.assertTrue(get_metered_bills(spec).isna().all().all())
+        calibration = calibrate(spec, self.parameters, heating_bill=None)
+        self.assertAlmostEqual(calibration.simulated.loc[ELECTRICITY].sum(), annual, delta=0.01 * annual)
+
+    def test_heating_bill_is_not_fitted(self):
+        # Heating is not simulated, so the gas metered for it must not move the calibrated inputs
+        spec = replace(self.metered(), **{f"gas_{m}": 5000.0 for m in MONTH_NAMES})
+        calibration = calibrate(spec, self.parameters)
+        self.assertEqual(calibration.factors, calibrate(self.metered(), self.parameters).factors)
+        self.assertEqual(calibration.metered.loc[GAS].sum(), 12 * 5000.0)
+        self.assertTrue(calibration.meets_guideline14)
+
+    def test_checks(self):
+        with self.assertRaises(ValueError):
+            calibrate(self.spec, self.parameters)
+        electricity_only = replace(self.metered(), **{f"gas_{m}": None for m in MONTH_NAMES})
+        with self.assertRaises(ValueError):
+            calibrate(electricity_only, self.parameters, heating_bill=ELECTRICITY)
+        with self.assertRaises(ValueError):
+            calibrate(self.metered(), self.parameters, heating_bill="steam")
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pandas import read_csv
+
+from src.openbes import cli
+from src.openbes.portfolio import runner
+from src.openbes.simulations import climate
+from src.openbes.types import ENERGY_USE_CATEGORIES
+from .test_portfolio import PORTFOLIO_CSV
+
+CASES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cases_ashrae-std140-2023_with-results")
+
+
+class CommandLine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "output")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        climate.set_cache_dir(None)
+
+    def test_case_directory(self):
+        totals = cli.run(CASES_DIR, self.output, chunk_size=10, fidelity="monthly")
+        cases = [f[:-5] for f in os.listdir(CASES_DIR) if f.endswith(".toml")]
+        self.assertEqual(totals.buildings, len(cases))
+        self.assertGreater(totals.batches, 1)  # cases are grouped by their parameters
+        rows = read_csv(os.path.join(self.output, "part-00000.csv"), dtype={"building_id": str})
+        self.assertEqual(sorted(set(rows["building_id"])), sorted(cases))
+        self.assertEqual(len(rows), len(cases) * len(ENERGY_USE_CATEGORIES))
+        # The cases name climate files, but no stage reads them
+        self.assertIsNone(totals.cache_hit_rate)
+
+    def test_portfolio_and_summary(self):
+        csv = os.path.join(self.tmp.name, "portfolio.csv")
+        with open(csv, "w") as f:
+            f.write(PORTFOLIO_CSV)
+        trace = os.path.join(self.tmp.name, "trace.json")
+        with self.assertLogs("src.openbes.diagnostics", "WARNING"):
+            with mock.patch("builtins.print") as printed:
+                code = cli.main([csv, "--output", self.output, "--validate", "--profile", trace])
+        self.assertEqual(code, 0)
+        summary = printed.call_args_list[0].args[0]
+        self.assertIn("Simulated 1 buildings", summary)
+        self.assertIn("rejected 3 invalid", summary)
+        self.assertIn("Climate cache: no climate files used", summary)
+        with open(trace) as f:
+            self.assertIn("validate", {e["name"] for e in json.load(f)["traceEvents"]})
+
+    @mock.patch.object(runner, "CLIMATE_STAGES", frozenset({"heating_cooling"}))
+    def test_climate_cache(self):
+        cache_dir = os.path.join(self.tmp.name, "cache")
+        case = os.path.join(CASES_DIR, "600.toml")
+        climate.load_climate.cache_clear()
+        parsed = climate.load_climate("725650_Denver").copy()
+        climate.load_climate.cache_clear()
+        first = cli.run(case, self.output, cache_dir=cache_dir)
+        # The engines look the file up more than once, but it is one load
+        self.assertEqual((first.cache_hits, first.cache_misses), (0, 1))
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        climate.load_climate.cache_clear()
+        second = cli.run(case, self.output, cache_dir=cache_dir, resume=True)
+        self.assertEqual((second.buildings, second.skipped), (0, 1))
+        self.assertEqual(second.cache_misses, 0)
+        climate.load_climate.cache_clear()
+        misses = climate.get_climate_cache_stats()["misses"]
+        cached = climate.load_climate("725650_Denver")
+        self.assertEqual(climate.get_climate_cache_stats()["misses"], misses)
+        self.assertTrue((cached == parsed).all())
+        self.assertFalse(cached.flags.writeable)
+
+    def test_bad_input(self):
+        with self.assertRaises(SystemExit):
+            cli.main([os.path.join(self.tmp.name, "missing.toml"), "--output", self.output])
+        with self.assertRaises(SystemExit):
+            cli.main([os.path.join(CASES_DIR, "600.toml"), "--output", self.output, "--fidelity", "screening"])
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.openbes.simulations import climate
+from src.openbes.simulations.utils import DAYS_PER_MONTH
+
+CLIMATE = "725650_Denver"
+
+
+class ClimateStatistics(unittest.TestCase):
+    def tearDown(self):
+        climate.set_cache_dir(None)
+        climate.get_climate_statistics.cache_clear()
+        climate.load_climate.cache_clear()
+
+    def test_statistics(self):
+        hourly = climate.load_climate(CLIMATE)
+        statistics = climate.compute_climate_statistics(hourly)
+        self.assertEqual(statistics.bin_hours.sum(), 8760)
+        self.assertEqual(statistics.heating_degree_days.shape, (len(climate.DEGREE_DAY_BASES), 12))
+        # Degree-days either side of a base differ by the mean temperature's distance from it
+        temperature = hourly[climate.CLIMATE_VARIABLES.index("temp_air")]
+        base = list(climate.DEGREE_DAY_BASES).index(18.0)
+        difference = statistics.heating_degree_days[base].sum() - statistics.cooling_degree_days[base].sum()
+        self.assertAlmostEqual(difference, (18.0 - temperature).sum() / 24)
+        self.assertAlmostEqual(
+            statistics.mean_ghi @ DAYS_PER_MONTH * 24,
+            hourly[climate.CLIMATE_VARIABLES.index("ghi")].sum(),
+        )
+
+    def test_stored_next_to_climate_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            climate.set_cache_dir(cache_dir)
+            climate.load_climate.cache_clear()
+            computed = climate.get_climate_statistics(CLIMATE)
+            files = sorted(os.listdir(cache_dir))
+            self.assertEqual(len(files), 2)
+            self.assertEqual(files[1], files[0][:-len(".npy")] + ".stats.npz")
+            climate.get_climate_statistics.cache_clear()
+            stored = climate.get_climate_statistics(CLIMATE)
+            np.testing.assert_array_equal(stored.heating_degree_days, computed.heating_degree_days)
+            np.testing.assert_array_equal(stored.bin_hours, computed.bin_hours)
+            np.testing.assert_array_equal(stored.mean_ghi, computed.mean_ghi)
@@ -0,0 +1,132 @@
+import tempfile
+import unittest
+from dataclasses import replace
+
+import numpy as np
+
+from src.openbes import diagnostics
+from src.openbes.cases import HOLYWELL_HOUSE
+from src.openbes.diagnostics import DiagnosticsCollector, collecting, INVALID, MISSING, UNMATCHED, INCONSISTENT
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from src.openbes.portfolio.runner import run_portfolio
+from src.openbes.portfolio.writer import ResultWriter
+from src.openbes.simulations.hot_water import get_hot_water_per_month
+from src.openbes.simulations.lighting import get_w_per_luminaire
+from src.openbes.types import OpenBESSpecification, OpenBESParameters, LIGHTING_TECHNOLOGIES
+
+
+class Collector(unittest.TestCase):
+    def test_counts(self):
+        collector = DiagnosticsCollector(max_examples=2)
+        collector.report("lighting", "lamp_power", UNMATCHED, building="a", detail="KeyError")
+        collector.report("lighting", "lamp_power", UNMATCHED, building="b", detail="IndexError")
+        collector.report_batch("hot_water", "water_demand", MISSING, ["c", "d", "e"])
+        collector.report_batch("hot_water", "water_demand", MISSING, [])
+        self.assertEqual(len(collector), 5)
+        summary = collector.summary()
+        self.assertEqual(list(summary["count"]), [3, 2])
+        self.assertEqual(summary.loc[1, "examples"], ["a", "b"])
+        self.assertEqual(summary.loc[0, "examples"], ["c", "d"])
+        # Only the first detail is kept
+        self.assertEqual(summary.loc[1, "detail"], "KeyError")
+
+    def test_bounded_records(self):
+        collector = DiagnosticsCollector(max_records=3)
+        collector.report_batch("ventilation", "on_time", MISSING, range(10))
+        self.assertEqual(len(collector.records), 3)
+        self.assertEqual(collector.dropped, 7)
+        self.assertEqual(collector.records[0], (0, "ventilation", "on_time", MISSING))
+
+    def test_merge(self):
+        first, second = DiagnosticsCollector(), DiagnosticsCollector()
+        first.report_batch("hot_water", "water_demand", MISSING, ["a"])
+        second.report_batch("hot_water", "water_demand", MISSING, ["b", "c"])
+        second.report_batch("ventilation", "off_time", INCONSISTENT, ["d"], detail="reversed")
+        first.merge(second)
+        self.assertEqual(first.counts[("hot_water", "water_demand", MISSING)], 3)
+        self.assertEqual(first.details[("ventilation", "off_time", INCONSISTENT)], "reversed")
+        self.assertEqual(len(first.records), 4)
+
+    def test_logging(self):
+        with self.assertLogs(diagnostics.logger, "WARNING") as logs:
+            collector = DiagnosticsCollector(verbose=True)
+            collector.report("hot_water", "water_demand", MISSING)
+            collector.report("hot_water", "water_demand", MISSING)
+            collector.log_summary()
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("water_demand missing x2", logs.output[-1])
+
+    def test_default_logs_first_occurrence(self):
+        spec = OpenBESSpecification(water_system_efficiency_cop=None)
+        key = ("hot_water", "water_system_efficiency_cop", MISSING)
+        diagnostics._default.counts.pop(key, None)
+        with self.assertLogs(diagnostics.logger, "WARNING") as logs:
+            for _ in range(5):
+                get_hot_water_per_month(spec)
+        self.assertEqual(len([line for line in logs.output if "water_system_efficiency_cop" in line]), 1)
+        self.assertGreaterEqual(diagnostics._default.counts[key], 5)
+
+
+class EngineDiagnostics(unittest.TestCase):
+    def test_single_building(self):
+        spec = OpenBESSpecification(
+            lighting_system_tech_z1=LIGHTING_TECHNOLOGIES.FT_T8,
+            lighting_system_lamp_power_z1=1234.0,
+            lighting_system_lamp_number_z1=1,
+        )
+        with collecting() as collector, diagnostics.building("b1"):
+            self.assertEqual(get_w_per_luminaire(spec, 1), 0.0)
+            get_w_per_luminaire(spec, 2)
+        self.assertEqual(collector.counts[("lighting", "lighting_system_lamp_power_z1", UNMATCHED)], 1)
+        self.assertEqual(collector.counts[("lighting", "lighting_system_tech_z2", MISSING)], 1)
+        self.assertEqual(collector.records[0][0], "b1")
+
+    def test_undecoded_technology(self):
+        # coerce_value keeps text it cannot decode, for validation to report
+        spec = replace(HOLYWELL_HOUSE, lighting_system_tech_z1="Not a lamp")
+        with collecting() as collector:
+            self.assertEqual(get_w_per_luminaire(spec, 1), 0.0)
+            results = batch_pipeline(specs_to_frame([spec]), OpenBESParameters())
+        self.assertEqual(collector.counts[("lighting", "lighting_system_tech_z1", INVALID)], 2)
+        self.assertNotIn(("lighting", "lighting_system_lamp_power_z1", UNMATCHED), collector.counts)
+        self.assertGreater(results.xs("Lighting", level="category").to_numpy().sum(), 0)
+
+    def test_batch(self):
+        broken = replace(
+            HOLYWELL_HOUSE,
+            lighting_system_lamp_power_z1=1234.0,
+            water_demand=None,
+            ventilation_system1_on_time=20,
+            ventilation_system1_off_time=8,
+        )
+        specs = specs_to_frame([HOLYWELL_HOUSE, broken], ["ok", "broken"])
+        with collecting() as collector:
+            results = batch_pipeline(specs, OpenBESParameters())
+        self.assertEqual(collector.counts[("lighting", "lighting_system_lamp_power_z1", UNMATCHED)], 1)
+        self.assertEqual(collector.counts[("hot_water", "water_demand", MISSING)], 1)
+        self.assertEqual(collector.counts[("ventilation", "ventilation_system1_off_time", INCONSISTENT)], 1)
+        self.assertEqual({record[0] for record in collector.records}, {"broken"})
+        self.assertTrue(np.isfinite(results.to_numpy()).all())
+
+    def test_run_summary(self):
+        broken = replace(HOLYWELL_HOUSE, water_demand=None)
+        specs = specs_to_frame([broken] * 3, ["a", "b", "c"])
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = run_portfolio([specs], OpenBESParameters(), ResultWriter(output_dir), chunk_size=2)
+        self.assertEqual(summary.diagnostics.counts[("hot_water", "water_demand", MISSING)], 3)
+        self.assertEqual(summary.diagnostics.examples[("hot_water", "water_demand", MISSING)], ["a", "b", "c"])
+
+    def test_unknown_climate(self):
+        # Nothing reads the climate yet, so an unknown file neither fails the run nor rejects the building
+        known = replace(HOLYWELL_HOUSE, meteorological_file="725650_Denver")
+        unknown = replace(HOLYWELL_HOUSE, meteorological_file="Atlantis")
+        specs = specs_to_frame([known, unknown, unknown], ["known", "a", "b"])
+        for validate in (False, True):
+            with tempfile.TemporaryDirectory() as output_dir:
+                summary = run_portfolio(
+                    [specs], OpenBESParameters(), ResultWriter(output_dir), chunk_size=2, validate=validate
+                )
+            self.assertEqual(summary.buildings, 3)
+            self.assertEqual(summary.rejected, 0)
+            self.assertFalse(summary.diagnostics.counts)
@@ -0,0 +1,109 @@
+import unittest
+from collections import Counter
+from dataclasses import fields, replace
+from unittest import mock
+
+import numpy as np
+
+from src.openbes.cases import load_case
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.simulations import envelope
+from src.openbes.simulations.envelope import (
+    THERMAL_BRIDGES,
+    derive_envelope_batch,
+    get_envelope_batch,
+    get_envelope_cache_stats,
+    get_floor_area_batch,
+    get_window_area_batch,
+)
+from .test_service import CASE
+
+
+class Envelope(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = load_case(CASE)[1]
+        cls.specs = generate_portfolio(30, seed=6)
+
+    def test_facades_add_up(self):
+        result = derive_envelope_batch(self.specs, self.parameters)
+        np.testing.assert_allclose(result.window_area.sum(axis=1), get_window_area_batch(self.specs))
+        np.testing.assert_allclose(result.solar_aperture.sum(axis=1), result.total_solar_aperture)
+        glazing = self.specs["window_gvalue"] * (1 - self.specs["window_frame_factor"])
+        np.testing.assert_allclose(
+            result.total_solar_aperture,
+            result.window_area.sum(axis=1) * glazing * self.parameters.shading_correction_factor,
+        )
+        np.testing.assert_array_equal(result.floor_area, get_floor_area_batch(self.specs))
+        np.testing.assert_array_equal(
+            result.heat_loss, result.transmission + result.thermal_bridges + result.infiltration
+        )
+        self.assertTrue((result.opaque_area >= 0).all())
+
+    def assertEnvelopesEqual(self, first, second):
+        for field in fields(first):
+            np.testing.assert_array_equal(getattr(first, field.name), getattr(second, field.name), err_msg=field.name)
+
+    def test_cached_per_building(self):
+        first = get_envelope_batch(self.specs, self.parameters)
+        self.assertEnvelopesEqual(first, derive_envelope_batch(self.specs, self.parameters))
+        before = get_envelope_cache_stats()
+        unrelated = self.specs.assign(setpoint_winter_day=25.0)
+        self.assertEnvelopesEqual(get_envelope_batch(unrelated, self.parameters), first)
+        self.assertEqual(get_envelope_cache_stats() - before, Counter(hits=30))
+
+        # Only the changed building is derived again
+        insulated = self.specs.copy()
+        insulated.loc[insulated.index[3], "uvalue_facade"] /= 2
+        before = get_envelope_cache_stats()
+        changed = get_envelope_batch(insulated, self.parameters)
+        self.assertEqual(get_envelope_cache_stats() - before, Counter(hits=29, misses=1))
+        self.assertEnvelopesEqual(changed, derive_envelope_batch(insulated, self.parameters))
+        self.assertLess(changed.transmission[3], first.transmission[3])
+
+        before = get_envelope_cache_stats()
+        get_envelope_batch(self.specs, replace(self.parameters, roof_correction_factor=2))
+        self.assertEqual(get_envelope_cache_stats() - before, Counter(misses=30))
+
+    def test_repeated_buildings(self):
+        specs = self.specs.iloc[[0, 1, 0, 0]].assign(building_height=123.0)
+        before = get_envelope_cache_stats()
+        result = get_envelope_batch(specs, self.parameters)
+        self.assertEqual(get_envelope_cache_stats() - before, Counter(hits=2, misses=2))
+        self.assertEnvelopesEqual(result, derive_envelope_batch(specs, self.parameters))
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(envelope, "ENVELOPE_CACHE_SIZE", 40):
+            for i in range(3):
+                get_envelope_batch(self.specs.assign(building_height=10.0 + i), self.parameters)
+            self.assertEqual(len(envelope._envelope_cache), 40)
+
+    def test_opaque_area_matches_transmission(self):
+        parameters = replace(
+            self.parameters, courtyard_number=2, courtyard_length=4, courtyard_width=3, facade_correction_factor=1.5
+        )
+        walls_only = self.specs.assign(uvalue_window=0.0, uvalue_roof=0.0, uvalue_floor=0.0)
+        result = derive_envelope_batch(walls_only, parameters)
+        np.testing.assert_allclose(
+            result.transmission,
+            walls_only["uvalue_facade"] * (result.opaque_area.sum(axis=1) + result.courtyard_wall_area) * 1.5,
+        )
+        np.testing.assert_allclose(result.courtyard_wall_area, 2 * 2 * (4 + 3) * walls_only["building_height"])
+
+    def test_thermal_bridges(self):
+        bridged = self.specs.assign(**{f"thermal_bridge_{j}": 1.0 for j in THERMAL_BRIDGES})
+        self.assertFalse(derive_envelope_batch(bridged, self.parameters).thermal_bridges.any())
+        psi = dict.fromkeys(THERMAL_BRIDGES, 0.1)
+        with_psi = derive_envelope_batch(bridged, self.parameters, psi)
+        without = derive_envelope_batch(bridged.assign(thermal_bridge_window=0.0), self.parameters, psi)
+        self.assertTrue((with_psi.thermal_bridges > 0).all())
+        self.assertTrue((with_psi.heat_loss > derive_envelope_batch(bridged, self.parameters).heat_loss).all())
+        self.assertTrue((without.thermal_bridges < with_psi.thermal_bridges).all())
+
+    def test_courtyards(self):
+        plain = derive_envelope_batch(self.specs, self.parameters)
+        courtyard = derive_envelope_batch(
+            self.specs, replace(self.parameters, courtyard_number=1, courtyard_length=4, courtyard_width=3)
+        )
+        self.assertTrue((courtyard.transmission != plain.transmission).any())
+        np.testing.assert_array_equal(courtyard.infiltration, plain.infiltration)
@@ -0,0 +1,93 @@
+import unittest
+from collections import Counter
+from unittest import mock
+
+from pandas.testing import assert_frame_equal
+
+from src.openbes import profiling
+from src.openbes.cases import load_case
+from src.openbes.pipeline import batch_pipeline, evaluate, what_if, FIDELITIES
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.simulations import envelope, hot_water
+from src.openbes.types import ENERGY_USE_CATEGORIES
+from .test_service import CASE
+
+
+class Evaluate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = load_case(CASE)[1]
+        cls.specs = generate_portfolio(20, seed=4)
+
+    def test_lighting_only(self):
+        with mock.patch.object(
+                hot_water, "get_hot_water_per_month_batch", side_effect=AssertionError("hot water computed")
+        ):
+            results = evaluate(self.specs, self.parameters, [ENERGY_USE_CATEGORIES.Lighting], ["annual", "total"])
+            annual = results["annual"]
+            total = results["total"]
+        self.assertEqual(list(annual.columns), ["Lighting"])
+        expected = batch_pipeline(self.specs, self.parameters).xs("Lighting", level="category").sum(axis=1)
+        self.assertTrue((annual["Lighting"] == expected).all())
+        self.assertTrue((total == expected).all())
+
+    def test_stages_run_lazily_once(self):
+        histogram = profiling.StageHistogram()
+        with profiling.profile(histogram):
+            results = evaluate(self.specs, self.parameters, ["Heating", "Cooling", "Hot water"])
+            self.assertTrue(histogram.summary().empty)
+            results["monthly"]
+            results["annual"]
+            results["total"]
+            results.category(ENERGY_USE_CATEGORIES.Cooling)
+        counts = histogram.summary()["count"]
+        self.assertEqual(counts["heating_cooling"], 1)
+        self.assertEqual(counts["hot_water"], 1)
+        self.assertNotIn("lighting", counts)
+
+    def test_matches_batch_pipeline(self):
+        results = evaluate(self.specs, self.parameters)
+        expected = batch_pipeline(self.specs, self.parameters)
+        assert_frame_equal(results["monthly"], expected)
+        totals = expected.groupby(level=0).sum().sum(axis=1)
+        self.assertEqual(results["total"].round(6).to_dict(), totals.round(6).to_dict())
+
+    def test_envelope(self):
+        histogram = profiling.StageHistogram()
+        with profiling.profile(histogram):
+            frame = evaluate(self.specs, self.parameters, outputs=["envelope"])["envelope"]
+        # No energy use stage runs for the envelope
+        self.assertEqual(list(histogram.summary().index), ["envelope"])
+        coefficients = envelope.get_envelope_batch(self.specs, self.parameters)
+        self.assertEqual(list(frame.index), list(self.specs.index))
+        self.assertEqual(frame["heat_loss"].tolist(), coefficients.heat_loss.tolist())
+        self.assertEqual(frame["solar_aperture_c"].tolist(), coefficients.solar_aperture[:, 2].tolist())
+        # Changing one building derives only its envelope again
+        before = envelope.get_envelope_cache_stats()
+        changed = what_if(evaluate(self.specs, self.parameters), {"uvalue_roof": 0.1}, self.specs.index[:1])
+        changed.results["envelope"]
+        self.assertEqual(envelope.get_envelope_cache_stats() - before, Counter(hits=19, misses=1))
+
+    def test_requests_are_checked(self):
+        results = evaluate(self.specs, self.parameters, ["Lighting"], ["total"])
+        with self.assertRaises(KeyError):
+            results["monthly"]
+        with self.assertRaises(KeyError):
+            results.category(ENERGY_USE_CATEGORIES.Heating)
+        with self.assertRaises(ValueError):
+            evaluate(self.specs, self.parameters, ["Lighting"], ["weekly"])
+        with self.assertRaises(ValueError):
+            evaluate(self.specs, self.parameters, ["Lifts"])
+
+
+class Fidelity(unittest.TestCase):
+    def test_tiers(self):
+        parameters = load_case(CASE)[1]
+        specs = generate_portfolio(20, seed=4)
+        hourly = batch_pipeline(specs, parameters)
+        # Every stage is monthly, so every tier gives the hourly results
+        for fidelity in FIDELITIES:
+            with self.subTest(fidelity=fidelity):
+                assert_frame_equal(batch_pipeline(specs, parameters, fidelity), hourly)
+        with self.assertRaises(ValueError):
+            batch_pipeline(specs, parameters, "screening")
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Import time allowed for openbes itself, on top of the pandas and numpy it always needs
+OWN_IMPORT_BUDGET_SECONDS = 0.3
+# Dependencies that are only needed once a climate file is read
+DEFERRED_MODULES = ["pvlib", "scipy"]
+
+
+def import_time(module: str) -> tuple[float, set[str]]:
+    """Import a module in a fresh interpreter with -X importtime.
+    Returns:
+        tuple[float, set[str]]: Cumulative import time in seconds, and the modules loaded afterwards.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {module}; print(*sys.modules)"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = None
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1]) / 1e6
+    return cumulative, set(result.stdout.split())
+
+
+class ImportTime(unittest.TestCase):
+    def test_package_is_lazy(self):
+        _, modules = import_time("src.openbes")
+        self.assertNotIn("pandas", modules)
+        self.assertNotIn("src.openbes.simulations", modules)
+
+    def test_hot_water_only(self):
+        _, modules = import_time("src.openbes.simulations.hot_water")
+        for name in ("src.openbes.simulations.lighting", "src.openbes.simulations.ventilation", *DEFERRED_MODULES):
+            self.assertNotIn(name, modules)
+
+    def test_budget(self):
+        baseline, _ = import_time("pandas")
+        seconds, modules = import_time("src.openbes.pipeline")
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
+        self.assertLess(seconds - baseline, OWN_IMPORT_BUDGET_SECONDS)
+
+    def test_lazy_attributes(self):
+        import src.openbes.simulations as simulations
+        self.assertIs(simulations.utils, sys.modules["src.openbes.simulations.utils"])
+        self.assertIn("hot_water", dir(simulations))
+        with self.assertRaises(AttributeError):
+            simulations.not_a_module
@@ -0,0 +1,258 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+
+import numpy as np
+from pandas import DataFrame, read_csv
+from pandas.testing import assert_frame_equal
+
+from src.openbes.cases import HOLYWELL_HOUSE
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import read_portfolio, specs_to_frame, frame_to_specs
+from src.openbes.simulations import lighting
+from src.openbes.simulations.climate import get_available_epw_files
+from src.openbes.portfolio.runner import run_portfolio
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.portfolio.writer import ResultWriter, ANNUAL_TOTAL
+from src.openbes.types import (
+    OpenBESParameters,
+    LIGHTING_TECHNOLOGIES,
+    LIGHTING_BALLASTS,
+    ENERGY_SOURCES,
+    ENERGY_USE_CATEGORIES,
+)
+from tests.test_holywell_house import DECIMAL_PLACES
+
+PORTFOLIO_CSV = """building_id,lighting_system_tech_z1,lighting_system_ballast_z1,lighting_system_lamp_number_z1,lighting_system_lamp_power_z1,lighting_system_luminary_number_z1,lighting_system_similar_zone_number_z1,lighting_system_operating_hours_z1,lighting_system_simultaneity_factor_z1,water_system_energy_source,holiday,building_group
+house-a,Tubular fluorescent T8,Electronic ballast,4,18,35,1,8,0.7,Electricity,Yes,north
+house-b,LED,,1,40,55,1,8,0.7,Natural gas,No,south
+house-c,FT_T5,,2,35,10,1,10,1.0,,,north
+house-d,Not a lamp,,,,,,,,,,south
+"""
+
+
+class PortfolioReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp.name, "portfolio.csv")
+        with open(self.csv, "w") as f:
+            f.write(PORTFOLIO_CSV)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_coercion(self):
+        batch = next(read_portfolio(self.csv))
+        self.assertEqual(list(batch.index), ["house-a", "house-b", "house-c", "house-d"])
+        self.assertEqual(batch.loc["house-a", "lighting_system_tech_z1"], LIGHTING_TECHNOLOGIES.FT_T8)
+        self.assertEqual(batch.loc["house-c", "lighting_system_tech_z1"], LIGHTING_TECHNOLOGIES.FT_T5)
+        self.assertEqual(batch.loc["house-a", "lighting_system_ballast_z1"], LIGHTING_BALLASTS.BE)
+        self.assertIsNone(batch.loc["house-b", "lighting_system_ballast_z1"])
+        self.assertEqual(batch.loc["house-b", "water_system_energy_source"], ENERGY_SOURCES.Natural_gas)
+        self.assertEqual(batch.loc["house-d", "lighting_system_tech_z1"], "Not a lamp")
+        self.assertEqual(list(batch["holiday"].iloc[:2]), [1.0, 0.0])
+        self.assertEqual(batch["lighting_system_lamp_power_z1"].dtype, np.float64)
+        self.assertTrue(np.isnan(batch.loc["house-a", "water_demand"]))
+        self.assertEqual(batch.loc["house-b", "building_group"], "south")
+
+    def test_chunks(self):
+        chunks = list(read_portfolio(self.csv, chunk_size=3, id_column="no_such_column"))
+        self.assertEqual([len(c) for c in chunks], [3, 1])
+        self.assertEqual(list(chunks[1].index), [3])
+
+    def test_parquet(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        parquet = os.path.join(self.tmp.name, "portfolio.parquet")
+        next(read_portfolio(self.csv)).reset_index()[["building_id", "lighting_system_lamp_power_z1"]].to_parquet(
+            parquet
+        )
+        chunks = list(read_portfolio(parquet, chunk_size=2))
+        self.assertEqual([len(c) for c in chunks], [2, 2])
+        self.assertEqual(chunks[1].loc["house-c", "lighting_system_lamp_power_z1"], 35.0)
+
+    def test_round_trip(self):
+        spec = next(frame_to_specs(specs_to_frame([HOLYWELL_HOUSE])))
+        self.assertEqual(spec, HOLYWELL_HOUSE)
+
+
+class BatchPipeline(unittest.TestCase):
+    def test_holywell_house(self):
+        result = batch_pipeline(specs_to_frame([HOLYWELL_HOUSE], index=["holywell"]), OpenBESParameters())
+        expected = DataFrame(
+            {"kWh/yr": [13632.0, 27854.4, 7140.0, 3954.28, 387.0, 0.0, 0.0]},
+            index=ENERGY_USE_CATEGORIES.list()
+        ).round(DECIMAL_PLACES)
+        calculated = result.loc["holywell"].sum(axis=1).to_frame(name="kWh/yr").round(DECIMAL_PLACES)
+        self.assertTrue(expected.equals(calculated), expected.compare(calculated))
+
+    def test_text_enums(self):
+        # Dataclasses built by hand may hold enum values as text, as read from a file
+        text = replace(
+            HOLYWELL_HOUSE,
+            lighting_system_tech_z1="FT_T8",
+            lighting_system_ballast_z1="Electronic ballast",
+            lighting_system_tech_z2="LED",
+            water_system_energy_source="Electricity",
+            ventilation_system1_energy_source="Electricity",
+        )
+        batch = specs_to_frame([text])
+        self.assertEqual(batch.loc[0, "lighting_system_tech_z2"], LIGHTING_TECHNOLOGIES.LED)
+        self.assertEqual(batch.loc[0, "water_system_energy_source"], ENERGY_SOURCES.Electricity)
+        assert_frame_equal(
+            batch_pipeline(batch, OpenBESParameters()), batch_pipeline(specs_to_frame([HOLYWELL_HOUSE]), OpenBESParameters())
+        )
+
+    def test_matches_single_building_engines(self):
+        from src.openbes.simulations import lighting, hot_water, ventilation
+        portfolio = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+        with portfolio:
+            portfolio.write(PORTFOLIO_CSV)
+        try:
+            batch = next(read_portfolio(portfolio.name))
+        finally:
+            os.remove(portfolio.name)
+        result = batch_pipeline(batch, OpenBESParameters())
+        for building_id, spec in zip(batch.index, frame_to_specs(batch)):
+            with self.subTest(building=building_id):
+                np.testing.assert_allclose(
+                    result.loc[(building_id, ENERGY_USE_CATEGORIES.Lighting.value)].to_numpy(),
+                    lighting.get_kwh_per_month(spec).to_numpy()[0],
+                )
+                water = hot_water.get_hot_water_per_month(spec).to_numpy()[0] \
+                    if spec.water_system_energy_source == ENERGY_SOURCES.Electricity else 0.0
+                np.testing.assert_allclose(
+                    result.loc[(building_id, ENERGY_USE_CATEGORIES.Hot_water.value)].to_numpy(),
+                    np.broadcast_to(water, 12),
+                )
+                self.assertEqual(result.loc[(building_id, ENERGY_USE_CATEGORIES.Ventilation.value)].sum(), 0.0)
+
+
+class SyntheticPortfolio(unittest.TestCase):
+    def test_seeded(self):
+        first = generate_portfolio(50, seed=3)
+        self.assertTrue(first.equals(generate_portfolio(50, seed=3)))
+        self.assertFalse(first.equals(generate_portfolio(50, seed=4)))
+        self.assertEqual(first.index[0], "synthetic-000000")
+
+    def test_valid_inputs(self):
+        portfolio = generate_portfolio(200, seed=0)
+        # Every populated lighting zone matches a lamp table or a directly powered technology
+        for zone in range(1, 4):
+            used = portfolio[f"lighting_system_tech_z{zone}"].notna()
+            w = lighting.get_w_per_luminaire_batch(portfolio, zone)
+            self.assertTrue((w[used] > 0).all(), f"zone {zone}")
+        self.assertTrue(set(portfolio["meteorological_file"]) <= set(get_available_epw_files()))
+        self.assertTrue((portfolio["water_reference_temperature"] > portfolio["water_supply_temperature"]).all())
+
+        results = batch_pipeline(portfolio.iloc[:20], OpenBESParameters())
+        annual = results.sum(axis=1).groupby(level="category").sum()
+        simulated = annual.drop([ENERGY_USE_CATEGORIES.Heating.value, ENERGY_USE_CATEGORIES.Cooling.value])
+        self.assertTrue((simulated > 0).all(), annual)
+
+
+class PortfolioRun(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp.name, "portfolio.csv")
+        with open(self.csv, "w") as f:
+            f.write(PORTFOLIO_CSV)
+        self.output = os.path.join(self.tmp.name, "output")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitioned_csv(self):
+        writer = ResultWriter(self.output, partition_by="building_group", max_pending=1)
+        summary = run_portfolio(read_portfolio(self.csv, chunk_size=3), OpenBESParameters(), writer)
+        self.assertEqual(summary.buildings, 4)
+        self.assertEqual(summary.batches, 2)
+        self.assertEqual(
+            sorted(os.listdir(self.output)),
+            ["_journal.jsonl", "building_group=north", "building_group=south"]
+        )
+        north = read_csv(os.path.join(self.output, "building_group=north", "part-00000.csv"))
+        self.assertEqual(sorted(set(north["building_id"])), ["house-a", "house-c"])
+        self.assertEqual(len(north), 2 * len(ENERGY_USE_CATEGORIES))
+        lighting = north.set_index(["building_id", "category"]).loc[("house-a", "Lighting")]
+        self.assertAlmostEqual(lighting[ANNUAL_TOTAL], 3998.4, places=DECIMAL_PLACES)
+
+    def test_parquet(self):
+        try:
+            import pyarrow.dataset
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        with ResultWriter(self.output, file_format="parquet", partition_by="building_group") as writer:
+            run_portfolio(read_portfolio(self.csv, chunk_size=1), OpenBESParameters(), writer)
+        table = pyarrow.dataset.dataset(self.output, partitioning="hive").to_table().to_pandas()
+        self.assertEqual(len(table), 4 * len(ENERGY_USE_CATEGORIES))
+        self.assertEqual(set(table["building_group"]), {"north", "south"})
+
+
+    def test_resume(self):
+        with ResultWriter(self.output) as writer:
+            run_portfolio(read_portfolio(self.csv, chunk_size=2), OpenBESParameters(), writer)
+        complete = read_csv(os.path.join(self.output, "part-00000.csv"))
+
+        # Simulate a crash after the first batch: drop the second journal record
+        # and leave a half-written row at the end of the output
+        journal = os.path.join(self.output, "_journal.jsonl")
+        with open(journal) as f:
+            first_record = f.readline()
+        with open(journal, "w") as f:
+            f.write(first_record + '{"batch": 1, "buil')
+        with open(os.path.join(self.output, "part-00000.csv"), "a") as f:
+            f.write("house-c,Lighting,1.0,2.")
+
+        with self.assertRaises(FileExistsError):
+            ResultWriter(self.output)
+        writer = ResultWriter(self.output, resume=True)
+        self.assertEqual(writer.completed, {"house-a", "house-b"})
+        summary = run_portfolio(read_portfolio(self.csv, chunk_size=2), OpenBESParameters(), writer)
+        self.assertEqual((summary.skipped, summary.buildings), (2, 2))
+        resumed = read_csv(os.path.join(self.output, "part-00000.csv"))
+        self.assertTrue(complete.equals(resumed), complete.compare(resumed))
+
+    def test_resume_parquet(self):
+        try:
+            import pyarrow.dataset
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        with ResultWriter(self.output, file_format="parquet") as writer:
+            run_portfolio(read_portfolio(self.csv, chunk_size=3), OpenBESParameters(), writer)
+        # A file left behind by a batch that never reached the journal
+        with open(os.path.join(self.output, "part-00002.parquet"), "wb") as f:
+            f.write(b"PAR1")
+        with ResultWriter(self.output, file_format="parquet", resume=True) as writer:
+            summary = run_portfolio(read_portfolio(self.csv, chunk_size=3), OpenBESParameters(), writer)
+        self.assertEqual(summary.buildings, 0)
+        table = pyarrow.dataset.dataset(self.output, format="parquet").to_table().to_pandas()
+        self.assertEqual(len(table), 4 * len(ENERGY_USE_CATEGORIES))
+
+
+    def test_process_pool(self):
+        with ResultWriter(self.output) as writer:
+            summary = run_portfolio(read_portfolio(self.csv), OpenBESParameters(), writer, jobs=2, chunk_size=1)
+        self.assertEqual((summary.buildings, summary.batches), (4, 4))
+        self.assertEqual(len(read_csv(os.path.join(self.output, "part-00000.csv"))), 4 * len(ENERGY_USE_CATEGORIES))
+
+    def test_memory_budget(self):
+        from src.openbes.portfolio.memory import get_rss_bytes, get_chunk_size, BYTES_PER_BUILDING
+        self.assertEqual(get_chunk_size(10 * BYTES_PER_BUILDING, chunks_in_flight=5), 2)
+        with ResultWriter(self.output) as writer:
+            summary = run_portfolio(
+                read_portfolio(self.csv), OpenBESParameters(), writer,
+                memory_budget=get_rss_bytes() + 8 * 7 * BYTES_PER_BUILDING, prefetch=2,
+            )
+        self.assertEqual(summary.buildings, 4)
+        self.assertLessEqual(summary.chunk_size, 8)
+        with ResultWriter(os.path.join(self.tmp.name, "too_small")) as writer:
+            with self.assertRaises(MemoryError):
+                run_portfolio(read_portfolio(self.csv), OpenBESParameters(), writer, memory_budget=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.openbes import profiling
+from src.openbes.cases import HOLYWELL_HOUSE
+from src.openbes.pipeline import pipeline, batch_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from src.openbes.types import OpenBESSpecification, OpenBESParameters
+
+
+class ProfilingHooks(unittest.TestCase):
+    def test_disabled(self):
+        self.assertIs(profiling.stage("lighting"), profiling.stage("hot_water"))
+        with profiling.stage("lighting"):
+            pass
+
+    def test_events(self):
+        events = []
+        with profiling.profile(events.append):
+            with profiling.stage("outer", buildings=2):
+                with profiling.stage("inner"):
+                    sum(range(1000))
+        self.assertEqual(
+            [(e.name, e.phase) for e in events],
+            [("outer", "start"), ("inner", "start"), ("inner", "end"), ("outer", "end")],
+        )
+        outer, inner = events[3], events[2]
+        self.assertEqual(outer.metadata, {"buildings": 2})
+        self.assertGreaterEqual(outer.wall_seconds, inner.wall_seconds)
+        self.assertIsNone(outer.memory_peak_bytes)
+        # Hooks are removed when the block ends
+        self.assertIs(profiling.stage("outer"), profiling.stage("inner"))
+
+    def test_memory(self):
+        events = []
+        with profiling.profile(events.append, trace_memory=True):
+            with profiling.stage("outer"):
+                with profiling.stage("inner"):
+                    data = np.ones(1_000_000)
+                    del data
+        inner, outer = [e for e in events if e.phase == profiling.END]
+        self.assertGreaterEqual(inner.memory_peak_bytes, 8_000_000)
+        self.assertGreaterEqual(outer.memory_peak_bytes, inner.memory_peak_bytes)
+
+    def test_pipeline_stages(self):
+        histogram = profiling.StageHistogram()
+        recorder = profiling.ChromeTraceRecorder()
+        with profiling.profile(histogram, recorder):
+            pipeline(OpenBESSpecification(), OpenBESParameters())
+            for _ in range(3):
+                batch_pipeline(specs_to_frame([HOLYWELL_HOUSE] * 5), OpenBESParameters())
+        summary = histogram.summary()
+        self.assertEqual(summary.loc["concat", "count"], 1)
+        self.assertEqual(summary.loc["heating_cooling", "count"], 3)
+        self.assertEqual(summary.loc["lighting", "count"], 4)
+        self.assertEqual(histogram.histogram("lighting")["count"].sum(), 4)
+        self.assertIn("aggregation", histogram.format())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            recorder.export(path)
+            with open(path) as f:
+                trace = json.load(f)
+        events = trace["traceEvents"]
+        self.assertEqual(len(events), summary["count"].sum())
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertEqual([e["ts"] for e in events], sorted(e["ts"] for e in events))
+        self.assertEqual(events[-1]["args"]["buildings"], 5)
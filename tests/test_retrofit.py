@@ -0,0 +1,95 @@
+import itertools
+import unittest
+from dataclasses import replace
+
+import numpy as np
+
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import frame_to_specs, specs_to_frame
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.retrofit import KEEP, Measure, RetrofitOption, apply_plan, lamp_measure, optimize_retrofit
+from src.openbes.types import LIGHTING_BALLASTS, LIGHTING_TECHNOLOGIES, OpenBESParameters
+from .test_shared_climates import CLIMATE
+
+LAMPS = {LIGHTING_TECHNOLOGIES.LED: (18, 40), LIGHTING_TECHNOLOGIES.FT_T5: (28, 25)}
+
+
+class RetrofitSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = OpenBESParameters()
+        spec = next(frame_to_specs(generate_portfolio(1, seed=3, climates=[CLIMATE])))
+        for zone in (1, 2):
+            spec = replace(spec, **{
+                f"lighting_system_tech_z{zone}": LIGHTING_TECHNOLOGIES.FT_T8,
+                f"lighting_system_ballast_z{zone}": LIGHTING_BALLASTS.BF,
+                f"lighting_system_lamp_power_z{zone}": 36.0,
+                f"lighting_system_lamp_number_z{zone}": 2.0,
+                f"lighting_system_luminary_number_z{zone}": 30.0 * zone,
+                f"lighting_system_similar_zone_number_z{zone}": 1.0,
+                f"lighting_system_operating_hours_z{zone}": 10.0,
+                f"lighting_system_simultaneity_factor_z{zone}": 0.8,
+            })
+        cls.spec = spec
+        cls.measures = [
+            lamp_measure(spec, 1, LAMPS),
+            lamp_measure(spec, 2, LAMPS),
+            Measure("ventilation", [RetrofitOption("short", {"ventilation_system1_off_time": 14}, 300)]),
+            Measure("water_heater", [
+                RetrofitOption("condensing", {"water_system_efficiency_cop": 1.05}, 4000),
+                RetrofitOption("heat_pump", {"water_system_efficiency_cop": 3.0}, 7000),
+            ]),
+            Measure("water_saving", [RetrofitOption("low_flow", {"water_demand": 1000.0}, 6000)]),
+        ]
+
+    def brute_force(self, budget: float) -> list[tuple[float, float]]:
+        # Every combination of options through the whole pipeline, then the Pareto front of them
+        plans = list(itertools.product(*([KEEP] + [o.name for o in m.options] for m in self.measures)))
+        specs = [apply_plan(self.spec, self.measures, dict(zip([m.name for m in self.measures], p))) for p in plans]
+        kwh = batch_pipeline(specs_to_frame(specs), self.parameters).groupby(level=0, sort=False).sum().sum(axis=1)
+        costs = [
+            sum(next((o.cost for o in m.options if o.name == name), 0.0) for m, name in zip(self.measures, p))
+            for p in plans
+        ]
+        front, lowest = [], np.inf
+        for cost, total in sorted(zip(costs, kwh.to_numpy())):
+            if cost <= budget and total < lowest - 1e-6:
+                front.append((cost, total))
+                lowest = total
+        return front
+
+    def test_matches_brute_force(self):
+        for budget in (np.inf, 8000):
+            with self.subTest(budget=budget):
+                plans = optimize_retrofit(self.spec, self.parameters, self.measures, budget)
+                expected = self.brute_force(budget)
+                np.testing.assert_allclose(plans.front[["cost", "kWh/yr"]].to_numpy(), expected, rtol=1e-9)
+                self.assertLessEqual(plans.best["cost"], budget)
+                self.assertEqual(plans.combinations, 3 * 3 * 2 * 3 * 2)
+                # Each lighting zone, ventilation and the hot water measures together
+                self.assertEqual(plans.evaluations, 1 + 3 + 3 + 2 + 3 * 2)
+
+    def test_best_plan(self):
+        plans = optimize_retrofit(self.spec, self.parameters, self.measures)
+        retrofitted = apply_plan(self.spec, self.measures, plans.best.to_dict())
+        kwh = batch_pipeline(specs_to_frame([retrofitted]), self.parameters).to_numpy().sum()
+        self.assertAlmostEqual(kwh, plans.best["kWh/yr"], places=6)
+        self.assertEqual(plans.front.iloc[0]["cost"], 0)
+        self.assertAlmostEqual(plans.front.iloc[0]["kWh/yr"], plans.baseline_kwh)
+
+    def test_unread_fields(self):
+        # Heating and cooling are not simulated, so nothing reads the U-values
+        roof = Measure("roof", [RetrofitOption("insulation", {"uvalue_roof": 0.2}, 9000)])
+        plans = optimize_retrofit(self.spec, self.parameters, [*self.measures, roof])
+        expected = optimize_retrofit(self.spec, self.parameters, self.measures)
+        self.assertEqual(plans.evaluations, expected.evaluations)
+        self.assertEqual(set(plans.front["roof"]), {KEEP})
+        np.testing.assert_array_equal(plans.front["kWh/yr"], expected.front["kWh/yr"])
+
+    def test_checks(self):
+        with self.assertRaises(ValueError):
+            lamp_measure(self.spec, 1, {LIGHTING_TECHNOLOGIES.FT_T8: (37, 10)})
+        with self.assertRaises(ValueError):
+            lamp_measure(self.spec, 6, LAMPS)
+        with self.assertRaises(ValueError):
+            optimize_retrofit(self.spec, self.parameters, [Measure("paint", [RetrofitOption("red", {"colour": 1}, 1)])])
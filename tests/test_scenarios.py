@@ -0,0 +1,61 @@
+import unittest
+from dataclasses import replace
+from unittest import mock
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+from src.openbes import pipeline
+from src.openbes.cases import load_case
+from src.openbes.pipeline import batch_pipeline, scenario_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from src.openbes.types import ENERGY_USE_CATEGORIES, MONTHS
+from .test_service import CASE
+
+OXFORD_CLIMATES = [
+    "UK_Oxford_GBR_ENG_RAF.Benson.036580_TMYx.2007-2021",
+    "UK_Oxford_Prometheus_a1b_50_percentile_TRY_2050",
+    "UK_Oxford_COLBE_50th_4550210_TRY_2080s",
+]
+
+
+def _climate_heating(specs, *_):
+    # A stand-in for a stage that reads the climate file: heating grows with the length of its name
+    heating = np.repeat(specs["meteorological_file"].str.len().to_numpy(dtype=float)[:, None], len(MONTHS), axis=1)
+    return {ENERGY_USE_CATEGORIES.Cooling: np.zeros_like(heating), ENERGY_USE_CATEGORIES.Heating: heating}
+
+
+class ScenarioPipeline(unittest.TestCase):
+    def setUp(self):
+        spec, self.parameters = load_case(CASE)
+        self.spec = spec
+        self.specs = specs_to_frame([spec, replace(spec, water_demand=120.0)], ["a", "b"])
+
+    def assertMatchesBatchPipeline(self, results):
+        self.assertEqual(list(results.index.get_level_values(0).unique()), OXFORD_CLIMATES)
+        for climate in OXFORD_CLIMATES:
+            expected = batch_pipeline(self.specs.assign(meteorological_file=climate), self.parameters)
+            assert_frame_equal(results.loc[climate], expected)
+
+    def test_matches_batch_pipeline(self):
+        self.assertMatchesBatchPipeline(scenario_pipeline(self.specs, self.parameters, OXFORD_CLIMATES))
+
+    @mock.patch.object(pipeline, "CLIMATE_STAGES", frozenset({"heating_cooling"}))
+    def test_climate_stages(self):
+        lighting = mock.Mock(side_effect=pipeline._STAGES["lighting"])
+        with mock.patch.dict(pipeline._STAGES, {"heating_cooling": _climate_heating, "lighting": lighting}):
+            results = scenario_pipeline(self.specs, self.parameters, OXFORD_CLIMATES)
+            # Climate-independent stages run once for every climate
+            self.assertEqual(lighting.call_count, 1)
+            self.assertMatchesBatchPipeline(results)
+        heating = results.xs("Heating", level="category").groupby(level=0).sum().sum(axis=1)
+        self.assertEqual(len(set(heating)), len(OXFORD_CLIMATES))
+
+    def test_single_spec(self):
+        results = scenario_pipeline(self.spec, self.parameters, OXFORD_CLIMATES[:1])
+        expected = batch_pipeline(specs_to_frame([self.spec]), self.parameters)
+        assert_frame_equal(results.loc[OXFORD_CLIMATES[0]], expected)
+
+    def test_no_climates(self):
+        with self.assertRaises(ValueError):
+            scenario_pipeline(self.specs, self.parameters, [])
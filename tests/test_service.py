@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from src.openbes import service
+from src.openbes.cases import load_case, read_case
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import specs_to_frame
+from .test_cli import CASES_DIR
+
+CASE = os.path.join(CASES_DIR, "600.toml")
+
+
+def case_spec() -> dict:
+    return read_case(CASE)[0]
+
+
+class Service(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = load_case(CASE)[1]
+        cls.service = service.SimulationService(cls.parameters, climates=["725650_Denver"])
+        cls.server = service.make_server(cls.service, port=0)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def request(self, path: str, body: dict = None) -> dict:
+        data = None if body is None else json.dumps(body).encode()
+        with urllib.request.urlopen(urllib.request.Request(self.url + path, data=data)) as response:
+            return json.loads(response.read())
+
+    def test_simulate(self):
+        response = self.request("/simulate", {"spec": case_spec()})
+        expected = batch_pipeline(specs_to_frame([load_case(CASE)[0]]), self.parameters).droplevel(0)
+        for category, months in expected.iterrows():
+            self.assertEqual(response["results"][category], months.to_dict())
+        self.assertEqual(set(response["results"]), set(expected.index))
+
+    def test_bad_requests(self):
+        for path, body, status in (
+                ("/simulate", {"building": {}}, 400),
+                ("/simulate", {"spec": [1, 2]}, 400),
+                ("/simulate", {"spec": dict(case_spec(), meteorological_file="Atlantis")}, 400),
+                ("/nowhere", None, 404),
+        ):
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                self.request(path, body)
+            self.assertEqual(e.exception.code, status)
+
+    def test_coalescing(self):
+        spec = dict(case_spec(), appliances_load=7.5)
+        simulate = service.simulate
+
+        def slow_simulate(*args):
+            time.sleep(0.2)
+            return simulate(*args)
+
+        before = self.service.metrics()
+        with mock.patch.object(service, "simulate", slow_simulate):
+            threads = [threading.Thread(target=self.service.simulate, args=(spec,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.service.simulate(spec)
+        after = self.service.metrics()
+        self.assertEqual(after["simulated"] - before["simulated"], 1)
+        self.assertEqual(after["coalesced"] - before["coalesced"], 3)
+        self.assertEqual(after["cache_hits"] - before["cache_hits"], 1)
+
+    def test_metrics(self):
+        self.request("/simulate", {"spec": case_spec(), "parameters": {"density_of_air": 1.25}})
+        metrics = self.request("/metrics")
+        self.assertGreaterEqual(metrics["requests"], 1)
+        self.assertLessEqual(metrics["latency_ms"]["p50"], metrics["latency_ms"]["p99"])
+        self.assertEqual(self.request("/health"), {"status": "ok"})
+
+
+class WorkerPool(unittest.TestCase):
+    def test_process_workers(self):
+        pool = service.SimulationService(jobs=1, climates=["725650_Denver"], result_cache_size=0)
+        try:
+            first = pool.simulate(case_spec())
+            self.assertEqual(pool.simulate(case_spec()), first)
+            self.assertEqual(pool.metrics()["simulated"], 2)
+            # No stage reads a climate file, so none is shared with the workers
+            self.assertIsNone(pool._shared_climates)
+        finally:
+            pool.close()
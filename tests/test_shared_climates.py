@@ -0,0 +1,99 @@
+import multiprocessing
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from unittest import mock
+
+import numpy as np
+
+from src.openbes.portfolio import runner
+from src.openbes.portfolio.runner import run_portfolio
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.portfolio.writer import ResultWriter
+from src.openbes.simulations import climate
+from src.openbes.types import OpenBESParameters
+
+CLIMATE = "725650_Denver"
+
+
+def _load_without_epw(segments: dict, name: str) -> tuple[float, int]:
+    def no_epw(file_path):
+        raise AssertionError(f"parsed {file_path}")
+
+    climate.read_epw_array = no_epw
+    climate.use_shared_climates(segments)
+    array = climate.load_climate(name)
+    return float(array.sum()), climate.get_climate_cache_stats()["misses"]
+
+
+class SharedClimates(unittest.TestCase):
+    def test_worker_uses_shared_array(self):
+        with climate.SharedClimates() as shared:
+            segments = shared.share([CLIMATE, "Atlantis"])
+            self.assertEqual(list(segments), [CLIMATE])
+            # A fresh interpreter, so nothing is inherited from this process's climate cache
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                total, parsed = executor.submit(_load_without_epw, segments, CLIMATE).result()
+        self.assertEqual(total, float(climate.load_climate(CLIMATE).sum()))
+        self.assertEqual(parsed, 0)
+        with self.assertRaises(FileNotFoundError):
+            SharedMemory(name=segments[CLIMATE][0])
+
+
+# As if a stage read the climate files
+@mock.patch.object(runner, "CLIMATE_STAGES", frozenset({"heating_cooling"}))
+class PortfolioSharing(unittest.TestCase):
+    def run_recording_segments(self, writer: ResultWriter, segments: list):
+        share = climate.SharedClimates.share
+
+        def recording_share(self, names):
+            shared = share(self, names)
+            segments.extend(segment for segment, _ in shared.values())
+            return shared
+
+        specs = generate_portfolio(40, seed=5)
+        specs["meteorological_file"] = np.where(np.arange(len(specs)) % 2, CLIMATE, None)
+        with mock.patch.object(climate.SharedClimates, "share", recording_share):
+            return run_portfolio([specs], OpenBESParameters(), writer, jobs=2, chunk_size=10)
+
+    def assertRemoved(self, segments: list) -> None:
+        self.assertTrue(segments)
+        for segment in set(segments):
+            with self.assertRaises(FileNotFoundError):
+                SharedMemory(name=segment)
+
+    def test_run(self):
+        segments = []
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = self.run_recording_segments(ResultWriter(output_dir), segments)
+        self.assertEqual(summary.buildings, 40)
+        # One segment per climate file, reused by every chunk
+        self.assertEqual(len(set(segments)), 1)
+        self.assertEqual(len(segments), summary.batches)
+        self.assertRemoved(segments)
+        # Each chunk counts its one file once, plus this process's load if it was not already in memory
+        self.assertLessEqual(summary.cache_misses, 1)
+        self.assertIn(summary.cache_hits + summary.cache_misses, (summary.batches, summary.batches + 1))
+
+    def test_cleanup_on_error(self):
+        segments = []
+        with tempfile.TemporaryDirectory() as output_dir:
+            writer = ResultWriter(output_dir)
+            with mock.patch.object(writer, "write", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    self.run_recording_segments(writer, segments)
+        self.assertRemoved(segments)
+
+    def test_no_climate_stages(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            with mock.patch.object(runner, "CLIMATE_STAGES", frozenset()):
+                with mock.patch.object(climate.SharedClimates, "share") as share:
+                    specs = generate_portfolio(20, seed=5)
+                    specs["meteorological_file"] = CLIMATE
+                    writer = ResultWriter(output_dir)
+                    summary = run_portfolio([specs], OpenBESParameters(), writer, jobs=2, chunk_size=10)
+        share.assert_not_called()
+        self.assertEqual(summary.buildings, 20)
+        self.assertIsNone(summary.cache_hit_rate)
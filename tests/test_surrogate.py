@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+from src.openbes import pipeline, surrogate as surrogate_module
+from src.openbes.pipeline import batch_pipeline
+from src.openbes.portfolio.reader import frame_to_specs
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.surrogate import Surrogate, build_surrogate, main, sample_design_space
+from src.openbes.types import OpenBESParameters
+from .test_scenarios import OXFORD_CLIMATES, _climate_heating
+from .test_service import CASE
+from .test_shared_climates import CLIMATE
+
+RANGES = {
+    "water_demand": (100.0, 500.0),
+    "water_reference_temperature": (50.0, 65.0),
+    "lighting_system_tech_z1": ["LED", "HAL"],
+    "lighting_system_operating_hours_z1": (4.0, 12.0),
+}
+
+
+class SurrogateModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = OpenBESParameters()
+        cls.template = next(frame_to_specs(generate_portfolio(1, seed=3, climates=[CLIMATE])))
+        cls.surrogate = build_surrogate(cls.template, cls.parameters, RANGES, samples=400)
+
+    def test_held_out_error(self):
+        errors = self.surrogate.errors.loc[CLIMATE]
+        self.assertEqual(list(errors.index), self.surrogate.categories)
+        # Lighting and hot water are polynomials of the varied fields, so the fit is exact
+        self.assertLess(errors.loc["Lighting", "annual_cv_rmse_percent"], 1e-6)
+        self.assertLess(errors.loc["Hot water", "annual_cv_rmse_percent"], 1e-6)
+        # Categories that do not vary have nothing to explain
+        self.assertTrue(np.isnan(errors.loc["Others", "r2"]))
+
+    def test_predict(self):
+        specs = sample_design_space(self.template, RANGES, 50, seed=1)
+        predicted = self.surrogate.predict(specs)
+        expected = batch_pipeline(specs, self.parameters)
+        self.assertEqual(list(predicted.index), list(expected.index))
+        lighting = predicted.xs("Lighting", level="category").to_numpy()
+        np.testing.assert_allclose(lighting, expected.xs("Lighting", level="category").to_numpy(), atol=1e-6)
+        hot_water = predicted.xs("Hot water", level="category").to_numpy()
+        np.testing.assert_allclose(hot_water, expected.xs("Hot water", level="category").to_numpy(), atol=1e-6)
+
+        first = {field: specs[field].iloc[0] for field in RANGES}
+        first["lighting_system_tech_z1"] = first["lighting_system_tech_z1"].name
+        np.testing.assert_allclose(
+            self.surrogate.estimate(first)[0], predicted.loc[specs.index[0]].to_numpy(), rtol=1e-9, atol=1e-9
+        )
+
+    def test_save_and_load(self):
+        values = {field: [5.0, 1.0] if isinstance(r, tuple) else r for field, r in RANGES.items()}
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "surrogate.npz")
+            self.surrogate.save(file_path)
+            loaded = Surrogate.load(file_path)
+        self.assertEqual(loaded.features, self.surrogate.features)
+        np.testing.assert_array_equal(loaded.estimate(values), self.surrogate.estimate(values))
+        assert_frame_equal(loaded.errors, self.surrogate.errors)
+
+    def test_checks(self):
+        specs = sample_design_space(self.template, RANGES, 2)
+        specs["meteorological_file"] = "Atlantis"
+        with self.assertRaises(ValueError):
+            self.surrogate.predict(specs)
+        with self.assertRaises(ValueError):
+            self.surrogate.estimate({"water_demand": 200.0})
+        with self.assertRaises(ValueError):
+            sample_design_space(self.template, {"water_demand": [1.0, 2.0, "x"], "lighting_system_tech_z1": (1, 2)}, 2)
+        with self.assertRaises(ValueError):
+            sample_design_space(self.template, {"window_colour": (0, 1)}, 2)
+
+    def test_climates_share_fit(self):
+        lighting = mock.Mock(side_effect=pipeline._STAGES["lighting"])
+        with mock.patch.dict(pipeline._STAGES, {"lighting": lighting}):
+            surrogate = build_surrogate(self.template, self.parameters, RANGES, OXFORD_CLIMATES, samples=100)
+        # No stage reads the climate file, so the samples are simulated and fitted once for every climate
+        self.assertEqual(lighting.call_count, 1)
+        np.testing.assert_array_equal(surrogate.coefficients[0], surrogate.coefficients[2])
+
+    @mock.patch.object(surrogate_module, "CLIMATE_STAGES", frozenset({"heating_cooling"}))
+    @mock.patch.object(pipeline, "CLIMATE_STAGES", frozenset({"heating_cooling"}))
+    @mock.patch.dict(pipeline._STAGES, {"heating_cooling": _climate_heating})
+    def test_climate_stage_fit(self):
+        surrogate = build_surrogate(self.template, self.parameters, RANGES, OXFORD_CLIMATES, samples=100)
+        heating = surrogate.categories.index("Heating")
+        self.assertFalse(np.array_equal(surrogate.coefficients[0, heating], surrogate.coefficients[2, heating]))
+        lighting = surrogate.categories.index("Lighting")
+        np.testing.assert_array_equal(surrogate.coefficients[0, lighting], surrogate.coefficients[2, lighting])
+
+class SurrogateCli(unittest.TestCase):
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "surrogate.npz")
+            code = main([CASE, "--vary", "water_demand=100:500", "--samples", "50", "--output", file_path])
+            self.assertEqual(code, 0)
+            self.assertEqual(Surrogate.load(file_path).features, ["water_demand"])
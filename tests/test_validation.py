@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+
+from src.openbes.cases import HOLYWELL_HOUSE
+from src.openbes.diagnostics import collecting, MISSING, UNMATCHED, INCONSISTENT, INVALID
+from src.openbes.portfolio.reader import read_portfolio, specs_to_frame
+from src.openbes.portfolio.runner import run_portfolio
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.portfolio.writer import ResultWriter
+from src.openbes.types import OpenBESParameters
+from src.openbes.pipeline import STAGE_FIELDS
+from src.openbes.validation import validate_batch, compile_rules, Rule, AVAILABLE, REQUIRED, RULES
+from .test_portfolio import PORTFOLIO_CSV
+
+
+class ValidateBatch(unittest.TestCase):
+    def errors(self, **changes) -> set:
+        specs = specs_to_frame([replace(HOLYWELL_HOUSE, **changes)])
+        result = validate_batch(specs)
+        return {(e.category, e.field, e.code) for e in result.errors.itertuples()}
+
+    def test_valid(self):
+        self.assertEqual(self.errors(), set())
+        result = validate_batch(generate_portfolio(200, seed=3))
+        self.assertTrue(result.valid.all())
+        self.assertTrue(result.errors.empty)
+
+    def test_rules(self):
+        self.assertEqual(self.errors(water_demand=None), {("hot_water", "water_demand", MISSING)})
+        self.assertEqual(
+            self.errors(lighting_system_lamp_power_z1=999),
+            {("lighting", "lighting_system_lamp_power_z1", UNMATCHED)},
+        )
+        # Direct power technologies need no lamp table entry
+        self.assertEqual(self.errors(lighting_system_lamp_power_z2=999), set())
+        self.assertEqual(
+            self.errors(ventilation_system1_on_time=15),
+            {("ventilation", "ventilation_system1_off_time", INCONSISTENT)},
+        )
+        # Times are only required for ventilation that uses power
+        self.assertEqual(self.errors(
+            ventilation_system1_rated_input_power=0, ventilation_system1_on_time=None, ventilation_system1_off_time=None
+        ), set())
+        # No stage reads the climate, the geometry or the heating system yet
+        self.assertEqual(self.errors(meteorological_file="UK_Oxford_nonexistent", heating_system1_on_time=20), set())
+
+    def test_rules_check_simulated_fields(self):
+        simulated = set().union(*STAGE_FIELDS.values())
+        for rule in RULES:
+            self.assertLessEqual({*rule.fields, rule.when} - {None}, simulated, rule)
+
+    def test_bulk_rejection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv = os.path.join(tmp, "portfolio.csv")
+            with open(csv, "w") as f:
+                f.write(PORTFOLIO_CSV)
+            specs = next(read_portfolio(csv))
+        result = validate_batch(specs)
+        self.assertEqual(list(result.valid), [False, False, True, False])
+        self.assertEqual(list(result.accepted(specs).index), ["house-c"])
+        self.assertEqual(result.rejected, 3)
+        self.assertIn("lighting_system_tech_z1 invalid", result.reasons()["house-d"])
+        with collecting() as collector:
+            result.report()
+        self.assertEqual(collector.counts[("hot_water", "water_demand", MISSING)], 2)
+        self.assertEqual(collector.counts[("lighting", "lighting_system_tech_z1", INVALID)], 1)
+
+    def test_custom_rules(self):
+        rules = compile_rules([Rule("building", REQUIRED, ("building_height",))])
+        result = validate_batch(specs_to_frame([HOLYWELL_HOUSE]), rules)
+        self.assertEqual(list(result.errors["field"]), ["building_height"])
+        rules = compile_rules([Rule("climate", AVAILABLE, ("meteorological_file",))])
+        specs = specs_to_frame([
+            replace(HOLYWELL_HOUSE, meteorological_file=name) for name in ("725650_Denver", "Atlantis")
+        ])
+        self.assertEqual(list(validate_batch(specs, rules).valid), [True, False])
+
+
+class PortfolioValidation(unittest.TestCase):
+    def test_run(self):
+        specs = specs_to_frame([HOLYWELL_HOUSE, replace(HOLYWELL_HOUSE, water_demand=None)], ["ok", "bad"])
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = run_portfolio([specs], OpenBESParameters(), ResultWriter(output_dir), validate=True)
+        self.assertEqual((summary.buildings, summary.rejected), (1, 1))
+        self.assertEqual(summary.diagnostics.examples[("hot_water", "water_demand", MISSING)], ["bad"])
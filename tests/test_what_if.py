@@ -0,0 +1,86 @@
+import unittest
+from enum import Enum
+from unittest import mock
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+from src.openbes.cases import load_case
+from src.openbes.pipeline import CATEGORY_STAGES, STAGE_FIELDS, batch_pipeline, evaluate, what_if
+from src.openbes.portfolio.synthetic import generate_portfolio
+from src.openbes.simulations import lighting
+from src.openbes.types import ENERGY_USE_CATEGORIES, LIGHTING_TECHNOLOGIES
+from src.openbes.types.coercion import SPECIFICATION_FIELD_TYPES
+from .test_service import CASE
+
+
+def perturb(specs, fields):
+    # A different value in every given field of every building
+    specs = specs.copy()
+    for field in fields:
+        field_type = SPECIFICATION_FIELD_TYPES[field]
+        if issubclass(field_type, Enum):
+            members = list(field_type)
+            specs[field] = [members[(members.index(v) + 1) % len(members)] if v in members else members[0]
+                            for v in specs[field]]
+        elif field_type is str:
+            specs[field] = "changed"
+        else:
+            specs[field] = specs[field].fillna(0.0) * 1.5 + 1.0
+    return specs
+
+
+class WhatIf(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.parameters = load_case(CASE)[1]
+        cls.specs = generate_portfolio(20, seed=4)
+        cls.specs["lighting_system_tech_z1"] = LIGHTING_TECHNOLOGIES.FT_T8
+
+    def assertDelta(self, result, before, after):
+        delta = batch_pipeline(after, self.parameters) - batch_pipeline(before, self.parameters)
+        np.testing.assert_allclose(result.delta.to_numpy(), delta.to_numpy(), atol=1e-6)
+
+    def test_lighting_zone(self):
+        baseline = evaluate(self.specs, self.parameters)
+        baseline["monthly"]
+        zone_batch = mock.Mock(wraps=lighting.get_kwh_per_day_for_zone_batch)
+        with mock.patch.object(lighting, "get_kwh_per_day_for_zone_batch", zone_batch):
+            result = what_if(baseline, {"lighting_system_tech_z1": "LED"})
+        self.assertEqual(result.stages, ["lighting"])
+        self.assertEqual({c.args[1] for c in zone_batch.call_args_list}, {1})
+        self.assertEqual(result.results.specs["lighting_system_tech_z1"].iloc[0], LIGHTING_TECHNOLOGIES.LED)
+        self.assertDelta(result, self.specs, result.results.specs)
+        self.assertTrue(result.delta.xs("Lighting", level="category").to_numpy().any())
+        self.assertTrue((result.delta.drop("Lighting", level="category").to_numpy() == 0).all())
+
+    def test_chained_changes(self):
+        baseline = evaluate(self.specs, self.parameters)
+        first = what_if(baseline, {"ventilation_system1_off_time": 14, "water_demand": 50})
+        self.assertEqual(first.stages, ["hot_water", "ventilation"])
+        self.assertDelta(first, self.specs, first.results.specs)
+        changed = list(self.specs.index[:3])
+        second = what_if(first.results, {"water_demand": 80}, buildings=changed)
+        self.assertDelta(second, first.results.specs, second.results.specs)
+        self.assertTrue((second.delta.drop(changed, level=0).to_numpy() == 0).all())
+        assert_frame_equal(second.results["monthly"], batch_pipeline(second.results.specs, self.parameters))
+
+    def test_unread_fields(self):
+        # Each stage's results only depend on the fields it lists in STAGE_FIELDS
+        expected = batch_pipeline(self.specs, self.parameters)
+        for name, fields in STAGE_FIELDS.items():
+            categories = [c.value for c, stage_name in CATEGORY_STAGES.items() if stage_name == name]
+            other_fields = [f for f in SPECIFICATION_FIELD_TYPES if f not in fields]
+            results = evaluate(perturb(self.specs, other_fields), self.parameters, categories, ["monthly"])
+            with self.subTest(stage=name):
+                assert_frame_equal(results["monthly"], expected.loc[(slice(None), categories), :])
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            what_if(evaluate(self.specs, self.parameters), {"lighting_system_colour_z1": "warm"})
+
+    def test_unrequested_categories(self):
+        baseline = evaluate(self.specs, self.parameters, [ENERGY_USE_CATEGORIES.Lighting])
+        result = what_if(baseline, {"water_demand": 50})
+        self.assertEqual(result.stages, [])
+        self.assertEqual(list(result.delta.index.get_level_values("category").unique()), ["Lighting"])